@@ -0,0 +1,211 @@
+import asyncio
+import importlib
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+BACKEND_HOST = os.getenv("BACKEND_HOST", "127.0.0.1")
+BACKEND_PORT = int(os.getenv("BACKEND_PORT", "5001"))
+# сколько запросов Flask может выполняться одновременно (в них блокирующий SQLite)
+ASGI_WORKERS = int(os.getenv("ASGI_WORKERS", "16"))
+# сколько байт ответа накапливаем в потоке, прежде чем вернуться в цикл событий
+CHUNK_BUFFER = 64 * 1024
+# предел тела запроса (импорт календаря - самый большой); больше - 413
+ASGI_MAX_BODY_MB = float(os.getenv("ASGI_MAX_BODY_MB", "100"))
+
+
+class ThreadPoolWSGIAdapter:
+    """
+    ASGI-приложение поверх WSGI-приложения Flask.
+
+    Сетевой ввод-вывод остаётся в цикле событий (uvicorn), а сами маршруты с блокирующими
+    обращениями к SQLite выполняются в ограниченном пуле потоков. В отличие от
+    asgiref.WsgiToAsgi, запросы не сериализуются через один поток.
+    wsgi_app - само приложение или строка 'модуль:атрибут': тогда оно импортируется в пуле потоков
+    на старте сервера (lifespan), и Flask с моделями не задерживают запуск процесса и бота.
+    """
+
+    def __init__(self, wsgi_app, max_workers=ASGI_WORKERS, max_body=int(ASGI_MAX_BODY_MB * 1024 * 1024)):
+        self.wsgi_app = wsgi_app if callable(wsgi_app) else None
+        self.import_path = None if callable(wsgi_app) else wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="backend")
+        self.max_body = max_body
+
+    def _load(self):
+        if self.wsgi_app is None:
+            module, _, attribute = self.import_path.partition(":")
+            self.wsgi_app = getattr(importlib.import_module(module), attribute)
+        return self.wsgi_app
+
+    async def load(self):
+        if self.wsgi_app is None:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._load)
+        return self.wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.load()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _http(self, scope, receive, send):
+        for name, value in scope["headers"]:
+            if name == b"content-length" and value.isdigit() and int(value) > self.max_body:
+                await send({"type": "http.response.start", "status": 413, "headers": []})
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+        # тело не копится заранее: маршрут читает его из wsgi.input по мере надобности
+        # (импорт - построчно), и в памяти держится только текущий кусок
+        loop = asyncio.get_running_loop()
+        body = io.BufferedReader(_RequestBody(receive, loop, self.max_body), CHUNK_BUFFER)
+        response = _WSGIResponse(await self.load(), self._environ(scope, body))
+        try:
+            chunks, done = await loop.run_in_executor(self.executor, response.start)
+            await send({"type": "http.response.start", "status": response.status, "headers": response.headers})
+            while True:
+                for chunk in chunks:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                if done:
+                    break
+                chunks, done = await loop.run_in_executor(self.executor, response.read)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            if response.iterator is not None:
+                await loop.run_in_executor(self.executor, response.close)
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope["query_string"].decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": body,
+            # поток кончается вместе с телом запроса, и Werkzeug читает его и без Content-Length
+            "wsgi.input_terminated": True,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for raw_name, raw_value in scope["headers"]:
+            name = raw_name.decode("latin1").upper().replace("-", "_")
+            value = raw_value.decode("latin1")
+            if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+                environ[name] = value
+                continue
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+
+class _RequestBody(io.RawIOBase):
+    """
+    Тело запроса для wsgi.input: читается в потоке пула, куски берутся из ASGI receive
+    в цикле событий по мере чтения. Больше limit байт - 413, обрыв соединения - 400.
+    """
+
+    def __init__(self, receive, loop, limit):
+        self._receive = receive
+        self._loop = loop
+        self._limit = limit
+        self._chunk = b""
+        self._offset = 0
+        self._more = True
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        # исключения Werkzeug: Flask превратит их в ответы 400 и 413
+        from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+
+        while self._offset >= len(self._chunk):
+            if not self._more:
+                return 0
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            self._chunk, self._offset = message.get("body", b""), 0
+            self._more = message.get("more_body", False)
+            self.size += len(self._chunk)
+            if self.size > self._limit:
+                raise RequestEntityTooLarge()
+        size = min(len(buffer), len(self._chunk) - self._offset)
+        buffer[:size] = self._chunk[self._offset:self._offset + size]
+        self._offset += size
+        return size
+
+
+class _WSGIResponse:
+    """Состояние одного WSGI-вызова; методы start/read/close выполняются в пуле потоков."""
+
+    def __init__(self, wsgi_app, environ):
+        self.wsgi_app = wsgi_app
+        self.environ = environ
+        self.status = 500
+        self.headers = []
+        self.iterator = None
+        self._result = None
+
+    def _start_response(self, status, headers, exc_info=None):
+        if exc_info and self.iterator is not None:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+
+    def start(self):
+        self._result = self.wsgi_app(self.environ, self._start_response)
+        self.iterator = iter(self._result)
+        return self.read()
+
+    def read(self):
+        chunks, size = [], 0
+        for chunk in self.iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+            if size >= CHUNK_BUFFER:
+                return chunks, False
+        return chunks, True
+
+    def close(self):
+        if hasattr(self._result, "close"):
+            self._result.close()
+
+
+asgi_app = ThreadPoolWSGIAdapter("backend.routes:app")
+
+
+def create_server(host=BACKEND_HOST, port=BACKEND_PORT, application=asgi_app):
+    """uvicorn-сервер, который запускается внутри уже работающего цикла событий: await server.serve()."""
+    import uvicorn
+
+    config = uvicorn.Config(application, host=host, port=port, lifespan="on", log_level="info")
+    return uvicorn.Server(config)
@@ -0,0 +1,214 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+from backend.models import normalize_date, recurrence_columns
+
+# сколько строк вставляется одним executemany в одной транзакции
+IMPORT_CHUNK_SIZE = 1000
+# сколько ошибок разбора возвращаем клиенту, остальные только считаем
+MAX_REPORTED_ERRORS = 50
+
+ICS_PRODID = "-//tg_bot_notificator//calendar export//RU"
+
+
+def parse_ndjson(lines):
+    """
+    Разбирает NDJSON построчно: {"type": "event"|"todo", "name": ..., "date": ...} на строку,
+    у повторяющихся ещё "rrule" и необязательный список "exdates".
+    Отдаёт (номер строки, type, (name, date, rrule, exdates)) или (номер строки, None, ошибка).
+    """
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            entry_type = item.get("type", "event")
+            name = item["name"]
+            date = item["date"]
+            rrule = item.get("rrule")
+            exdates = item.get("exdates") or []
+            # числа, списки и объекты вместо строк дальше упали бы в save_many и остановили бы весь импорт
+            if not isinstance(exdates, list) or not all(
+                isinstance(value, str) for value in (entry_type, name, date, "" if rrule is None else rrule, *exdates)
+            ):
+                raise TypeError("type, name, date, rrule and exdates items must be strings")
+            rrule, exdates = _recurrence(date, rrule, exdates)
+        except (ValueError, KeyError, AttributeError, TypeError) as e:
+            yield number, None, f"invalid line: {e}"
+            continue
+        if entry_type not in ("event", "todo") or not name or not date:
+            yield number, None, "type must be event or todo, name and date are required"
+            continue
+        yield number, entry_type, (name, date, rrule, exdates)
+
+
+def _recurrence(date, rrule, exdates):
+    """
+    Проверяет правило так же, как save_many (дата повторяющейся записи обязана разбираться),
+    и приводит исключённые повторения к виду starts_at. Ошибка - ValueError на эту строку.
+    """
+    if not rrule:
+        return None, None
+    rrule, _ = recurrence_columns(normalize_date(date, strict=True)[0], rrule)
+    exdates = [normalize_date(value, strict=True)[0] for value in exdates]
+    return rrule, ",".join(exdates) or None
+
+
+def _unfold(lines):
+    # RFC 5545: строка, начинающаяся с пробела или таба, продолжает предыдущую
+    current, start = None, 0
+    for number, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _unescape(text):
+    return (text.replace("\\n", "\n").replace("\\N", "\n")
+            .replace("\\,", ",").replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def _ics_date(params, value):
+    """DTSTART -> строка даты в формате бота: 'YYYY-MM-DD' или 'YYYY-MM-DD HH:MM'."""
+    value = value.strip()
+    if "VALUE=DATE" in params or len(value) == 8:
+        return datetime.strptime(value[:8], "%Y%m%d").strftime("%Y-%m-%d")
+    parsed = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        # время в UTC переводим в локальное время сервера, в котором живут остальные даты
+        parsed = parsed.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return parsed.strftime("%Y-%m-%d %H:%M")
+
+
+def parse_ics(lines):
+    """
+    Разбирает VEVENT'ы iCalendar потоково, в том же формате, что parse_ndjson (все как event).
+    Из повторений понимает RRULE (FREQ DAILY/WEEKLY/MONTHLY, INTERVAL, UNTIL, COUNT) и EXDATE.
+    """
+    event, start = None, 0
+    for number, line in _unfold(lines):
+        name, _, value = line.partition(":")
+        name, _, params = name.partition(";")
+        name = name.upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event, start = {"exdates": []}, number
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            if not event.get("summary") or not event.get("dtstart"):
+                yield start, None, "VEVENT without SUMMARY or DTSTART"
+            else:
+                try:
+                    date = _ics_date(*event["dtstart"])
+                    exdates = [_ics_date(params, value) for params, value in event["exdates"]]
+                    rrule, exdates = _recurrence(date, event.get("rrule"), exdates)
+                    yield start, "event", (event["summary"], date, rrule, exdates)
+                except ValueError as e:
+                    yield start, None, f"invalid DTSTART, RRULE or EXDATE: {e}"
+            event = None
+        elif event is not None and name == "SUMMARY":
+            event["summary"] = _unescape(value)
+        elif event is not None and name == "DTSTART":
+            event["dtstart"] = (params.upper(), value)
+        elif event is not None and name == "RRULE":
+            event["rrule"] = value
+        elif event is not None and name == "EXDATE":
+            event["exdates"].extend((params.upper(), item) for item in value.split(","))
+
+
+def import_entries(user_id, parsed, calendars, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Сохраняет разобранные записи пачками по chunk_size (executemany в одной транзакции).
+    calendars: {"event": EventCalendar, "todo": TodoCalendar}. Возвращает отчёт для клиента.
+    Пачка, которую отвергла БД (sqlite3.Error), откатывается целиком: её строки попадают
+    в ошибки, а импорт продолжается со следующей. Если пачку не удалось сохранить
+    (ValueError), импорт останавливается: уже сохранённые пачки остаются, в отчёте -
+    их число и "failed" с причиной.
+    """
+    pending = {entry_type: [] for entry_type in calendars}
+    lines = {entry_type: [] for entry_type in calendars}
+    imported = {entry_type: 0 for entry_type in calendars}
+    errors = []
+    report = {"imported": imported, "error_count": 0, "errors": errors}
+
+    def error(number, message):
+        report["error_count"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": number, "error": message})
+
+    def flush(entry_type):
+        if not pending[entry_type]:
+            return
+        try:
+            imported[entry_type] += calendars[entry_type].save_many(user_id, pending[entry_type])
+        except sqlite3.Error as e:
+            for number in lines[entry_type]:
+                error(number, f"database error: {e}")
+        pending[entry_type], lines[entry_type] = [], []
+
+    try:
+        for number, entry_type, entry in parsed:
+            if entry_type is None:
+                error(number, entry)
+                continue
+            pending[entry_type].append(entry)
+            lines[entry_type].append(number)
+            if len(pending[entry_type]) >= chunk_size:
+                flush(entry_type)
+        for entry_type in calendars:
+            flush(entry_type)
+    except ValueError as e:
+        report["failed"] = str(e)
+    return report
+
+
+def _escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+            .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        item = {
+            "id": row["id"],
+            "type": row["type"],
+            "name": row["name"],
+            "date": row["date"],
+        }
+        if row["rrule"]:
+            item["rrule"] = row["rrule"]
+            item["exdates"] = row["exdates"].split(",") if row["exdates"] else []
+        yield json.dumps(item, ensure_ascii=False) + "\n"
+
+
+def _ics_moment(name, starts_at, all_day):
+    if all_day:
+        return f"{name};VALUE=DATE:{starts_at[:10].replace('-', '')}"
+    return f"{name}:{starts_at[:10].replace('-', '')}T{starts_at[11:16].replace(':', '')}00"
+
+
+def ics_lines(rows):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{ICS_PRODID}\r\n"
+    for row in rows:
+        recurrence = ""
+        if row["rrule"]:
+            recurrence = f"RRULE:{row['rrule']}\r\n" + "".join(
+                _ics_moment("EXDATE", exdate, row["all_day"]) + "\r\n"
+                for exdate in (row["exdates"].split(",") if row["exdates"] else ())
+            )
+        yield (
+            "BEGIN:VEVENT\r\n"
+            f"UID:{row['type']}-{row['id']}@tg_bot_notificator\r\n"
+            f"DTSTAMP:{stamp}\r\n"
+            f"{_ics_moment('DTSTART', row['starts_at'], row['all_day'])}\r\n"
+            f"{recurrence}"
+            f"SUMMARY:{_escape(row['name'])}\r\n"
+            "END:VEVENT\r\n"
+        )
+    yield "END:VCALENDAR\r\n"
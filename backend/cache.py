@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+
+READ_CACHE_ENTRIES = int(os.getenv("READ_CACHE_ENTRIES", "10000"))
+READ_CACHE_MB = float(os.getenv("READ_CACHE_MB", "32"))
+# примерные накладные расходы Python на строку результата и на запись кеша
+ROW_OVERHEAD = 120
+ENTRY_OVERHEAD = 300
+
+
+def estimate_size(rows):
+    return ENTRY_OVERHEAD + sum(ROW_OVERHEAD + sum(len(str(value)) for value in row) for row in rows)
+
+
+class ReadCache:
+    """
+    LRU-кеш результатов чтения по ключу (user_id, таблица, запрос, аргументы).
+
+    Каждая запись помечена версией данных пользователя (user_versions) на момент чтения.
+    Запись отдаётся, только если версия не изменилась, поэтому кеш остаётся корректным,
+    даже когда в ту же базу пишут другие процессы. Собственные записи процесса
+    дополнительно сразу удаляют записи пользователя (invalidate_user), чтобы не держать мусор.
+    Ограничен и числом записей, и примерным объёмом в байтах.
+    """
+
+    def __init__(self, max_entries=READ_CACHE_ENTRIES, max_bytes=int(READ_CACHE_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (version, value, size)
+        self._by_user = {}  # user_id -> set(key)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key, version):
+        """Возвращает (True, value), если есть запись с той же версией, иначе (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry[0] != version:
+                self.stale += 1
+                self.misses += 1
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, version, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value, size)
+            self._by_user.setdefault(key[0], set()).add(key)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = self._by_user.get(str(user_id))
+            if keys:
+                self.invalidations += len(keys)
+                for key in list(keys):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+            self.bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+        keys = self._by_user[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self._by_user[key[0]]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+read_cache = ReadCache()
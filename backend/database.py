@@ -1,19 +1,138 @@
 import os
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from backend.sharding import HashRing, parse_shards
 
 load_dotenv()
 DB_PATH = os.getenv("DB_PATH")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# файлы шардов с данными календаря через запятую; пользователь попадает в шард по хешу user_id.
+# Пусто - всё в DB_PATH. Диалоги бота (conversation_state) всегда живут в DB_PATH
+DB_SHARDS = parse_shards(os.getenv("DB_SHARDS"))
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
+# WAL позволяет читать параллельно с записью, а synchronous=NORMAL в режиме WAL
+# не делает fsync на каждый коммит (только на чекпоинтах)
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -16000),       # ~16 МБ страничного кеша на соединение
+    ("mmap_size", 128 * 1024 * 1024),
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+# размер кеша подготовленных выражений sqlite3 (на соединение)
+STATEMENT_CACHE_SIZE = 256
+
+
+def get_db_connection(path=None):
+    """Открывает новое соединение с настроенными pragma. Для запросов используй пул."""
+    conn = sqlite3.connect(
+        path or DB_PATH,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
     return conn
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
+class ConnectionPool:
+    """
+    Ограниченный пул долгоживущих соединений.
+    Соединение выдаётся одному потоку за раз и возвращается в пул после использования,
+    поэтому подготовленные выражения и страничный кеш переживают отдельные запросы.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = get_db_connection(self.path)
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._idle.put_nowait(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_shards = None  # (HashRing, [ConnectionPool по шардам])
+_pool_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+
+def _primary_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def get_shards():
+    """Кольцо шардов DB_SHARDS и пулы соединений к ним (у каждого шарда свой пул)."""
+    global _shards
+    if _shards is None:
+        primary = _primary_pool()
+        with _pool_lock:
+            if _shards is None:
+                pools = [primary if path == DB_PATH else ConnectionPool(path) for path in DB_SHARDS]
+                _shards = HashRing(DB_SHARDS), pools
+    return _shards
+
+
+def get_pool(user_id=None):
+    """
+    Пул основной БД (DB_PATH). С user_id - пул шарда этого пользователя: через него идут
+    все запросы к данным одного пользователя, а пока шардов нет, это тот же пул DB_PATH.
+    """
+    if user_id is None or not DB_SHARDS:
+        return _primary_pool()
+    ring, pools = get_shards()
+    return pools[ring.shard_of(user_id)]
+
+
+def get_pools():
+    """Пулы всех шардов - для запросов сразу по всем пользователям (напоминания, сводки)."""
+    if not DB_SHARDS:
+        return [_primary_pool()]
+    return get_shards()[1]
+
+
+def group_by_pool(user_ids):
+    """{пул шарда: [user_id, ...]} - чтобы пачку пользователей обработать одним запросом на шард."""
+    groups = {}
+    for user_id in user_ids:
+        groups.setdefault(get_pool(user_id), []).append(user_id)
+    return groups
+
+
+def _create_tables(cursor):
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS events (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -32,5 +151,220 @@ def init_db():
     );
     ''')
 
-    conn.commit()
-    conn.close()
+
+def _add_starts_at(cursor):
+    # starts_at - нормализованное 'YYYY-MM-DD HH:MM', сортируется как строка,
+    # поэтому выборка за день превращается в диапазон по индексу (user_id, starts_at)
+    for table in ("events", "todos"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN starts_at TEXT")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN all_day INTEGER NOT NULL DEFAULT 0")
+        cursor.execute(f'''
+        UPDATE {table}
+        SET starts_at = COALESCE(strftime('%Y-%m-%d %H:%M', date), date),
+            all_day = length(trim(date)) <= 10
+        ''')
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_user_starts ON {table} (user_id, starts_at)")
+
+
+def _add_reminders(cursor):
+    # reminded_at хранит starts_at, о котором уже напомнили, чтобы после рестарта не слать повторно.
+    # Частичный индекс содержит только ожидающие напоминания и остаётся маленьким
+    cursor.execute("ALTER TABLE events ADD COLUMN reminded_at TEXT")
+    cursor.execute('''
+    UPDATE events SET reminded_at = starts_at
+    WHERE starts_at < strftime('%Y-%m-%d %H:%M', 'now', 'localtime')
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_events_pending ON events (starts_at)
+    WHERE reminded_at IS NULL AND all_day = 0
+    ''')
+
+
+_VERSION_BUMP = '''
+    INSERT INTO user_versions (user_id, version) VALUES ({row}.user_id, 1)
+    ON CONFLICT(user_id) DO UPDATE SET version = version + 1;
+'''
+
+
+def _add_user_versions(cursor):
+    # Счётчик изменений данных пользователя: растёт при любой вставке/удалении/правке его записей.
+    # Используется как ETag, поэтому служебные поля (reminded_at) его не трогают
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS user_versions (
+        user_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    ''')
+    for table in ("events", "todos"):
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_version_insert AFTER INSERT ON {table} "
+                       f"BEGIN {_VERSION_BUMP.format(row='NEW')} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_version_delete AFTER DELETE ON {table} "
+                       f"BEGIN {_VERSION_BUMP.format(row='OLD')} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_version_update "
+                       f"AFTER UPDATE OF user_id, name, date, starts_at, all_day ON {table} "
+                       f"BEGIN {_VERSION_BUMP.format(row='OLD')} {_VERSION_BUMP.format(row='NEW')} END")
+
+
+def _add_conversation_state(cursor):
+    # незавершённые диалоги бота (state, temp_date, ...), чтобы рестарт их не терял
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS conversation_state (
+        user_id TEXT PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversation_state_updated ON conversation_state (updated_at)")
+
+
+def _add_recurrence(cursor):
+    # Повторяющаяся запись - одна строка с правилом (rrule в духе RFC 5545): starts_at - первое
+    # повторение, ends_at - последнее ('9999-...' у бесконечных), exdates - исключённые повторения.
+    # Повторения не материализуются: их разворачивает backend/recurrence.py для запрошенного окна
+    for table in ("events", "todos"):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN rrule TEXT")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN exdates TEXT")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN ends_at TEXT")
+        cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_{table}_user_recurring ON {table} (user_id, ends_at)
+        WHERE rrule IS NOT NULL
+        ''')
+        # правило и исключения меняют то, что видит пользователь, - версия должна расти
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_version_update")
+        cursor.execute(f"CREATE TRIGGER {table}_version_update "
+                       f"AFTER UPDATE OF user_id, name, date, starts_at, all_day, rrule, exdates ON {table} "
+                       f"BEGIN {_VERSION_BUMP.format(row='OLD')} {_VERSION_BUMP.format(row='NEW')} END")
+    # напоминания по правилам всех пользователей на ближайшее окно
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_events_recurring ON events (ends_at) WHERE rrule IS NOT NULL")
+
+
+def _add_digest_subscriptions(cursor):
+    # Утренняя сводка: в hour по часовому поясу tz пользователь получает записи на сегодня
+    # (day_offset = 0) или на завтра (1). last_sent - локальная дата последней сводки.
+    # Рассылка идёт шардами (tz, hour, day_offset), поэтому индекс начинается с них
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS digest_subscriptions (
+        user_id TEXT PRIMARY KEY,
+        tz TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        day_offset INTEGER NOT NULL DEFAULT 0,
+        last_sent TEXT
+    ) WITHOUT ROWID;
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_digest_shard
+    ON digest_subscriptions (tz, hour, day_offset, user_id, last_sent)
+    ''')
+
+
+# Полнотекстовый поиск по названиям. rowid = id * 2 + kind, поэтому события и заметки
+# живут в одном индексе и запись находится по rowid без дополнительной колонки
+SEARCH_SOURCES = (("events", 0), ("todos", 1))
+# unicode61 сам приводит регистр, но 'ё' и 'е' для него разные буквы
+_SEARCH_NAME = "replace(replace({row}name, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def fill_search_index(cursor):
+    """Заполняет entries_fts заново по events и todos (миграция, массовая загрузка без триггеров)."""
+    cursor.execute("DELETE FROM entries_fts")
+    for table, kind in SEARCH_SOURCES:
+        cursor.execute(
+            f"INSERT INTO entries_fts (rowid, name, user_key) "
+            f"SELECT id * 2 + {kind}, {_SEARCH_NAME.format(row='')}, 'u' || user_id FROM {table}"
+        )
+
+
+def _add_search(cursor):
+    # user_key ('u' || user_id) - отдельная колонка, чтобы фильтр по пользователю шёл внутри MATCH
+    # по индексу, а не проверкой каждой найденной у всех пользователей записи.
+    # prefix - индексы префиксов для запросов вида 'врач*'
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+        name, user_key,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4 5 6'
+    )
+    ''')
+    for table, kind in SEARCH_SOURCES:
+        insert = (f"INSERT INTO entries_fts (rowid, name, user_key) "
+                  f"VALUES (NEW.id * 2 + {kind}, {_SEARCH_NAME.format(row='NEW.')}, 'u' || NEW.user_id);")
+        delete = f"DELETE FROM entries_fts WHERE rowid = OLD.id * 2 + {kind};"
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF name, user_id ON {table} "
+                       f"BEGIN {delete} {insert} END")
+    fill_search_index(cursor)
+
+
+def _add_write_behind_log(cursor):
+    # номер последней записи журнала WRITE_BEHIND=log, попавшей в БД: пишется в той же транзакции,
+    # что и сами вставки, поэтому при проигрывании журнала после падения ничего не вставится дважды
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS write_behind_log (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        seq INTEGER NOT NULL
+    )
+    ''')
+
+
+# Миграции применяются по порядку, номер последней применённой хранится в PRAGMA user_version.
+# Новые миграции добавляются только в конец списка.
+MIGRATIONS = [
+    _create_tables,
+    _add_starts_at,
+    _add_reminders,
+    _add_user_versions,
+    _add_conversation_state,
+    _add_recurrence,
+    _add_digest_subscriptions,
+    _add_search,
+    _add_write_behind_log,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Доводит схему до версии target. Каждая миграция - отдельная транзакция."""
+    # обычный старт: схема уже свежая, и блокировка на запись не нужна
+    version = get_schema_version(conn)
+    if version >= target:
+        return version
+    while True:
+        # BEGIN IMMEDIATE берёт блокировку на запись, поэтому два процесса
+        # не применят одну и ту же миграцию дважды
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= target:
+                conn.rollback()
+                return version
+            MIGRATIONS[version](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+_initialized = False
+
+
+def init_db():
+    """
+    Доводит до последней версии схему основной БД и всех шардов - один раз на процесс,
+    сколько бы моделей ни создавалось.
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        for pool in dict.fromkeys((_primary_pool(), *get_pools())):
+            with pool.connection() as conn:
+                migrate(conn)
+        _initialized = True
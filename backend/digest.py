@@ -0,0 +1,166 @@
+from datetime import date as date_cls, timedelta
+from itertools import groupby
+from operator import itemgetter
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from backend.database import get_pool, get_pools, group_by_pool, init_db
+from backend.recurrence import expand
+
+# сколько строк читаем из курсора за раз при рассылке
+DIGEST_FETCH_SIZE = 1000
+# сколько пользователей отдаём отправителю за раз (и помечаем отправленными одним UPDATE)
+DIGEST_BATCH_USERS = 200
+
+# Записи подписчиков шарда за день - одним запросом. Разовые записи идут по индексу
+# (user_id, starts_at), правила - по частичному индексу (user_id, ends_at)
+_DIGEST_PART = '''
+    SELECT s.user_id, '{type}' AS type, t.name, t.starts_at, t.all_day, t.rrule, t.exdates
+    FROM digest_subscriptions s JOIN {table} t ON t.user_id = s.user_id
+    WHERE s.tz = :tz AND s.hour = :hour AND s.day_offset = :day_offset
+      AND (s.last_sent IS NULL OR s.last_sent < :today)
+      AND {condition}
+'''
+_SINGLE = "t.rrule IS NULL AND t.starts_at >= :start AND t.starts_at < :end"
+_RULES = "t.rrule IS NOT NULL AND t.ends_at >= :start AND t.starts_at < :end"
+DIGEST_QUERY = " UNION ALL ".join(
+    _DIGEST_PART.format(type=table[:-1], table=table, condition=condition)
+    for table in ("events", "todos")
+    for condition in (_SINGLE, _RULES)
+) + " ORDER BY 1, 4"
+
+
+def check_subscription(tz, hour, day_offset):
+    """Проверяет параметры подписки; неверные - ValueError."""
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {tz!r}")
+    if not 0 <= hour <= 23:
+        raise ValueError("Hour must be between 0 and 23")
+    if day_offset not in (0, 1):
+        raise ValueError("Day offset must be 0 (today) or 1 (tomorrow)")
+
+
+class DigestSubscriptions:
+    """
+    Подписки на ежедневную сводку и выборка записей для рассылки.
+
+    Подписчики разбиты на шарды (tz, hour, day_offset): шард рассылается, когда в его часовом
+    поясе наступает hour, поэтому нагрузка размазана по суткам. Записи всех подписчиков шарда
+    читаются одним запросом, отсортированным по user_id, и отдаются по мере чтения.
+    last_sent - локальная дата последней сводки, по ней отправка не повторяется после рестарта.
+    """
+
+    def __init__(self):
+        init_db()
+
+    def subscribe(self, user_id, tz, hour, day_offset=0):
+        check_subscription(tz, hour, day_offset)
+        # подписка лежит в шарде БД пользователя, рядом с его записями: сводка собирается JOIN'ом
+        with get_pool(user_id).connection() as conn:
+            # смена шарда не должна повторно прислать сегодняшнюю сводку, поэтому last_sent сохраняется
+            conn.execute(
+                "INSERT INTO digest_subscriptions (user_id, tz, hour, day_offset) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET tz = excluded.tz, hour = excluded.hour, "
+                "day_offset = excluded.day_offset",
+                (str(user_id), tz, hour, day_offset),
+            )
+            conn.commit()
+
+    def unsubscribe(self, user_id):
+        with get_pool(user_id).connection() as conn:
+            cursor = conn.execute("DELETE FROM digest_subscriptions WHERE user_id = ?", (str(user_id), ))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def get(self, user_id):
+        with get_pool(user_id).connection() as conn:
+            return conn.execute(
+                "SELECT tz, hour, day_offset, last_sent FROM digest_subscriptions WHERE user_id = ?",
+                (str(user_id), ),
+            ).fetchone()
+
+    def shards(self):
+        """
+        Шарды (tz, hour, day_offset, oldest) - по одному на группу подписчиков с общим временем рассылки.
+        oldest - самая ранняя last_sent в шарде ('' - кто-то ещё не получал сводку).
+        Подписчики одного шарда могут лежать в разных шардах БД (DB_SHARDS) - группы сливаются.
+        """
+        shards = {}
+        for pool in get_pools():
+            with pool.connection() as conn:
+                rows = conn.execute(
+                    "SELECT tz, hour, day_offset, MIN(COALESCE(last_sent, '')) AS oldest "
+                    "FROM digest_subscriptions GROUP BY tz, hour, day_offset"
+                ).fetchall()
+            for tz, hour, day_offset, oldest in rows:
+                key = (tz, hour, day_offset)
+                shards[key] = min(shards.get(key, oldest), oldest)
+        return [(*key, oldest) for key, oldest in shards.items()]
+
+    def iter_digests(self, tz, hour, day_offset, today, batch_users=DIGEST_BATCH_USERS):
+        """
+        Генератор пачек [(user_id, записи за день), ...] для ещё не получивших сводку за today.
+        Записи - dict(type, name, starts_at, all_day) по времени, повторения правил уже развёрнуты.
+        Пользователи без записей на день в выборку не попадают (их закрывает finish_shard).
+        Шарды БД читаются по очереди, пачка может содержать пользователей из разных.
+        """
+        day = date_cls.fromisoformat(today) + timedelta(days=day_offset)
+        start, end = day.isoformat(), (day + timedelta(days=1)).isoformat()
+        params = {"tz": tz, "hour": hour, "day_offset": day_offset, "today": today, "start": start, "end": end}
+        batch = []
+        for pool in get_pools():
+            with pool.connection() as conn:
+                cursor = conn.execute(DIGEST_QUERY, params)
+                rows = iter(lambda: cursor.fetchmany(DIGEST_FETCH_SIZE), [])
+                for user_id, user_rows in groupby((row for chunk in rows for row in chunk), key=itemgetter("user_id")):
+                    entries = []
+                    for row in user_rows:
+                        if row["rrule"] is None:
+                            entries.append(self._entry(row, row["starts_at"]))
+                        else:
+                            entries.extend(self._entry(row, starts_at) for _, starts_at in expand((row, ), start, end))
+                    if entries:
+                        batch.append((user_id, sorted(entries, key=itemgetter("starts_at"))))
+                    if len(batch) >= batch_users:
+                        yield batch
+                        batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _entry(row, starts_at):
+        return {"type": row["type"], "name": row["name"], "starts_at": starts_at, "all_day": bool(row["all_day"])}
+
+    def claim(self, user_ids, today):
+        """
+        Помечает сводку за today отправленной и возвращает тех, кому её ещё не отправляли.
+        Отметка ставится до отправки (как у напоминаний): при сбое сводка теряется, но не дублируется.
+        """
+        if not user_ids:
+            return set()
+        claimed = set()
+        for pool, shard_user_ids in group_by_pool(str(user_id) for user_id in user_ids).items():
+            placeholders = ", ".join("?" * len(shard_user_ids))
+            with pool.connection() as conn:
+                rows = conn.execute(
+                    f"UPDATE digest_subscriptions SET last_sent = ? WHERE user_id IN ({placeholders}) "
+                    "AND (last_sent IS NULL OR last_sent < ?) RETURNING user_id",
+                    (today, *shard_user_ids, today),
+                ).fetchall()
+                conn.commit()
+            claimed.update(row["user_id"] for row in rows)
+        return claimed
+
+    def finish_shard(self, tz, hour, day_offset, today):
+        """Закрывает день для оставшихся подписчиков шарда (у кого не было записей). Возвращает их число."""
+        closed = 0
+        for pool in get_pools():
+            with pool.connection() as conn:
+                cursor = conn.execute(
+                    "UPDATE digest_subscriptions SET last_sent = ? "
+                    "WHERE tz = ? AND hour = ? AND day_offset = ? AND (last_sent IS NULL OR last_sent < ?)",
+                    (today, tz, hour, day_offset, today),
+                )
+                conn.commit()
+                closed += cursor.rowcount
+        return closed
@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+# METRICS_ENABLED=0 превращает все метрики в заглушки: замер стоит один вызов пустого метода
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+# границы бакетов гистограмм в секундах: от долей миллисекунды (кеш, SQLite) до секунд (Telegram)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Timer:
+    __slots__ = ("metric", "labels", "started")
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metric.observe(time.perf_counter() - self.started, *self.labels)
+
+
+class Histogram:
+    """
+    Гистограмма в духе Prometheus с метками. Значения меток передаются позиционно
+    в порядке labelnames: histogram.observe(0.01, "events", "save").
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # значения меток -> [счётчики по бакетам (+Inf последним), сумма]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Контекстный менеджер: with histogram.time("label"): ..."""
+        return _Timer(self, labels)
+
+    def collect(self):
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(snapshot):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, (('le', le), ))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for labels, value in snapshot:
+            yield f"{self.name}_total{_labels(self.labelnames, labels)} {value}"
+
+
+class _NullMetric:
+    """Заглушка для METRICS_ENABLED=0: тот же интерфейс, ничего не делает."""
+
+    def observe(self, value, *labels):
+        pass
+
+    def inc(self, *labels, amount=1):
+        pass
+
+    def time(self, *labels):
+        return _NULL_TIMER
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_METRIC = _NullMetric()
+_NULL_TIMER = _NullTimer()
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # модуль может импортироваться повторно (например, в бенчмарках) - отдаём уже созданную метрику
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus (exposition format 0.0.4)."""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    if not METRICS_ENABLED:
+        return _NULL_METRIC
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def counter(name, documentation, labelnames=()):
+    if not METRICS_ENABLED:
+        return _NULL_METRIC
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def timed(metric, *labels):
+    """Декоратор функции: время каждого вызова пишется в metric. Без метрик функция не оборачивается."""
+    def decorator(fn):
+        if not METRICS_ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with metric.time(*labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,6 +1,16 @@
 from dataclasses import dataclass
-from backend.database import get_db_connection, init_db
+from typing import ClassVar
+from datetime import date as date_cls, datetime, timedelta
+from functools import partial, wraps
+from operator import itemgetter
+from backend import metrics
+from backend.cache import read_cache
+from backend.database import SEARCH_SOURCES, get_pool, get_pools, init_db
+from backend.recurrence import expand, last_occurrence, parse_rule
+from backend.search import match_expression, query_terms, relevance
+from backend.writebehind import get_buffer, start as start_write_behind
 import logging
+import os
 
 logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -8,61 +18,497 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# сколько последних добавленных совпадений поиска ранжируется (и кешируется) на запрос
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+# таблицы записей по полю type ('event' -> events), в котором их отдают маршруты
+ENTRY_TABLES = ("events", "todos")
+
+DB_QUERY_SECONDS = metrics.histogram(
+    "calendar_db_query_seconds", "Latency of CalendarDatabase methods, including read cache hits", ("table", "method")
+)
+
+
+def timed_query(method):
+    """Пишет время вызова метода CalendarDatabase в DB_QUERY_SECONDS с метками (таблица, метод)."""
+    if not metrics.METRICS_ENABLED:
+        return method
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with DB_QUERY_SECONDS.time(self.table_name, name):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def normalize_date(value, strict=False):
+    """
+    Приводит дату к виду, который хранится в starts_at.
+    Возвращает (starts_at 'YYYY-MM-DD HH:MM', all_day), где all_day - у даты не было времени.
+    Нераспознанная дата возвращается как есть, а при strict=True - ValueError
+    """
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        if strict:
+            raise
+        return value, False
+    return parsed.strftime("%Y-%m-%d %H:%M"), len(value) <= 10
+
+
+def recurrence_columns(starts_at, rrule):
+    """
+    Проверяет правило повторения и возвращает (rrule в каноническом виде, ends_at)
+    или (None, None) для разовой записи. Неподдерживаемое правило - ValueError
+    """
+    if not rrule:
+        return None, None
+    rule = parse_rule(rrule)
+    try:
+        return str(rule), last_occurrence(starts_at, rule)
+    except OverflowError as e:
+        # повторения за пределами 9999 года - та же ошибка в правиле, что и неверный формат
+        raise ValueError(f"Recurrence goes past year 9999: {e}") from e
+
+
+def is_occurrence(row, starts_at):
+    """Есть ли у правила row (rrule, starts_at, exdates) неисключённое повторение ровно в starts_at."""
+    end = (datetime.fromisoformat(starts_at) + timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M")
+    return any(value == starts_at for _, value in expand((row, ), starts_at, end))
+
+
+def day_bounds(value):
+    """Полуинтервал [начало дня, начало следующего дня) для дня, к которому относится value."""
+    day = date_cls.fromisoformat(str(value).strip()[:10])
+    return day.isoformat(), (day + timedelta(days=1)).isoformat()
+
 
 @dataclass
 class CalendarDatabase:
     table_name: str
+    # подписчики на изменения (например, планировщик напоминаний бота);
+    # вызываются в потоке, выполнившем запись: listener(action, table_name, rows)
+    listeners: ClassVar[list] = []
 
     def __post_init__(self):
         init_db()
+        start_write_behind(get_pools(), partial(self._notify, "saved"))
 
-    def _execute_query(self, query, params=None, fetch=False):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params if params else ())
-        if fetch:
-            result = cursor.fetchall()
-        else:
-            conn.commit()
-            result = None
-        conn.close()
-        return result
+    @classmethod
+    def add_listener(cls, listener):
+        cls.listeners.append(listener)
+
+    @classmethod
+    def remove_listener(cls, listener):
+        if listener in cls.listeners:
+            cls.listeners.remove(listener)
+
+    def _notify(self, action, rows, table=None):
+        table = table or self.table_name
+        for listener in list(self.listeners):
+            try:
+                listener(action, table, rows)
+            except Exception:
+                logger.exception(f"Listener {listener} failed on {action} in {table}")
 
-    def save(self, user_id, name, date):
-        query = f"INSERT INTO {self.table_name} (user_id, name, date) VALUES (?, ?, ?)"
-        self._execute_query(query, (user_id, name, date))
+    @staticmethod
+    def _pool(user_id):
+        """
+        Пул шарда пользователя для запросов к его данным. Если у пользователя есть вставки
+        в очереди WRITE_BEHIND, они сначала коммитятся - запрос их увидит.
+        """
+        pool = get_pool(user_id)
+        buffer = get_buffer(pool)
+        if buffer is not None:
+            buffer.sync(user_id)
+        return pool
+
+    def _execute_query(self, query, params=None, fetch=False, user_id=None, pool=None):
+        """
+        Выполняет запрос на соединении из пула шарда пользователя user_id (или из pool).
+        Для записи без fetch возвращает курсор (lastrowid, rowcount).
+        """
+        with (pool or self._pool(user_id)).connection() as conn:
+            cursor = conn.execute(query, params if params else ())
+            result = cursor.fetchall() if fetch else cursor
+            if conn.in_transaction:
+                conn.commit()
+            return result
+
+    def _cached_query(self, user_id, key, query, params):
+        """
+        Чтение данных одного пользователя через read_cache. Сначала читается версия данных
+        пользователя, потом сами данные: если между ними кто-то записал, запись в кеше
+        окажется со старой версией и просто не будет использована.
+        """
+        if not read_cache.enabled:
+            return self._execute_query(query, params, fetch=True, user_id=user_id)
+        user_id = str(user_id)
+        key = (user_id, self.table_name, *key)
+        version = self.get_user_version(user_id)
+        hit, rows = read_cache.get(key, version)
+        if not hit:
+            rows = self._execute_query(query, params, fetch=True, user_id=user_id)
+            read_cache.put(key, version, rows)
+        return rows
+
+    @staticmethod
+    def _prepare(user_id, name, date, rrule=None, exdates=None):
+        # у повторяющейся записи дата обязана разбираться: от неё считаются повторения
+        starts_at, all_day = normalize_date(date, strict=bool(rrule))
+        rrule, ends_at = recurrence_columns(starts_at, rrule)
+        return (user_id, name, date, starts_at, all_day, rrule, ends_at, exdates if rrule else None)
+
+    @timed_query
+    def save(self, user_id, name, date, rrule=None):
+        """
+        Вставляет запись и возвращает её id. С WRITE_BEHIND запись только ставится в очередь
+        шарда и коммитится с ближайшей пачкой; id до этого неизвестен - возвращается None,
+        а подписчики узнают о записи после коммита.
+        """
+        row = self._prepare(user_id, name, date, rrule)
+        buffer = get_buffer(get_pool(user_id))
+        if buffer is not None:
+            buffer.add(self.table_name, row)
+            return None
+        query = (
+            f"INSERT INTO {self.table_name} (user_id, name, date, starts_at, all_day, rrule, ends_at, exdates) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        row_id = self._execute_query(query, row, user_id=user_id).lastrowid
+        read_cache.invalidate_user(user_id)
+        self._notify("saved", [{
+            "id": row_id, "user_id": str(user_id), "name": name,
+            "starts_at": row[3], "all_day": row[4], "rrule": row[5], "exdates": None,
+        }])
+        return row_id
     
+    @timed_query
+    def save_many(self, user_id, entries):
+        """
+        Вставляет пачку записей [(name, date[, rrule[, exdates]]), ...] одним executemany
+        в одной транзакции. Возвращает число вставленных строк.
+        """
+        rows = [self._prepare(user_id, *entry) for entry in entries]
+        if not rows:
+            return 0
+        query = (
+            f"INSERT INTO {self.table_name} (user_id, name, date, starts_at, all_day, rrule, ends_at, exdates) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        with self._pool(user_id).connection() as conn:
+            # BEGIN IMMEDIATE: пока транзакция открыта, никто другой не пишет,
+            # поэтому новые строки - ровно те, у которых id больше прежнего максимума
+            conn.execute("BEGIN IMMEDIATE")
+            last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {self.table_name}").fetchone()[0]
+            conn.executemany(query, rows)
+            saved = []
+            if self.listeners:
+                saved = [dict(row) for row in conn.execute(
+                    f"SELECT id, user_id, name, starts_at, all_day, rrule, exdates FROM {self.table_name} WHERE id > ?",
+                    (last_id, )
+                )]
+            conn.commit()
+        read_cache.invalidate_user(user_id)
+        if saved:
+            self._notify("saved", saved)
+        return len(rows)
+
+    def iter_all(self, user_id, batch_size=500):
+        """
+        Все записи пользователя генератором, страницами по batch_size, поэтому память не зависит
+        от размера истории. Каждая страница - отдельный запрос с продолжением после последней
+        отданной строки по (starts_at, id): соединение возвращается в пул между страницами,
+        и медленный клиент экспорта не держит его всё время. Порядок - по индексу (user_id, starts_at).
+        """
+        query = (
+            f"SELECT id, '{self.table_name[:-1]}' AS type, name, date, starts_at, all_day, rrule, exdates "
+            f"FROM {self.table_name} WHERE user_id = ? AND (starts_at, id) > (?, ?) ORDER BY starts_at, id LIMIT ?"
+        )
+        after = ("", 0)
+        while True:
+            rows = self._execute_query(query, (user_id, *after, batch_size), fetch=True, user_id=user_id)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]["starts_at"], rows[-1]["id"])
+
+    def _rules(self, user_id, start, end, table=None):
+        """
+        Повторяющиеся записи пользователя, у которых могут быть повторения в [start, end).
+        В кеше лежат все правила пользователя (их немного), окно отбирается уже в памяти.
+        """
+        table = table or self.table_name
+        query = (
+            f"SELECT id, '{table[:-1]}' AS type, name, date, starts_at, all_day, rrule, exdates, ends_at "
+            f"FROM {table} WHERE user_id = ? AND rrule IS NOT NULL"
+        )
+        rows = self._cached_query(user_id, ("rules", table), query, (user_id, ))
+        return [row for row in rows if row["starts_at"] < end and row["ends_at"] >= start]
+
+    @timed_query
     def get_date_events(self, user_id, date):
-        query = f"SELECT name FROM {self.table_name} WHERE DATE(date) = ? AND user_id = ?"
-        return self._execute_query(query, (date, user_id), fetch=True)
+        """
+        Записи пользователя за день: id, type, name, starts_at, rrule. Повторяющиеся - отдельными
+        повторениями; по (type, id, starts_at) их можно удалить через delete_entries.
+        """
+        start, end = day_bounds(date)
+        query = (
+            f"SELECT id, '{self.table_name[:-1]}' AS type, name, starts_at, rrule FROM {self.table_name} "
+            "WHERE user_id = ? AND starts_at >= ? AND starts_at < ? AND rrule IS NULL"
+        )
+        rows = self._cached_query(user_id, ("day", start), query, (user_id, start, end))
+        return rows + [
+            {key: row[key] for key in ("id", "type", "name", "rrule")} | {"starts_at": starts_at}
+            for row, starts_at in expand(self._rules(user_id, start, end), start, end)
+        ]
 
+    @timed_query
     def get_all(self, user_id):
-        query = f"SELECT name, date FROM {self.table_name} WHERE user_id = ?"
-        return self._execute_query(query, (user_id, ), fetch=True)
+        query = f"SELECT name, date FROM {self.table_name} WHERE user_id = ? ORDER BY starts_at"
+        return self._cached_query(user_id, ("all", ), query, (user_id, ))
     
+    @timed_query
+    def get_range(self, user_id, start, end, with_tables=()):
+        """
+        Записи пользователя с starts_at из полуинтервала [start, end) из этой таблицы
+        и таблиц with_tables - одним запросом, каждая часть идёт по индексу (user_id, starts_at).
+        Повторяющиеся записи разворачиваются в отдельные повторения со своим starts_at.
+        """
+        tables = (self.table_name, *with_tables)
+        query = " UNION ALL ".join(
+            f"SELECT id, '{table[:-1]}' AS type, name, date, starts_at, all_day, rrule FROM {table} "
+            "WHERE user_id = ? AND starts_at >= ? AND starts_at < ? AND rrule IS NULL"
+            for table in tables
+        ) + " ORDER BY starts_at"
+        rows = self._cached_query(user_id, ("range", start, end, with_tables), query, (user_id, start, end) * len(tables))
+        rules = [row for table in tables for row in self._rules(user_id, start, end, table)]
+        if not rules:
+            return rows
+        repeated = []
+        for row in rules:
+            base = {key: row[key] for key in ("id", "type", "name", "date", "all_day", "rrule")}
+            repeated.extend({**base, "starts_at": starts_at} for _, starts_at in expand((row, ), start, end))
+        return sorted(rows + repeated, key=itemgetter("starts_at"))
+
+    @timed_query
+    def search(self, user_id, text, limit=20, offset=0):
+        """
+        Полнотекстовый поиск по названиям событий и заметок пользователя (entries_fts).
+        Слова запроса ищутся по основам как префиксы. Совпадения ранжируются окнами по
+        SEARCH_CANDIDATES, от добавленных позже к ранним: сначала все из первого окна по relevance
+        (при равенстве - добавленные позже выше), потом из следующего, и т.д. - offset доходит
+        до любого совпадения. Возвращает limit записей начиная с offset. Пустой запрос - ValueError.
+        """
+        terms = query_terms(text)
+        match = match_expression(user_id, terms)
+        # bm25 в SQLite считает статистику по всему списку документов пользователя и стоит
+        # десятки мс на больших календарях, а выборка по rowid с LIMIT - доли мс
+        query = "SELECT rowid, name FROM entries_fts WHERE entries_fts MATCH ? ORDER BY rowid DESC LIMIT ? OFFSET ?"
+        ranked = []
+        window, skip = divmod(offset, SEARCH_CANDIDATES)
+        while len(ranked) < limit:
+            candidates = self._cached_query(
+                user_id, ("search", match, window), query, (match, SEARCH_CANDIDATES, window * SEARCH_CANDIDATES)
+            )
+            ranked.extend(sorted(candidates, key=lambda row: relevance(row["name"], terms))[skip:skip + limit - len(ranked)])
+            if len(candidates) < SEARCH_CANDIDATES:
+                break
+            window, skip = window + 1, 0
+        if not ranked:
+            return []
+        found = {}
+        for table, kind in SEARCH_SOURCES:
+            ids = [row["rowid"] // 2 for row in ranked if row["rowid"] % 2 == kind]
+            if ids:
+                rows = self._execute_query(
+                    f"SELECT id, '{table[:-1]}' AS type, name, date, starts_at, all_day, rrule FROM {table} "
+                    f"WHERE id IN ({', '.join('?' * len(ids))})", ids, fetch=True, user_id=user_id,
+                )
+                found.update((row["id"] * 2 + kind, row) for row in rows)
+        return [found[row["rowid"]] for row in ranked if row["rowid"] in found]
+
+    @timed_query
+    def get_user_version(self, user_id):
+        """Счётчик изменений записей пользователя (во всех таблицах); 0 - записей ещё не было."""
+        query = "SELECT version FROM user_versions WHERE user_id = ?"
+        rows = self._execute_query(query, (user_id, ), fetch=True, user_id=user_id)
+        return rows[0]["version"] if rows else 0
+
+    @timed_query
     def delete_event(self, user_id, name, date):
-        query = f"DELETE FROM {self.table_name} WHERE user_id = ? AND name = ? AND DATE(date) = ?"
-        self._execute_query(query, (user_id, name, date))
-        return True #TODO: number of rowss
+        """
+        Удаляет разовые записи с этим именем за день, а у повторяющихся исключает повторения этого дня.
+        Возвращает число удалённых записей и повторений. Удаление одной записи - delete_entries.
+        """
+        start, end = day_bounds(date)
+        query = (
+            f"DELETE FROM {self.table_name} WHERE user_id = ? AND starts_at >= ? AND starts_at < ? AND name = ? "
+            "AND rrule IS NULL RETURNING id"
+        )
+        deleted = self._execute_query(query, (user_id, start, end, name), fetch=True, user_id=user_id)
+        excluded, occurrences = self._exclude_occurrences(user_id, name, start, end)
+        if deleted or excluded:
+            read_cache.invalidate_user(user_id)
+            self._notify("deleted", [{"id": row["id"], "user_id": str(user_id)} for row in deleted + excluded])
+        if excluded:
+            # правило осталось - подписчики заново берут его ближайшее повторение
+            self._notify("saved", [dict(row, user_id=str(user_id)) for row in excluded])
+        return len(deleted) + occurrences
+
+    @timed_query
+    def delete_entries(self, user_id, entries):
+        """
+        Удаляет записи пользователя по id в одной транзакции. entries - [{"type", "id"[, "starts_at"]}],
+        type - 'event' или 'todo' (таблица любая, не только эта, как with_tables в get_range).
+        Со starts_at у повторяющейся записи исключается только это повторение, без него - всё правило.
+        Чужие, несуществующие и уже исключённые пропускаются. Возвращает число удалённых записей
+        и повторений. Неизвестный type или нечисловой id - ValueError.
+        """
+        wanted = {}  # таблица -> {id: {starts_at повторения или None - вся запись}}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ValueError(f"Invalid entry: {entry!r}")
+            table = f"{entry.get('type')}s"
+            if table not in ENTRY_TABLES:
+                raise ValueError(f"Unknown entry type: {entry.get('type')}")
+            if not str(entry.get("id", "")).isdigit():
+                raise ValueError(f"Invalid entry id: {entry.get('id')}")
+            starts_at = entry.get("starts_at")
+            moment = normalize_date(starts_at, strict=True)[0] if starts_at else None
+            wanted.setdefault(table, {}).setdefault(int(entry["id"]), set()).add(moment)
+        deleted, excluded, count = {}, {}, 0
+        with self._pool(user_id).connection() as conn:
+            # BEGIN IMMEDIATE: между чтением exdates и их записью никто другой не пишет
+            conn.execute("BEGIN IMMEDIATE")
+            for table, moments in wanted.items():
+                marks = ", ".join("?" * len(moments))
+                rows = conn.execute(
+                    f"SELECT id, name, starts_at, all_day, rrule, exdates FROM {table} WHERE user_id = ? AND id IN ({marks})",
+                    (user_id, *moments),
+                ).fetchall()
+                whole = [row["id"] for row in rows if row["rrule"] is None or None in moments[row["id"]]]
+                deleted[table] = [dict(row) for row in conn.execute(
+                    f"DELETE FROM {table} WHERE user_id = ? AND id IN ({', '.join('?' * len(whole))}) RETURNING id",
+                    (user_id, *whole),
+                )] if whole else []
+                excluded[table] = []
+                for row in rows:
+                    if row["id"] in whole:
+                        continue
+                    found = [moment for moment in sorted(moments[row["id"]]) if is_occurrence(row, moment)]
+                    if found:
+                        exdates = ",".join(filter(None, (row["exdates"], *found)))
+                        excluded[table].append(dict(row, exdates=exdates))
+                        count += len(found)
+                conn.executemany(
+                    f"UPDATE {table} SET exdates = ? WHERE id = ?",
+                    [(row["exdates"], row["id"]) for row in excluded[table]],
+                )
+                count += len(deleted[table])
+            conn.commit()
+        if count:
+            read_cache.invalidate_user(user_id)
+        for table in wanted:
+            rows = deleted[table] + excluded[table]
+            if rows:
+                self._notify("deleted", [{"id": row["id"], "user_id": str(user_id)} for row in rows], table)
+            if excluded[table]:
+                self._notify("saved", [dict(row, user_id=str(user_id)) for row in excluded[table]], table)
+        return count
+
+    def _exclude_occurrences(self, user_id, name, start, end):
+        """
+        Добавляет повторения из [start, end) в exdates правил с этим именем.
+        Возвращает (изменённые правила, число исключённых повторений).
+        """
+        query = (
+            f"SELECT id, name, starts_at, all_day, rrule, exdates FROM {self.table_name} "
+            "WHERE user_id = ? AND name = ? AND rrule IS NOT NULL AND starts_at < ? AND ends_at >= ?"
+        )
+        rules = self._execute_query(query, (user_id, name, end, start), fetch=True, user_id=user_id)
+        excluded = {}
+        occurrences = 0
+        for row, starts_at in expand(rules, start, end):
+            exdates = excluded.get(row["id"], {}).get("exdates", row["exdates"])
+            excluded[row["id"]] = dict(row, exdates=f"{exdates},{starts_at}" if exdates else starts_at)
+            occurrences += 1
+        if excluded:
+            with self._pool(user_id).connection() as conn:
+                conn.executemany(
+                    f"UPDATE {self.table_name} SET exdates = ? WHERE id = ?",
+                    [(row["exdates"], row["id"]) for row in excluded.values()],
+                )
+                conn.commit()
+        return list(excluded.values()), occurrences
 
 
 class EventCalendar(CalendarDatabase):
     def __init__(self):
         super().__init__("events")
 
-    def save_event(self, user_id, event_name, event_date):
-        self.save(user_id, event_name, event_date)
+    def save_event(self, user_id, event_name, event_date, rrule=None):
+        self.save(user_id, event_name, event_date, rrule)
 
     def get_events(self, user_id):
         return self.get_all(user_id)
 
+    @timed_query
+    def get_pending_reminders(self, start, end):
+        """
+        Ещё не напомненные события со временем из полуинтервала [start, end) по всем пользователям
+        (со всех шардов). У повторяющихся reminded_at - последнее напомненное повторение, ждут все более поздние.
+        """
+        query = (
+            "SELECT id, user_id, name, starts_at FROM events "
+            "WHERE reminded_at IS NULL AND starts_at >= ? AND starts_at < ? AND all_day = 0 AND rrule IS NULL "
+            "ORDER BY starts_at"
+        )
+        pools = get_pools()
+        rows = [row for pool in pools for row in self._execute_query(query, (start, end), fetch=True, pool=pool)]
+        rules_query = (
+            "SELECT id, user_id, name, starts_at, rrule, exdates, reminded_at FROM events "
+            "WHERE rrule IS NOT NULL AND ends_at >= ? AND starts_at < ? AND all_day = 0"
+        )
+        rules = [row for pool in pools for row in self._execute_query(rules_query, (start, end), fetch=True, pool=pool)]
+        repeated = [
+            {"id": row["id"], "user_id": row["user_id"], "name": row["name"], "starts_at": starts_at}
+            for row, starts_at in expand(rules, start, end)
+            if row["reminded_at"] is None or starts_at > row["reminded_at"]
+        ]
+        if not repeated and len(pools) == 1:
+            return rows
+        return sorted(rows + repeated, key=itemgetter("starts_at"))
+
+    @timed_query
+    def skip_missed_reminders(self, before):
+        """Помечает пропущенные (например, пока бот лежал дольше допустимого) напоминания до before."""
+        query = (
+            "UPDATE events SET reminded_at = starts_at "
+            "WHERE reminded_at IS NULL AND starts_at < ? AND all_day = 0 AND rrule IS NULL"
+        )
+        return sum(self._execute_query(query, (before, ), pool=pool).rowcount for pool in get_pools())
+
+    @timed_query
+    def mark_reminded(self, event_id, starts_at, user_id=None):
+        """
+        Атомарно помечает напоминание отправленным. Возвращает False, если его уже забрал
+        другой процесс или событие удалено - тогда отправлять не нужно.
+        id уникальны только внутри шарда, поэтому при DB_SHARDS нужен user_id владельца.
+        """
+        if user_id is None and len(get_pools()) > 1:
+            raise ValueError("user_id is required to find the event's shard")
+        query = "UPDATE events SET reminded_at = ? WHERE id = ? AND (reminded_at IS NULL OR reminded_at < ?)"
+        return self._execute_query(query, (starts_at, event_id, starts_at), user_id=user_id).rowcount == 1
+
 
 class TodoCalendar(CalendarDatabase):
     def __init__(self):
         super().__init__("todos")
 
-    def save_todo(self, user_id, todo_name, todo_date):
-        self.save(user_id, todo_name, todo_date)
+    def save_todo(self, user_id, todo_name, todo_date, rrule=None):
+        self.save(user_id, todo_name, todo_date, rrule)
 
     def get_todos(self, user_id):
         return self.get_all(user_id)
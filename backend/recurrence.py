@@ -0,0 +1,201 @@
+from dataclasses import dataclass
+from datetime import MAXYEAR, date as date_cls, datetime
+from functools import lru_cache
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")
+# ends_at правила без UNTIL и COUNT: строки 'YYYY-MM-DD HH:MM' сравниваются как строки
+OPEN_END = "9999-12-31 23:59"
+MAX_COUNT = 10000
+# шаг больше бессмыслен (MONTHLY с INTERVAL=1000 - раз в 83 года) и только приближает повторения к 9999 году
+MAX_INTERVAL = 1000
+STARTS_AT_FORMAT = "%Y-%m-%d %H:%M"
+
+
+@dataclass(frozen=True)
+class Rule:
+    """Подмножество RRULE из RFC 5545: FREQ=DAILY|WEEKLY|MONTHLY, INTERVAL, UNTIL, COUNT."""
+    freq: str
+    interval: int = 1
+    until: str = None  # последний допустимый starts_at включительно, 'YYYY-MM-DD HH:MM'
+    count: int = None
+
+    def __str__(self):
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until[:10].replace('-', '')}T{self.until[11:].replace(':', '')}00")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        return ";".join(parts)
+
+
+def _until(value):
+    value = value.rstrip("Z")
+    if len(value) == 8:
+        # UNTIL без времени включает весь день
+        return datetime.strptime(value, "%Y%m%d").strftime("%Y-%m-%d 23:59")
+    return datetime.strptime(value[:15], "%Y%m%dT%H%M%S").strftime(STARTS_AT_FORMAT)
+
+
+@lru_cache(maxsize=4096)
+def parse_rule(text):
+    """'FREQ=WEEKLY;INTERVAL=2;COUNT=10' -> Rule. Неподдерживаемое правило - ValueError."""
+    fields = {}
+    for part in str(text).strip().upper().removeprefix("RRULE:").split(";"):
+        name, sep, value = part.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Invalid RRULE part: {part!r}")
+        fields[name.strip()] = value.strip()
+    freq = fields.pop("FREQ", None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+    interval = int(fields.pop("INTERVAL", "1"))
+    until = _until(fields.pop("UNTIL")) if "UNTIL" in fields else None
+    count = int(fields.pop("COUNT")) if "COUNT" in fields else None
+    fields.pop("WKST", None)
+    if fields:
+        raise ValueError(f"Unsupported RRULE parts: {', '.join(fields)}")
+    if not 1 <= interval <= MAX_INTERVAL or (count is not None and not 1 <= count <= MAX_COUNT):
+        raise ValueError(f"INTERVAL must be between 1 and {MAX_INTERVAL} and COUNT between 1 and {MAX_COUNT}")
+    if until is not None and count is not None:
+        raise ValueError("UNTIL and COUNT can't be used together")
+    return Rule(freq, interval, until, count)
+
+
+@lru_cache(maxsize=4096)
+def parse_exdates(text):
+    """Исключённые повторения хранятся строкой starts_at через запятую."""
+    return frozenset(text.split(",")) if text else frozenset()
+
+
+def _months_left(moment):
+    """Сколько месяцев от moment можно прибавить, не выйдя за 9999 год."""
+    return (MAXYEAR - moment.year) * 12 + 12 - moment.month
+
+
+def _add_months(moment, months):
+    """
+    moment + months месяцев или None, если такого дня в месяце нет (31 апреля) - как в RFC 5545.
+    months не больше _months_left(moment).
+    """
+    month = moment.month - 1 + months
+    try:
+        return moment.replace(year=moment.year + month // 12, month=month % 12 + 1)
+    except ValueError:
+        return None
+
+
+# ordinal -> 'YYYY-MM-DD': одни и те же дни нужны всем правилам, а строку собирать дорого
+_DAY_STRINGS = {}
+MAX_DAY_STRINGS = 100_000
+
+
+def _day_string(ordinal):
+    if len(_DAY_STRINGS) >= MAX_DAY_STRINGS:
+        _DAY_STRINGS.clear()
+    value = _DAY_STRINGS[ordinal] = date_cls.fromordinal(ordinal).isoformat()
+    return value
+
+
+def _day(ordinal):
+    return _DAY_STRINGS.get(ordinal) or _day_string(ordinal)
+
+
+def _ordinal(value):
+    return date_cls.fromisoformat(value[:10]).toordinal()
+
+
+def _periodic(starts_at, rule, exdates, start, end):
+    """
+    DAILY/WEEKLY: время у всех повторений одно, поэтому границы окна, UNTIL и COUNT заранее
+    переводятся в номера дней (ordinal), и в цикле остаётся только сборка строки.
+    """
+    step = rule.interval * (7 if rule.freq == "WEEKLY" else 1)
+    suffix = starts_at[10:]
+    first = _ordinal(starts_at)
+    low = first
+    if start is not None:
+        day = _ordinal(start)
+        day += _day(day) + suffix < start
+        if day > first:
+            low = first + -(-(day - first) // step) * step
+    # дни, начиная с которых повторений уже нет; после 9999-12-31 дней не бывает
+    bounds = [date_cls.max.toordinal() + 1]
+    if end is not None:
+        day = _ordinal(end)
+        bounds.append(day if _day(day) + suffix >= end else day + 1)
+    if rule.until is not None:
+        day = _ordinal(rule.until)
+        bounds.append(day + 1 if _day(day) + suffix <= rule.until else day)
+    if rule.count is not None:
+        bounds.append(first + rule.count * step)
+    days = range(low, min(bounds), step)
+    known = _DAY_STRINGS.get
+    for day in days:
+        value = (known(day) or _day_string(day)) + suffix
+        if value not in exdates:
+            yield value
+
+
+def _monthly(starts_at, rule, exdates, start, end):
+    first = datetime.strptime(starts_at, STARTS_AT_FORMAT)
+    skip = 0
+    if start is not None and start > starts_at and rule.count is None:
+        # с COUNT так нельзя: пропущенные несуществующие дни не считаются повторениями
+        begin = datetime.fromisoformat(start)
+        skip = max(0, ((begin.year - first.year) * 12 + begin.month - first.month) // rule.interval)
+    left = rule.count
+    index = skip
+    limit = _months_left(first)
+    while index * rule.interval <= limit:
+        moment = _add_months(first, index * rule.interval)
+        index += 1
+        if moment is None:
+            continue
+        value = moment.isoformat(" ", "minutes")
+        if (end is not None and value >= end) or (rule.until is not None and value > rule.until):
+            return
+        # COUNT считает и исключённые повторения (EXDATE убирает их уже после COUNT, как в RFC 5545)
+        if (start is None or value >= start) and value not in exdates:
+            yield value
+        if left is not None:
+            left -= 1
+            if not left:
+                return
+
+
+def occurrences(starts_at, rule, exdates=frozenset(), start=None, end=None):
+    """
+    Лениво генерирует starts_at повторений правила из полуинтервала [start, end).
+    Повторения до start не перебираются, а пропускаются арифметикой (кроме MONTHLY с COUNT,
+    где пропущенные 31-е числа влияют на счёт), поэтому стоимость зависит от окна, а не от возраста правила.
+    """
+    if rule.freq == "MONTHLY":
+        return _monthly(starts_at, rule, exdates, start, end)
+    return _periodic(starts_at, rule, exdates, start, end)
+
+
+def last_occurrence(starts_at, rule):
+    """Начало последнего повторения (для колонки ends_at); OPEN_END, если правило бесконечно."""
+    if rule.count is None and rule.until is None:
+        return OPEN_END
+    if rule.count is None:
+        return rule.until
+    last = starts_at
+    for last in occurrences(starts_at, rule):
+        pass
+    return last
+
+
+def expand(rows, start, end):
+    """Строки правил -> (строка, starts_at повторения) для всех повторений из [start, end)."""
+    for row in rows:
+        try:
+            rule = parse_rule(row["rrule"])
+        except ValueError:
+            # правило, сохранённое до того, как parse_rule стал строже (INTERVAL > MAX_INTERVAL):
+            # пропускаем его, а не роняем напоминания и выборки для всех
+            continue
+        for value in occurrences(row["starts_at"], rule, parse_exdates(row["exdates"]), start, end):
+            yield row, value
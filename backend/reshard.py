@@ -0,0 +1,133 @@
+"""
+Перенос пользователей между шардами БД после изменения DB_SHARDS. Для каждого пользователя
+в каждом файле (шардах и --source) вычисляется шард по новому кольцу; если он другой, записи
+пользователя (events, todos, digest_subscriptions) переезжают туда. Поисковый индекс и
+user_versions в целевом шарде ведут триггеры. Запускается при остановленных боте и backend'е:
+id в целевом шарде выдаются заново, а незавершённые диалоги удаления держат старые.
+
+    python -m backend.reshard --shards /data/a.sqlite3,/data/b.sqlite3,/data/c.sqlite3
+    python -m backend.reshard --shards /data/a.sqlite3,/data/b.sqlite3 --source /data/calendar.sqlite3
+    python -m backend.reshard --dry-run   # шарды из DB_SHARDS, только посчитать переезды
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from backend.database import DB_SHARDS, get_db_connection, migrate
+from backend.sharding import HashRing, parse_shards
+from backend.writebehind import LOG_SUFFIX
+
+logger = logging.getLogger(__name__)
+
+# сколько пользователей переносится одной транзакцией
+RESHARD_BATCH_USERS = 500
+USER_TABLES = ("events", "todos")
+
+_USERS_QUERY = (
+    "SELECT user_id FROM events UNION SELECT user_id FROM todos UNION SELECT user_id FROM digest_subscriptions"
+)
+
+
+def plan(path, ring):
+    """{путь целевого шарда: [user_id, ...]} - кому из пользователей файла path пора переехать."""
+    conn = get_db_connection(path)
+    try:
+        migrate(conn)
+        moves = {}
+        for (user_id, ) in conn.execute(_USERS_QUERY):
+            target = ring.path_of(user_id)
+            if target != path:
+                moves.setdefault(target, []).append(user_id)
+        return moves
+    finally:
+        conn.close()
+
+
+def _columns(conn, table):
+    # без id: в целевом шарде строки получают новые id, иначе они пересеклись бы с его собственными
+    return ", ".join(row["name"] for row in conn.execute(f"PRAGMA table_info({table})") if row["name"] != "id")
+
+
+def move_users(path, target, user_ids, batch_users=RESHARD_BATCH_USERS):
+    """
+    Переносит записи user_ids из path в target пачками по batch_users, каждая - одна транзакция
+    на соединении к path с подключённым (ATTACH) target. В режиме WAL SQLite не гарантирует
+    атомарность такой транзакции при падении процесса посреди коммита - только в этот момент.
+    Возвращает число перенесённых строк.
+    """
+    conn = get_db_connection(path)
+    moved = 0
+    try:
+        conn.execute("ATTACH DATABASE ? AS target", (target, ))
+        for start in range(0, len(user_ids), batch_users):
+            batch = user_ids[start:start + batch_users]
+            marks = ", ".join("?" * len(batch))
+            conn.execute("BEGIN IMMEDIATE")
+            for table in USER_TABLES:
+                columns = _columns(conn, table)
+                moved += conn.execute(
+                    f"INSERT INTO target.{table} ({columns}) SELECT {columns} FROM main.{table} "
+                    f"WHERE user_id IN ({marks})", batch,
+                ).rowcount
+                conn.execute(f"DELETE FROM main.{table} WHERE user_id IN ({marks})", batch)
+            # подписка, уже сделанная в целевом шарде, новее переносимой
+            moved += conn.execute(
+                "INSERT OR IGNORE INTO target.digest_subscriptions SELECT * FROM main.digest_subscriptions "
+                f"WHERE user_id IN ({marks})", batch,
+            ).rowcount
+            conn.execute(f"DELETE FROM main.digest_subscriptions WHERE user_id IN ({marks})", batch)
+            conn.commit()
+        conn.execute("DETACH DATABASE target")
+    finally:
+        conn.close()
+    return moved
+
+
+def reshard(shards, sources=(), dry_run=False, batch_users=RESHARD_BATCH_USERS):
+    """Раскладывает пользователей из shards и sources по кольцу shards. Возвращает сводку."""
+    ring = HashRing(shards)
+    for path in (*shards, *sources):
+        # несброшенные вставки WRITE_BEHIND=log проигрались бы после переезда в старый шард
+        log_path = f"{path}{LOG_SUFFIX}"
+        if os.path.exists(log_path) and os.path.getsize(log_path):
+            raise RuntimeError(f"{log_path} is not empty: start and stop the backend once to replay it")
+    for path in shards:
+        # у нового шарда должна быть схема до того, как в него начнут переносить
+        conn = get_db_connection(path)
+        try:
+            migrate(conn)
+        finally:
+            conn.close()
+    summary = {"shards": len(shards), "users": 0, "rows": 0, "moves": {}}
+    started = time.perf_counter()
+    for path in dict.fromkeys((*shards, *sources)):
+        for target, user_ids in plan(path, ring).items():
+            summary["users"] += len(user_ids)
+            summary["moves"][f"{path} -> {target}"] = len(user_ids)
+            if not dry_run:
+                rows = move_users(path, target, user_ids, batch_users)
+                summary["rows"] += rows
+                logger.info(f"Moved {len(user_ids)} users ({rows} rows) from {path} to {target}")
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main():
+    logging.basicConfig(format="%(asctime)s - %(levelname)s - %(message)s", level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Move users between SQLite shards after DB_SHARDS changed")
+    parser.add_argument("--shards", default=",".join(DB_SHARDS), help="новый список шардов (по умолчанию DB_SHARDS)")
+    parser.add_argument("--source", action="append", default=[],
+                        help="файл, который больше не шард (например, прежний DB_PATH); можно несколько")
+    parser.add_argument("--batch-users", type=int, default=RESHARD_BATCH_USERS)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    shards = parse_shards(args.shards)
+    if not shards:
+        parser.error("no shards: pass --shards or set DB_SHARDS")
+    print(json.dumps(reshard(shards, args.source, args.dry_run, args.batch_users), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
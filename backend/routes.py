@@ -1,15 +1,52 @@
+import io
 import os
-from flask import Flask, request, jsonify, send_from_directory
-from backend.models import EventCalendar, TodoCalendar
+import time
+from itertools import chain
+from flask import Flask, Response, g, request, jsonify, send_from_directory
+from backend import metrics
+from backend.bulk import ics_lines, import_entries, ndjson_lines, parse_ics, parse_ndjson
+from backend.cache import read_cache
+from backend.digest import DigestSubscriptions
+from backend.models import EventCalendar, TodoCalendar, normalize_date
 
 app = Flask(__name__, static_folder='frontend/public', static_url_path='')
 event_calendar = EventCalendar()
 todo_calendar = TodoCalendar()
+digest_subscriptions = DigestSubscriptions()
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Latency of backend routes", ("method", "route", "status")
+)
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def remember_status(response):
+    g.status = response.status_code
+    return response
+
+
+@app.teardown_request
+def observe_request(error=None):
+    # teardown выполняется и когда view упал (after_request тогда может не дойти до замера),
+    # поэтому ответы 500 тоже попадают в метрику
+    started = g.pop("started", None)
+    if started is None:
+        return
+    # метка - шаблон маршрута ('/events/by_date'), а не путь, чтобы число серий было ограничено
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    status = 500 if error is not None else g.get("status", 500)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, request.method, route, status)
+
 
 @app.route('/')
 def index():
     index_path = os.path.join(os.getcwd(), 'frontend', 'public', 'index.html')
-    print(f"Ищем файл: {index_path}")
+    app.logger.debug(f"Ищем файл: {index_path}")
     return send_from_directory(os.path.join(os.getcwd(), 'frontend/public'), 'index.html')
 
 
@@ -19,11 +56,15 @@ def add_event():
     user_id = data.get('user_id')
     event_name = data.get('name')
     event_date = data.get('date')
+    rrule = data.get('rrule')
 
     if not event_name or not event_date:
         return jsonify({"status": "error", "message": "Missing event name or event date!"}), 400
 
-    event_calendar.save_event(user_id, event_name, event_date)
+    try:
+        event_calendar.save_event(user_id, event_name, event_date, rrule)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid date or rrule: {e}"}), 400
     return jsonify({"status": "success", "message": "Event added successfully!"}), 201
 
 
@@ -33,11 +74,15 @@ def add_todo():
     user_id = data.get('user_id')
     todo_name = data.get('name')
     todo_date = data.get('date')
+    rrule = data.get('rrule')
     
     if not todo_name or not todo_date:
         return jsonify({"status": "error", "message": "Missing todo name or todo date!"}), 400
 
-    todo_calendar.save_todo(user_id, todo_name, todo_date)
+    try:
+        todo_calendar.save_todo(user_id, todo_name, todo_date, rrule)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid date or rrule: {e}"}), 400
     return jsonify({"status": "success", "message": "To-Do added successfully!"}), 201
 
 @app.route('/events/by_date', methods=['GET']) 
@@ -50,11 +95,55 @@ def get_data_from_date():
     if not date:
         return jsonify({"status": "error", "message": "Missing date!"}), 400
     
-    todo_events = todo_calendar.get_date_events(user_id, date)
-    calendar_events = event_calendar.get_date_events(user_id, date)
-    events = [{"name": name} for (name,) in (todo_events + calendar_events)]
+    try:
+        todo_events = todo_calendar.get_date_events(user_id, date)
+        calendar_events = event_calendar.get_date_events(user_id, date)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid date!"}), 400
+    # id и type - чтобы удалять выбранную запись (POST /entries/delete), а не все с таким именем
+    events = [dict(row) for row in (todo_events + calendar_events)]
     return jsonify(events)
 
+@app.route('/events/range', methods=['GET'])
+def get_data_from_range():
+    # параметры из query string (календарь на фронте) или из JSON, как в остальных маршрутах
+    data = request.args if request.args else (request.get_json(silent=True) or {})
+    user_id = data.get('user_id')
+    start = data.get('start')
+    end = data.get('end')
+
+    if not user_id or not start or not end:
+        return jsonify({"status": "error", "message": "Missing user_id, start or end!"}), 400
+    try:
+        start_at, _ = normalize_date(start, strict=True)
+        end_at, _ = normalize_date(end, strict=True)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid start or end!"}), 400
+
+    # версия данных пользователя меняется при любой записи, поэтому повторная загрузка
+    # неизменившегося календаря стоит одного поиска по первичному ключу и ответа 304
+    etag = f"u{user_id}-v{event_calendar.get_user_version(user_id)}"
+    if request.if_none_match.contains(etag):
+        response = app.make_response(("", 304))
+    else:
+        rows = event_calendar.get_range(user_id, start_at, end_at, with_tables=("todos", ))
+        response = jsonify({"events": [
+            {
+                "id": row["id"],
+                "type": row["type"],
+                "name": row["name"],
+                "date": row["date"],
+                "start": row["starts_at"],
+                "all_day": bool(row["all_day"]),
+                "rrule": row["rrule"],
+            }
+            for row in rows
+        ]})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @app.route('/events', methods=['GET'])
 def get_all_events():
     data = request.get_json()
@@ -63,7 +152,7 @@ def get_all_events():
         return jsonify({"status": "error", "message": "Missing user_id!"}), 400
 
     events = event_calendar.get_events(user_id)
-    return jsonify(events)
+    return jsonify([dict(row) for row in events])
 
 
 @app.route('/todos', methods=['GET'])
@@ -74,7 +163,7 @@ def get_all_todos():
         return jsonify({"status": "error", "message": "Missing user_id!"}), 400
 
     todos = todo_calendar.get_todos(user_id)
-    return jsonify(todos)
+    return jsonify([dict(row) for row in todos])
 
 
 @app.route('/events/delete', methods=['POST']) 
@@ -90,14 +179,149 @@ def delete_event():
     
     app.logger.info(f"Attempting to delete event '{name}' on {date}")
     
-    deleted_from_events = event_calendar.delete_event(user_id, name, date)
-    deleted_from_todos = todo_calendar.delete_event(user_id, name, date)
+    try:
+        deleted_from_events = event_calendar.delete_event(user_id, name, date)
+        deleted_from_todos = todo_calendar.delete_event(user_id, name, date)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid date!"}), 400
 
     app.logger.info(f"Deleted from events: {deleted_from_events}, Deleted from todos: {deleted_from_todos}")
     
     if deleted_from_events or deleted_from_todos:
         app.logger.info(f"Event deleted: {name} on {date}")
-        return jsonify({"status": "success", "message": "Event deleted successfully!"}), 200
+        return jsonify({
+            "status": "success", "message": "Event deleted successfully!",
+            "deleted": deleted_from_events + deleted_from_todos,
+        }), 200
     else:
         app.logger.error(f"Event not found: {name} on {date}")
         return jsonify({"status": "error", "message": "Event not found!"}), 404
+
+
+@app.route('/entries/delete', methods=['POST'])
+def delete_entries():
+    # entries: [{"type": "event" | "todo", "id": ..., "starts_at": ...}] из /events/by_date;
+    # starts_at нужен только для одного повторения повторяющейся записи
+    data = request.get_json()
+    user_id = data.get('user_id')
+    entries = data.get('entries')
+
+    if not user_id or not entries or not isinstance(entries, list):
+        return jsonify({"status": "error", "message": "Missing user_id or entries!"}), 400
+
+    try:
+        deleted = event_calendar.delete_entries(user_id, entries)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid entries: {e}"}), 400
+
+    if deleted:
+        app.logger.info(f"User {user_id} deleted {deleted} of {len(entries)} entries")
+        return jsonify({"status": "success", "message": "Entries deleted successfully!", "deleted": deleted}), 200
+    return jsonify({"status": "error", "message": "Entries not found!"}), 404
+
+
+@app.route('/search', methods=['GET'])
+def search():
+    user_id = request.args.get('user_id')
+    query = request.args.get('q', '')
+    if not user_id:
+        return jsonify({"status": "error", "message": "Missing user_id!"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid limit or offset!"}), 400
+    if not 1 <= limit <= 100 or offset < 0:
+        return jsonify({"status": "error", "message": "Limit must be 1..100 and offset >= 0!"}), 400
+
+    try:
+        # на одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = event_calendar.search(user_id, query, limit + 1, offset)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Empty search query!"}), 400
+    return jsonify({
+        "results": [dict(row) for row in rows[:limit]],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    })
+
+
+@app.route('/import', methods=['POST'])
+def import_data():
+    # тело - сами данные (NDJSON или iCalendar), поэтому user_id передаётся в query string
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return jsonify({"status": "error", "message": "Missing user_id!"}), 400
+
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8", errors="replace")
+    if request.mimetype == 'text/calendar':
+        parsed = parse_ics(lines)
+    elif request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json'):
+        parsed = parse_ndjson(lines)
+    else:
+        return jsonify({"status": "error", "message": "Use text/calendar or application/x-ndjson!"}), 415
+
+    report = import_entries(user_id, parsed, {"event": event_calendar, "todo": todo_calendar})
+    if "failed" in report:
+        app.logger.warning(f"User {user_id} import stopped after {report['imported']}: {report['failed']}")
+        return jsonify({"status": "error", "message": f"Import stopped: {report['failed']}", **report}), 400
+    app.logger.info(f"User {user_id} imported {report['imported']}, errors: {report['error_count']}")
+    return jsonify({"status": "success", **report}), 201
+
+
+@app.route('/export', methods=['GET'])
+def export_data():
+    user_id = request.args.get('user_id')
+    export_format = request.args.get('format', 'ndjson')
+    if not user_id:
+        return jsonify({"status": "error", "message": "Missing user_id!"}), 400
+
+    rows = chain(event_calendar.iter_all(user_id), todo_calendar.iter_all(user_id))
+    if export_format == 'ics':
+        return Response(ics_lines(rows), mimetype='text/calendar',
+                        headers={"Content-Disposition": "attachment; filename=calendar.ics"})
+    if export_format == 'ndjson':
+        return Response(ndjson_lines(rows), mimetype='application/x-ndjson')
+    return jsonify({"status": "error", "message": "Unknown format!"}), 400
+
+
+@app.route('/digest', methods=['POST'])
+def subscribe_digest():
+    data = request.get_json()
+    user_id = data.get('user_id')
+    tz = data.get('tz')
+    hour = data.get('hour')
+    day_offset = data.get('day_offset', 0)
+
+    if not user_id or not tz or hour is None:
+        return jsonify({"status": "error", "message": "Missing user_id, tz or hour!"}), 400
+
+    try:
+        digest_subscriptions.subscribe(user_id, tz, int(hour), int(day_offset))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid subscription: {e}"}), 400
+    return jsonify({"status": "success", "message": "Subscribed to digest!"}), 201
+
+
+@app.route('/digest/delete', methods=['POST'])
+def unsubscribe_digest():
+    data = request.get_json()
+    user_id = data.get('user_id')
+    if not user_id:
+        return jsonify({"status": "error", "message": "Missing user_id!"}), 400
+
+    if digest_subscriptions.unsubscribe(user_id):
+        return jsonify({"status": "success", "message": "Unsubscribed from digest!"}), 200
+    return jsonify({"status": "error", "message": "Subscription not found!"}), 404
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"status": "error", "message": "Metrics are disabled!"}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(read_cache.stats())
@@ -0,0 +1,81 @@
+import re
+from functools import lru_cache
+
+# Окончания русских слов (упрощённый стеммер в духе Snowball). Слово ищется по основе
+# как по префиксу: 'врачу' -> 'врач*' находит 'врач', 'врача', 'врачом'
+_REFLEXIVE = ("ся", "сь")
+_ENDINGS = tuple(sorted({
+    # прилагательные и причастия
+    "ее", "ие", "ые", "ое", "ими", "ыми", "ей", "ий", "ый", "ой", "ем", "им", "ым", "ом",
+    "его", "ого", "ему", "ому", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею",
+    # глаголы
+    "ла", "на", "ете", "йте", "ли", "л", "ло", "но", "ет", "ют", "ны", "ть", "ешь", "ить", "ыть",
+    "ишь", "ует", "уют", "ит", "ыт", "ены", "ено", "ите", "ил", "ыл", "ят",
+    # существительные
+    "а", "ев", "ов", "ье", "е", "иями", "ями", "ами", "еи", "ии", "и", "ией", "ий", "й", "иям", "ям",
+    "ием", "ам", "о", "у", "ах", "иях", "ях", "ы", "ь", "ию", "ью", "ю", "ия", "ья", "я",
+}, key=len, reverse=True))
+_VOWELS = "аеиоуыэюяь"
+# основа короче не обрезается: 'дом' не должен превращаться в 'до*'
+MIN_STEM = 3
+WORD_PATTERN = re.compile(r"\w+")
+MAX_TERMS = 8
+# предлоги и союзы: в названиях есть почти у всех, а префикс из 1-2 букв - самый дорогой запрос FTS5
+STOP_WORDS = frozenset(("в", "во", "на", "с", "со", "по", "к", "ко", "у", "о", "об", "от", "до", "из", "за", "и", "а",
+                        "но", "или", "для", "при", "про"))
+
+
+def normalize_text(text):
+    return text.lower().replace("ё", "е")
+
+
+@lru_cache(maxsize=16384)
+def stem(word):
+    """Основа слова для поиска по префиксу. Слова не на кириллице (цифры, латиница) не меняются."""
+    if not re.fullmatch(r"[а-я]+", word):
+        return word
+    for ending in _REFLEXIVE:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            word = word[:-len(ending)]
+            break
+    for ending in _ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            word = word[:-len(ending)]
+            break
+    # 'встречался' -> 'встреча' -> 'встреч': гласная на конце основы - тоже часть окончания
+    while len(word) > MIN_STEM and word[-1] in _VOWELS:
+        word = word[:-1]
+    return word
+
+
+def query_terms(text):
+    """Основы слов запроса без предлогов и союзов (если запрос не из них одних); пустой запрос - ValueError."""
+    words = WORD_PATTERN.findall(normalize_text(str(text)))
+    terms = [stem(word) for word in words if word not in STOP_WORDS][:MAX_TERMS] or words[:MAX_TERMS]
+    if not terms:
+        raise ValueError("Empty search query")
+    return terms
+
+
+def match_expression(user_id, terms):
+    """Выражение FTS5 MATCH: записи пользователя, в названии которых есть слова со всеми основами terms."""
+    # всё в кавычках: слова вроде AND/OR/NEAR не должны стать операторами FTS5
+    names = " AND ".join(f'"{term}"*' for term in terms)
+    user_key = f"u{user_id}".replace('"', '""')
+    return f'user_key : "{user_key}" AND name : ({names})'
+
+
+def relevance(name, terms):
+    """
+    Ключ сортировки найденного названия (меньше - выше). Все результаты содержат все слова
+    запроса, поэтому idf из bm25 у них одинаковый и остаются tf и длина названия: сначала
+    совпадения основы целиком, потом по префиксу, потом более короткие названия.
+    """
+    words = WORD_PATTERN.findall(normalize_text(name))
+    same_stem = prefixed = 0
+    for word in words:
+        for term in terms:
+            if word.startswith(term):
+                prefixed += 1
+                same_stem += stem(word) == term
+    return -same_stem, -prefixed, len(words)
@@ -0,0 +1,52 @@
+import bisect
+import hashlib
+import os
+from functools import lru_cache
+
+# сколько точек на кольце у каждого шарда: чем больше, тем ровнее пользователи делятся между шардами
+SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+
+
+def parse_shards(value):
+    """'a.sqlite3, /data/b.sqlite3' -> список путей; пустая строка - шардирования нет."""
+    return [path.strip() for path in (value or "").split(",") if path.strip()]
+
+
+def shard_name(path):
+    """Имя шарда на кольце - имя файла без расширения, чтобы шард можно было переносить между каталогами."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _point(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Консистентное хеширование user_id по шардам. Каждый шард - SHARD_VNODES точек на кольце,
+    пользователь принадлежит первой точке по часовой стрелке от хеша его id. При добавлении
+    шарда к нему переезжает примерно 1/N пользователей, остальные остаются на месте.
+    """
+
+    def __init__(self, paths, vnodes=SHARD_VNODES):
+        if not paths:
+            raise ValueError("At least one shard is required")
+        names = [shard_name(path) for path in paths]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Shard file names must be unique: {names}")
+        self.paths = list(paths)
+        ring = sorted((_point(f"{name}#{i}"), index) for index, name in enumerate(names) for i in range(vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [index for _, index in ring]
+        self._cached_shard_of = lru_cache(maxsize=65536)(self._shard_of)
+
+    def _shard_of(self, user_id):
+        position = bisect.bisect(self._points, _point(user_id)) % len(self._points)
+        return self._owners[position]
+
+    def shard_of(self, user_id):
+        """Номер шарда (индекс в paths) пользователя."""
+        return self._cached_shard_of(str(user_id))
+
+    def path_of(self, user_id):
+        return self.paths[self.shard_of(user_id)]
@@ -0,0 +1,235 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from backend import metrics
+from backend.cache import read_cache
+
+logger = logging.getLogger(__name__)
+
+# Отложенная запись вставок (save: POST /events, POST /todos, бот).
+# off - каждая вставка своим коммитом; memory - вставки копятся в очереди в памяти и фоновый поток
+# коммитит их пачкой (при падении процесса пропадает несброшенное, до WRITE_BEHIND_INTERVAL_MS);
+# log - ещё и дописываются в журнал рядом с файлом БД до ответа и проигрываются при следующем запуске.
+# Журнал, как и synchronous=NORMAL, переживает падение процесса, но не отключение питания
+_MODE = os.getenv("WRITE_BEHIND", "off").lower()
+WRITE_BEHIND = "off" if _MODE in ("", "0", "false", "no", "off") else "log" if _MODE == "log" else "memory"
+# сколько ждать остальные вставки после первой и сколько строк коммитить сразу, не дожидаясь
+WRITE_BEHIND_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_INTERVAL_MS", "5"))
+WRITE_BEHIND_BATCH = int(os.getenv("WRITE_BEHIND_BATCH", "500"))
+# журнал шарда - файл БД с этим суффиксом, как -wal у SQLite
+LOG_SUFFIX = "-writes.log"
+
+_INSERT = (
+    "INSERT INTO {table} (user_id, name, date, starts_at, all_day, rrule, ends_at, exdates) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+FLUSH_SECONDS = metrics.histogram("calendar_write_behind_flush_seconds", "Latency of write-behind group commits")
+FLUSHED_ROWS = metrics.counter("calendar_write_behind_rows", "Rows inserted by write-behind group commits")
+
+
+class WriteBuffer:
+    """
+    Очередь вставок одного файла БД (шарда) с групповым коммитом. Фоновый поток коммитит
+    накопленное одной транзакцией, когда после первой вставки прошло interval секунд или
+    набралось batch строк. Чтение данных пользователя, у которого есть несброшенные вставки,
+    сначала сбрасывает очередь (sync), поэтому их видит. После коммита вставленные строки
+    (уже с id) передаются в on_flush(rows, table) - подписчикам CalendarDatabase.
+    """
+
+    def __init__(self, pool, on_flush=None, log_path=None,
+                 interval=WRITE_BEHIND_INTERVAL_MS / 1000, batch=WRITE_BEHIND_BATCH):
+        self.pool = pool
+        self.on_flush = on_flush
+        self.log_path = log_path
+        self.interval = interval
+        self.batch = batch
+        self._pending = []  # (seq, таблица, строка для _INSERT)
+        self._users = {}  # user_id -> число его несброшенных вставок
+        self._seq = 0
+        self._log = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # один сброс за раз: фоновый поток и читатели, которым нужны свои вставки
+        self._flush_lock = threading.Lock()
+        if log_path:
+            self._open_log()
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def _open_log(self):
+        """Проигрывает записи журнала, которых ещё нет в БД, и открывает его на дозапись."""
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT seq FROM write_behind_log WHERE id = 1").fetchone()
+        flushed = self._seq = row["seq"] if row else 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        seq, table, values = json.loads(line)
+                    except ValueError:
+                        break  # строка, недописанная при падении, - последняя
+                    self._seq = max(self._seq, seq)
+                    if seq > flushed:
+                        self._pending.append((seq, table, tuple(values)))
+                        self._count(values[0], 1)
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} write-behind rows from {self.log_path}")
+            self.flush()
+
+    def _count(self, user_id, delta):
+        user_id = str(user_id)
+        left = self._users.get(user_id, 0) + delta
+        if left:
+            self._users[user_id] = left
+        else:
+            del self._users[user_id]
+
+    def add(self, table, row):
+        """Ставит вставку row в очередь. В режиме журнала возвращается, когда строка уже в журнале."""
+        with self._lock:
+            self._seq += 1
+            if self._log is not None:
+                self._log.write(json.dumps([self._seq, table, row], ensure_ascii=False) + "\n")
+                self._log.flush()
+            self._pending.append((self._seq, table, row))
+            self._count(row[0], 1)
+            if len(self._pending) == 1 or len(self._pending) >= self.batch:
+                self._wakeup.notify()
+
+    def sync(self, user_id):
+        """Сбрасывает очередь, если в ней есть вставки user_id: после этого чтение из БД их видит."""
+        if str(user_id) in self._users:
+            self.flush(user_id)
+
+    def flush(self, user_id=None):
+        """
+        Коммитит всё накопленное одной транзакцией. С user_id - только если вставки этого
+        пользователя ещё не закоммитил сброс, который шёл, пока мы ждали своей очереди.
+        Возвращает число вставленных строк.
+        """
+        with self._flush_lock:
+            if user_id is not None and str(user_id) not in self._users:
+                return 0
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with FLUSH_SECONDS.time():
+                    saved = self._commit(batch)
+            except BaseException:
+                # строки остаются в очереди (и в журнале) до следующей попытки
+                with self._lock:
+                    self._pending[:0] = batch
+                raise
+            users = {str(row[0]) for _, _, row in batch}
+            for user_id in users:
+                read_cache.invalidate_user(user_id)
+            with self._lock:
+                for _, _, row in batch:
+                    self._count(row[0], -1)
+                if self._log is not None:
+                    self._compact_log()
+            FLUSHED_ROWS.inc(amount=len(batch))
+        if self.on_flush is not None:
+            for table, rows in saved.items():
+                self.on_flush(rows, table)
+        return len(batch)
+
+    def _compact_log(self):
+        """
+        Оставляет в журнале только вставки, добавленные после закоммиченного seq (они в _pending):
+        иначе при непрерывной нагрузке очередь никогда не пустеет и журнал растёт без конца.
+        Вызывается под _lock, поэтому add не пишет в журнал, пока он переписывается.
+        """
+        if not self._pending:
+            self._log.truncate(0)
+            return
+        compacted = f"{self.log_path}.tmp"
+        with open(compacted, "w", encoding="utf-8") as log:
+            log.writelines(json.dumps([seq, table, row], ensure_ascii=False) + "\n" for seq, table, row in self._pending)
+        self._log.close()
+        # до замены остаётся старый журнал: его закоммиченные строки отсеет seq из write_behind_log
+        os.replace(compacted, self.log_path)
+        self._log = open(self.log_path, "a", encoding="utf-8")
+
+    def _commit(self, batch):
+        by_table = {}
+        for _, table, row in batch:
+            by_table.setdefault(table, []).append(row)
+        saved = {}
+        with self.pool.connection() as conn:
+            # BEGIN IMMEDIATE: новые строки - ровно те, у которых id больше прежнего максимума (как в save_many)
+            conn.execute("BEGIN IMMEDIATE")
+            for table, rows in by_table.items():
+                last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+                conn.executemany(_INSERT.format(table=table), rows)
+                if self.on_flush is not None:
+                    saved[table] = [dict(row) for row in conn.execute(
+                        f"SELECT id, user_id, name, starts_at, all_day, rrule, exdates FROM {table} WHERE id > ?",
+                        (last_id, )
+                    )]
+            if self._log is not None:
+                conn.execute(
+                    "INSERT INTO write_behind_log (id, seq) VALUES (1, ?) ON CONFLICT (id) DO UPDATE SET seq = excluded.seq",
+                    (batch[-1][0], ),
+                )
+            conn.commit()
+        return saved
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._wakeup.wait()
+                # первая вставка уже ждёт - даём остальным набраться до interval или batch
+                deadline = time.monotonic() + self.interval
+                while len(self._pending) < self.batch:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._wakeup.wait(left)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception(f"Write-behind flush to {self.pool.path} failed, will retry")
+                time.sleep(self.interval)
+
+
+_buffers = {}  # пул -> WriteBuffer
+_buffers_lock = threading.Lock()
+
+
+def start(pools, on_flush=None):
+    """
+    Создаёт очереди для pools, если WRITE_BEHIND включён (один раз на процесс), и проигрывает
+    их журналы - чтобы до первого запроса в БД было всё, что не успели сбросить до падения.
+    """
+    if WRITE_BEHIND == "off":
+        return
+    with _buffers_lock:
+        for pool in pools:
+            if pool not in _buffers:
+                log_path = f"{pool.path}{LOG_SUFFIX}" if WRITE_BEHIND == "log" else None
+                _buffers[pool] = WriteBuffer(pool, on_flush, log_path)
+
+
+def get_buffer(pool):
+    """Очередь вставок файла БД pool или None, если WRITE_BEHIND выключен."""
+    return _buffers.get(pool)
+
+
+def flush_all():
+    for buffer in list(_buffers.values()):
+        try:
+            buffer.flush()
+        except Exception:
+            logger.exception(f"Write-behind flush to {buffer.pool.path} failed")
+
+
+atexit.register(flush_all)
@@ -0,0 +1,67 @@
+"""
+Состояние диалогов в SQLite (bot/persistence.py) в масштабе: users пользователей по очереди
+меняют состояние при ограничении памяти max_active; меряем remember, пакетную запись и
+пиковую память. Продолжение диалогов после рестарта, TTL и вытеснение проверяют
+tests/test_persistence.py.
+
+    python -m benchmarks.bench_conversation_state --users 200000 --max-active 50000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import report, use_temp_db
+
+
+async def scale_scenario(users, max_active, batch):
+    from bot.persistence import ConversationStore
+
+    dropped = []
+    store = ConversationStore(drop=dropped.append, max_active=max_active)
+    tracemalloc.start()
+    remember_time = flush_time = 0.0
+    flushes = 0
+    for start in range(0, users, batch):
+        t0 = time.perf_counter()
+        for user_id in range(start, min(start + batch, users)):
+            user_data = {}
+            await store.restore(user_id, user_data)
+            user_data.update(state="awaiting_event_name", type="event", temp_date="2030-01-15 15:00")
+            store.remember(user_id, user_data)
+        remember_time += time.perf_counter() - t0
+        t0 = time.perf_counter()
+        await store.flush()
+        flush_time += time.perf_counter() - t0
+        flushes += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "users": users,
+        "max_active": max_active,
+        "active_in_memory": len(store),
+        "dropped": len(dropped),
+        "restore_remember_per_sec": round(users / remember_time, 1),
+        "rows_per_sec_written": round(store.written / flush_time, 1),
+        "flushes": flushes,
+        "peak_traced_mb": round(peak / 1024 / 1024, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--max-active", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=5_000, help="сколько обновлений между записями в БД")
+    args = parser.parse_args()
+
+    use_temp_db("conversations")
+    from backend.database import init_db
+
+    init_db()
+    scale = await scale_scenario(args.users, args.max_active, args.batch)
+    report("conversation_state", {"scale": scale})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
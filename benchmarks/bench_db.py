@@ -0,0 +1,64 @@
+"""
+Сравнение пропускной способности запросов CalendarDatabase:
+новое соединение на каждый запрос (как было) против пула с WAL.
+
+    python -m benchmarks.bench_db --rows 10000 --iterations 2000
+"""
+import argparse
+import sqlite3
+
+from benchmarks.common import measure, report, temp_db_path, use_temp_db
+
+
+def baseline_query(path, query, params, fetch):
+    # старый путь: connect -> execute -> commit/fetch -> close, журнал по умолчанию
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    result = cursor.fetchall() if fetch else conn.commit()
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2_000)
+    args = parser.parse_args()
+
+    path = use_temp_db("bench_db")
+    # отдельный файл для старого пути, чтобы WAL (он сохраняется в файле) не искажал сравнение
+    baseline_path = temp_db_path("bench_db_baseline")
+    from backend.models import EventCalendar
+
+    calendar = EventCalendar()
+    for db in (path, baseline_path):
+        with sqlite3.connect(db) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "user_id TEXT NOT NULL, name TEXT NOT NULL, date TEXT NOT NULL)"
+            )
+            conn.executemany(
+                "INSERT INTO events (user_id, name, date) VALUES (?, ?, ?)",
+                ((str(i % args.users), f"event {i}", f"2025-03-{i % 28 + 1:02d} 10:00")
+                 for i in range(args.rows)),
+            )
+
+    read_sql = "SELECT name FROM events WHERE DATE(date) = ? AND user_id = ?"
+    write_sql = "INSERT INTO events (user_id, name, date) VALUES (?, ?, ?)"
+    read_params = ("2025-03-10", "7")
+    write_params = ("7", "bench", "2025-03-10 10:00")
+
+    results = {
+        "baseline_read": measure(lambda: baseline_query(baseline_path, read_sql, read_params, True), args.iterations),
+        "pooled_read": measure(lambda: calendar.get_date_events("7", "2025-03-10"), args.iterations),
+        "baseline_write": measure(lambda: baseline_query(baseline_path, write_sql, write_params, False), args.iterations),
+        "pooled_write": measure(lambda: calendar.save("7", "bench", "2025-03-10 10:00"), args.iterations),
+    }
+    report("db_queries", {"rows": args.rows, **results})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Ежедневная сводка (bot/digest.py) для --users подписчиков одного шарда.
+
+Сравнивает наивный вариант (по два get_date_events на пользователя) с DigestJob.run_shard:
+одним потоковым запросом по шарду и отправкой пачками. Отправка - фейковая с задержкой
+--latency, чтобы было видно, что чтение не ждёт отправки всего шарда.
+
+    python -m benchmarks.bench_digest --users 5000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import report, use_temp_db
+
+TZ = "Europe/Moscow"
+HOUR = 8
+
+
+def fill(users, per_user, today):
+    from backend.digest import DigestSubscriptions
+    from backend.models import EventCalendar, TodoCalendar
+
+    events, todos, subscriptions = EventCalendar(), TodoCalendar(), DigestSubscriptions()
+    rng = random.Random(1)
+    first = date.fromisoformat(today) - timedelta(days=3)
+    for user in range(users):
+        user_id = str(100_000 + user)
+        entries = [
+            (f"event {i}", f"{first + timedelta(days=rng.randrange(10))} {rng.randrange(24):02d}:00")
+            for i in range(per_user)
+        ]
+        if user % 5 == 0:
+            entries.append(("планёрка", f"{first} 10:00", "FREQ=DAILY"))
+        events.save_many(user_id, entries)
+        todos.save_many(user_id, [(f"todo {user}", str(first + timedelta(days=rng.randrange(10))))])
+        subscriptions.subscribe(user_id, TZ, HOUR, user % 2)
+    return events, todos, subscriptions
+
+
+def naive(events, todos, subscriptions, users, today):
+    day = date.fromisoformat(today)
+    messages = 0
+    for user in range(users):
+        user_id = str(100_000 + user)
+        subscription = subscriptions.get(user_id)
+        target = (day + timedelta(days=subscription["day_offset"])).isoformat()
+        if events.get_date_events(user_id, target) + todos.get_date_events(user_id, target):
+            messages += 1
+    return messages
+
+
+async def streaming(subscriptions, today, latency):
+    from bot.digest import DigestJob
+
+    async def send(user_id, text):
+        await asyncio.sleep(latency)
+
+    job = DigestJob(subscriptions, send)
+    reports = [await job.run_shard(TZ, HOUR, day_offset, today) for day_offset in (0, 1)]
+    return {
+        "messages": sum(r["messages"] for r in reports),
+        "users": sum(r["users"] for r in reports),
+        "seconds": round(sum(r["seconds"] for r in reports), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--per-user", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейковой отправки, с")
+    args = parser.parse_args()
+
+    use_temp_db("digest")
+    from backend.cache import read_cache
+
+    today = date.today().isoformat()
+    events, todos, subscriptions = fill(args.users, args.per_user, today)
+    read_cache.clear()
+    started = time.perf_counter()
+    naive_messages = naive(events, todos, subscriptions, args.users, today)
+    naive_seconds = time.perf_counter() - started
+    results = {
+        "users": args.users,
+        "per_user": args.per_user,
+        "naive": {"messages": naive_messages, "seconds": round(naive_seconds, 3)},
+        "streaming": asyncio.run(streaming(subscriptions, today, args.latency)),
+    }
+    report("digest", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Пропускная способность и справедливость MessageDispatcher против фейкового Bot API.
+
+Одновременно идут массовые уведомления (много чатов, в некоторых - пачки сообщений)
+и интерактивные ответы; меряем скорость отправки, число 429 и задержку ответов.
+
+    python -m benchmarks.bench_dispatcher --chats 200 --bulk 600 --interactive 50
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from benchmarks.common import report, summarize
+from benchmarks.fake_telegram import FakeTelegramServer
+from bot.dispatcher import BULK, INTERACTIVE, MessageDispatcher
+
+
+def jain_index(values):
+    """Индекс справедливости Джейна: 1.0 - все получили поровну."""
+    values = [v for v in values if v > 0]
+    if not values:
+        return None
+    return round(sum(values) ** 2 / (len(values) * sum(v * v for v in values)), 4)
+
+
+async def run(args):
+    server = await FakeTelegramServer(global_rate=args.global_rate, latency=args.latency).start()
+    # как в Application.builder(): пул соединений, а не одно соединение по умолчанию у Bot
+    bot = Bot("123:fake", base_url=server.base_url, request=HTTPXRequest(connection_pool_size=64))
+    await bot.initialize()
+    dispatcher = MessageDispatcher(bot, global_rate=args.global_rate)
+    dispatcher.start()
+
+    rng = random.Random(1)
+    # чат 0 получает пачку сообщений сразу, чтобы проверить, что он не душит остальных
+    bulk_targets = [0] * args.hot + [1 + i % args.chats for i in range(args.bulk - args.hot)]
+    rng.shuffle(bulk_targets)
+    finished = {}
+    interactive_latency = []
+
+    async def bulk(chat_id, i):
+        await dispatcher.send(chat_id, f"bulk {i}", priority=BULK)
+        finished[chat_id] = time.perf_counter()
+
+    async def interactive(i):
+        await asyncio.sleep(rng.random() * args.bulk / args.global_rate)
+        started = time.perf_counter()
+        await dispatcher.send(100_000 + i, f"reply {i}", priority=INTERACTIVE)
+        interactive_latency.append((time.perf_counter() - started) * 1e6)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(bulk(chat_id, i) for i, chat_id in enumerate(bulk_targets)),
+        *(interactive(i) for i in range(args.interactive)),
+    )
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+    await bot.shutdown()
+    await server.stop()
+
+    total = args.bulk + args.interactive
+    completion = [finished[c] - started for c in finished if c != 0]
+    report("dispatcher", {
+        "messages": total,
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_sec": round(total / elapsed, 1),
+        "server_429": server.rejected,
+        "dispatcher": dispatcher.metrics(),
+        "interactive_latency": summarize(interactive_latency, elapsed),
+        "bulk_completion_fairness": jain_index(completion),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--bulk", type=int, default=600)
+    parser.add_argument("--interactive", type=int, default=50)
+    parser.add_argument("--hot", type=int, default=10, help="сообщений в один 'горячий' чат")
+    parser.add_argument("--global-rate", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Миграция схемы на большой базе: время миграции, планы и время запросов до и после.
+
+    python -m benchmarks.bench_migration --rows 1000000
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from benchmarks.common import measure, report, use_temp_db
+
+DAY_QUERY_V1 = "SELECT name FROM events WHERE DATE(date) = ? AND user_id = ?"
+DAY_QUERY_V2 = "SELECT name FROM events WHERE user_id = ? AND starts_at >= ? AND starts_at < ?"
+
+
+def build_v1_database(path, rows, users):
+    """Создаёт базу в исходной схеме (без индексов и starts_at), user_version = 1."""
+    from backend.database import _create_tables
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    _create_tables(conn.cursor())
+    for table in ("events", "todos"):
+        conn.executemany(
+            f"INSERT INTO {table} (user_id, name, date) VALUES (?, ?, ?)",
+            (
+                (str(rng.randrange(users)), f"{table} {i}",
+                 f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                 + (f" {rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}" if table == "events" else ""))
+                for i in range(rows)
+            ),
+        )
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+
+def query_plan(conn, query, params):
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="строк в каждой таблице")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    path = use_temp_db("bench_migration")
+    build_v1_database(path, args.rows, args.users)
+
+    from backend.database import get_db_connection, migrate
+
+    conn = get_db_connection(path)
+    v1_params = ("2025-03-10", "7")
+    v2_params = ("7", "2025-03-10", "2025-03-11")
+    before = {
+        "plan": query_plan(conn, DAY_QUERY_V1, v1_params),
+        "query": measure(lambda: conn.execute(DAY_QUERY_V1, v1_params).fetchall(), max(1, args.iterations // 20)),
+    }
+
+    started = time.perf_counter()
+    version = migrate(conn)
+    migration_seconds = time.perf_counter() - started
+
+    after = {
+        "plan": query_plan(conn, DAY_QUERY_V2, v2_params),
+        "query": measure(lambda: conn.execute(DAY_QUERY_V2, v2_params).fetchall(), args.iterations),
+    }
+    conn.close()
+
+    report("schema_migration", {
+        "rows_per_table": args.rows,
+        "schema_version": version,
+        "migration_seconds": round(migration_seconds, 3),
+        "before": before,
+        "after": after,
+    })
+
+
+if __name__ == "__main__":
+    main()
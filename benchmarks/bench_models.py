@@ -0,0 +1,120 @@
+"""
+Микробенчмарки моделей на синтетической БД (benchmarks/synthetic.py): каждый публичный метод
+CalendarDatabase/EventCalendar, а также parse_datetime и event_or_todo из бота.
+Запросы идут от случайных пользователей, поэтому попадания в read_cache - как при живой нагрузке;
+--no-cache отключает кеш и меряет сам SQLite.
+
+    python -m benchmarks.bench_models --rows 10000
+    python -m benchmarks.bench_models --rows 1000000 --iterations 2000
+    python -m benchmarks.bench_models --rows 10000000 --no-cache
+"""
+import argparse
+import itertools
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+
+from benchmarks.common import measure, report
+from benchmarks.synthetic import PER_USER, default_path, synthetic_db, user_id_of
+
+PHRASES = ("завтра в 15:00", "сегодня", "в пятницу в 9:30", "25 декабря", "через 3 дня в 18:00", "15.01.2030 10:00")
+
+
+def bench_models(rows, per_user, iterations, rng):
+    from backend.models import EventCalendar, TodoCalendar
+
+    events, todos = EventCalendar(), TodoCalendar()
+    users = max(1, rows // per_user)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def user():
+        return user_id_of(rng.randrange(users))
+
+    def day(spread=365):
+        return (today + timedelta(days=rng.randint(-spread, spread))).strftime("%Y-%m-%d")
+
+    def moment():
+        return (today + timedelta(days=rng.randint(-365, 365), minutes=rng.randrange(0, 1440, 15)))
+
+    # удаляемые записи создаются заранее, чтобы мерить только delete_event и delete_entries
+    doomed = [(user(), f"doomed {i}", day()) for i in range(iterations)]
+    for user_id, name, date in doomed:
+        events.save(user_id, name, date)
+    doomed_iter = iter(doomed)
+    doomed_ids = iter([
+        (user_id, [{"type": "event", "id": events.save(user_id, f"doomed id {i}", date)}])
+        for i, (user_id, _, date) in enumerate(doomed)
+    ])
+    event_ids = [row["id"] for row in events._execute_query("SELECT id FROM events WHERE rrule IS NULL LIMIT 10000", fetch=True)]
+    counter = itertools.count()
+
+    def window(length, fmt="%Y-%m-%d %H:%M"):
+        start = moment()
+        return start.strftime(fmt), (start + length).strftime(fmt)
+
+    cases = {
+        "save": lambda: events.save(user(), f"bench {next(counter)}", moment().strftime("%Y-%m-%d %H:%M")),
+        "save_many_100": lambda: todos.save_many(user(), [(f"bulk {next(counter)}", day()) for _ in range(100)]),
+        "get_date_events": lambda: events.get_date_events(user(), day()),
+        "get_all": lambda: events.get_all(user()),
+        "get_range_month": lambda: events.get_range(user(), *window(timedelta(days=30), "%Y-%m-%d"), with_tables=("todos", )),
+        "get_user_version": lambda: events.get_user_version(user()),
+        "delete_event": lambda: events.delete_event(*next(doomed_iter)),
+        "delete_entries": lambda: events.delete_entries(*next(doomed_ids)),
+        "iter_all": lambda: sum(1 for _ in todos.iter_all(user())),
+        "get_pending_reminders_hour": lambda: events.get_pending_reminders(*window(timedelta(hours=1))),
+        "skip_missed_reminders": lambda: events.skip_missed_reminders(moment().strftime("%Y-%m-%d %H:%M")),
+        "mark_reminded": lambda: events.mark_reminded(rng.choice(event_ids), moment().strftime("%Y-%m-%d %H:%M")),
+    }
+    return {name: measure(fn, iterations) for name, fn in cases.items()}
+
+
+def bench_bot_helpers(iterations, rng):
+    from bot.dateparsing import parse_datetime, warm_up
+    from bot.states import event_or_todo
+
+    warm_up()
+    dates = ["2030-01-15", "2030-01-15 10:00"]
+    return {
+        "parse_datetime": measure(lambda: parse_datetime(rng.choice(PHRASES)), iterations),
+        "event_or_todo": measure(lambda: event_or_todo(rng.choice(dates)), iterations * 10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000, help="размер синтетической БД: 10000, 1000000, 10000000")
+    parser.add_argument("--per-user", type=int, default=PER_USER)
+    parser.add_argument("--iterations", type=int, default=1_000)
+    parser.add_argument("--no-cache", action="store_true", help="отключить read_cache")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # настройки backend'а читаются при первом импорте, поэтому окружение - до него.
+    # Бенчмарк пишет в БД, поэтому работает с копией, а готовая остаётся для следующих прогонов
+    if args.no_cache:
+        os.environ["READ_CACHE_ENTRIES"] = "0"
+    work_path = f"{default_path(args.rows, args.per_user)}.work"
+    os.environ["DB_PATH"] = work_path
+    path = synthetic_db(args.rows, args.per_user)
+    shutil.copyfile(path, work_path)
+
+    rng = random.Random(args.seed)
+    try:
+        results = {
+            "rows": args.rows,
+            "users": max(1, args.rows // args.per_user),
+            "read_cache": not args.no_cache,
+            "models": bench_models(args.rows, args.per_user, args.iterations, rng),
+            "bot": bench_bot_helpers(args.iterations, rng),
+        }
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(work_path + suffix):
+                os.remove(work_path + suffix)
+    report("models", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Корпус реальных формулировок дат: время разбора на каждую фразу и сверка
+с прежней реализацией parse_datetime (dateparser на каждое сообщение).
+
+    python -m benchmarks.bench_parse_datetime --iterations 200
+
+Завершается с кодом 1, если результат разошёлся с прежним вне KNOWN_DIVERGENCES.
+"""
+import argparse
+import re
+import sys
+import time
+
+from benchmarks.common import measure, report
+
+CORPUS = [
+    "сегодня", "завтра", "послезавтра", "вчера", "Завтра", "  завтра  ", "завтра!",
+    "завтра в 15:00", "Завтра в 15:00", "завтра 15:00", "завтра в 09:30", "сегодня в 18:45",
+    "сегодня в 9:30", "послезавтра в 12:00",
+    "в 15:00", "15:00", "в 07:15",
+    "понедельник", "в понедельник", "во вторник", "в среду", "в среду в 10:00", "четверг",
+    "пятница", "в пятницу 18:00", "в субботу", "воскресенье", "пн", "сб",
+    "25 марта", "25 марта в 10:00", "1 января 2026", "12 мая", "31 декабря в 23:59",
+    "25.03", "25.03.2025", "25.03 в 10:00", "01.05.26",
+    "2025-03-25", "2025-03-25 14:00",
+    "через 2 дня", "через неделю", "сегодня вечером", "30 февраля", "абракадабра",
+]
+
+# Прежний search_dates путает день и месяц в числовых датах ('25.03' -> None,
+# '25.03.2025' -> 2025-10-18); быстрый разбор возвращает для них правильную дату.
+KNOWN_DIVERGENCES = {"25.03", "25.03.2025", "25.03 в 10:00", "01.05.26"}
+
+
+def legacy_parse_datetime(text):
+    """Прежняя реализация из bot/states.py, без изменений."""
+    from dateparser.search import search_dates
+
+    parsed_date = search_dates(text, languages=["ru"])
+    pattern_time = re.search(r'\d\d:\d\d', text)
+
+    if not parsed_date:
+        return None
+
+    date = parsed_date[0][1].strftime("%Y-%m-%d %H:%M") if pattern_time is not None \
+            else parsed_date[0][1].strftime("%Y-%m-%d")
+
+    return date
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    from bot import dateparsing
+
+    started = time.perf_counter()
+    dateparsing.warm_up()
+    warm_up_ms = (time.perf_counter() - started) * 1000
+
+    phrases, mismatches, fast_hits = {}, [], 0
+    for text in CORPUS:
+        expected = legacy_parse_datetime(text)
+        actual = dateparsing.parse_datetime(text)
+        fast = dateparsing.fast_parse(dateparsing.normalize(text), time_now()) is not None
+        fast_hits += fast
+        if expected != actual and text not in KNOWN_DIVERGENCES:
+            mismatches.append({"text": text, "legacy": expected, "new": actual})
+        phrases[text] = {
+            "legacy": measure(lambda: legacy_parse_datetime(text), max(1, args.iterations // 10)),
+            "new": measure(lambda: dateparsing.parse_datetime(text), args.iterations),
+            "fast_path": fast,
+            "result": actual,
+        }
+
+    legacy_mean = sum(p["legacy"]["mean_us"] for p in phrases.values()) / len(phrases)
+    new_mean = sum(p["new"]["mean_us"] for p in phrases.values()) / len(phrases)
+    report("parse_datetime", {
+        "phrases": len(CORPUS),
+        "fast_path_share": round(fast_hits / len(CORPUS), 3),
+        "warm_up_ms": round(warm_up_ms, 1),
+        "legacy_mean_us": round(legacy_mean, 1),
+        "new_mean_us": round(new_mean, 1),
+        "mismatches": mismatches,
+        "per_phrase": phrases,
+    })
+    if mismatches:
+        sys.exit(1)
+
+
+def time_now():
+    from datetime import datetime
+
+    return datetime.now().replace(second=0, microsecond=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Разворачивание повторяющихся событий (backend/recurrence.py) на год вперёд для одного пользователя.
+
+У пользователя --rules правил (поровну DAILY/WEEKLY/MONTHLY, часть с COUNT/UNTIL и исключениями)
+и --single разовых событий. Меряем чистое разворачивание правил и get_range за год
+с тёплым и холодным read_cache. Если p50 разворачивания больше --budget-ms, выходит с кодом 1.
+
+    python -m benchmarks.bench_recurrence --rules 50 --iterations 200
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.common import measure, report, use_temp_db
+
+USER_ID = "42"
+RULES = (
+    "FREQ=DAILY",
+    "FREQ=WEEKLY",
+    "FREQ=MONTHLY",
+    "FREQ=DAILY;INTERVAL=2;COUNT=300",
+    "FREQ=WEEKLY;INTERVAL=2;UNTIL=20991231",
+    "FREQ=MONTHLY;COUNT=24",
+)
+
+
+def fill(calendar, rules, single, first):
+    entries = []
+    for i in range(rules):
+        starts_at = first - timedelta(days=i * 11, hours=i % 9)
+        exdates = ",".join((starts_at + timedelta(weeks=k)).strftime("%Y-%m-%d %H:%M") for k in range(1, 4))
+        entries.append((f"rule {i}", starts_at.strftime("%Y-%m-%d %H:%M"), RULES[i % len(RULES)], exdates))
+    for i in range(single):
+        entries.append((f"single {i}", (first + timedelta(hours=i * 7)).strftime("%Y-%m-%d %H:%M")))
+    calendar.save_many(USER_ID, entries)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", type=int, default=50)
+    parser.add_argument("--single", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    use_temp_db("recurrence")
+    from backend.cache import read_cache
+    from backend.models import EventCalendar
+    from backend.recurrence import expand
+
+    calendar = EventCalendar()
+    first = datetime.now().replace(minute=0, second=0, microsecond=0)
+    fill(calendar, args.rules, args.single, first)
+    start = first.strftime("%Y-%m-%d")
+    end = (first + timedelta(days=args.days)).strftime("%Y-%m-%d")
+
+    rules = calendar._rules(USER_ID, start, end)
+    occurrences = sum(1 for _ in expand(rules, start, end))
+
+    def cold_range():
+        read_cache.clear()
+        calendar.get_range(USER_ID, start, end)
+
+    expansion = measure(lambda: sum(1 for _ in expand(rules, start, end)), args.iterations)
+    results = {
+        "rules": len(rules),
+        "single": args.single,
+        "days": args.days,
+        "occurrences": occurrences,
+        "expand_year": expansion,
+        "get_range_year_warm": measure(lambda: calendar.get_range(USER_ID, start, end), args.iterations),
+        "get_range_year_cold": measure(cold_range, args.iterations),
+        "budget_ms": args.budget_ms,
+    }
+    results["within_budget"] = expansion["p50_us"] / 1000 <= args.budget_ms
+    report("recurrence", results)
+    return 0 if results["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""
+Полнотекстовый поиск (entries_fts) против LIKE '%...%' для пользователя с --entries записями
+в БД, где есть и другие пользователи (--others записей). read_cache отключён, чтобы мерить SQLite.
+Если p99 поиска больше --budget-ms, выходит с кодом 1.
+
+    python -m benchmarks.bench_search --entries 100000 --others 200000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+
+from benchmarks.common import measure, report, use_temp_db
+
+USER_ID = "42"
+# частые слова в разных формах и редкие - названия похожи на настоящие
+COMMON = ("встреча", "встречи", "созвон", "обед", "купить", "позвонить", "отчёт", "планёрка", "тренировка", "день")
+RARE = ("врачу", "стоматолог", "бассейн", "презентация", "командировка", "юбилей", "ремонт", "паспорт", "нотариус",
+        "дедлайн", "собеседование", "техосмотр", "вебинар", "ветеринар", "концерт", "самолёт", "экзамен", "садик")
+FILLER = ("с", "по", "в", "маме", "коллегами", "проекту", "клиентом", "Ивану", "молоко", "хлеб", "машину", "офисе")
+QUERIES = ("врач", "стоматологу", "встречу с клиентом", "отчет по проекту", "планерки", "паспорт", "концерта", "юбилей мамы")
+
+
+def random_name(rng):
+    words = [rng.choice(COMMON) if rng.random() < 0.6 else rng.choice(RARE)]
+    words += [rng.choice(FILLER) for _ in range(rng.randint(1, 3))]
+    return " ".join(words)
+
+
+def fill(entries, others, rng):
+    from backend.models import EventCalendar, TodoCalendar
+
+    events, todos = EventCalendar(), TodoCalendar()
+    for owner, count in ((USER_ID, entries), *((str(1000 + i), 500) for i in range(others // 500))):
+        batch = [(random_name(rng), f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00") for _ in range(count)]
+        half = len(batch) // 2
+        events.save_many(owner, batch[:half])
+        todos.save_many(owner, batch[half:])
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--others", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--budget-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    use_temp_db("search")
+    os.environ["READ_CACHE_ENTRIES"] = "0"
+    rng = random.Random(3)
+    calendar = fill(args.entries, args.others, rng)
+    # объекты от заполнения БД больше не нужны: сборка мусора по ним не должна попадать в p99
+    gc.collect()
+    gc.freeze()
+
+    def like(text):
+        pattern = f"%{text}%"
+        return calendar._execute_query(
+            "SELECT id, name FROM events WHERE user_id = ? AND name LIKE ? "
+            "UNION ALL SELECT id, name FROM todos WHERE user_id = ? AND name LIKE ? LIMIT 20",
+            (USER_ID, pattern, USER_ID, pattern), fetch=True,
+        )
+
+    queries = {}
+    for text in QUERIES:
+        queries[text] = {
+            "hits_first_page": len(calendar.search(USER_ID, text)),
+            "fts": measure(lambda: calendar.search(USER_ID, text), args.iterations),
+            "fts_page_5": measure(lambda: calendar.search(USER_ID, text, offset=80), args.iterations),
+            "like": measure(lambda: like(text), max(1, args.iterations // 10)),
+        }
+    worst = max(result["fts"]["p99_us"] for result in queries.values()) / 1000
+    report("search", {
+        "entries": args.entries,
+        "others": args.others,
+        "queries": queries,
+        "worst_p99_ms": round(worst, 2),
+        "within_budget": worst <= args.budget_ms,
+    })
+    return 0 if worst <= args.budget_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
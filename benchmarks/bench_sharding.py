@@ -0,0 +1,94 @@
+"""
+Пропускная способность записи в зависимости от числа шардов БД (DB_SHARDS): --processes процессов
+по --threads потоков (как воркеры с потоками ASGI_WORKERS) --seconds секунд сохраняют события
+случайных пользователей через EventCalendar.save. С одним файлом все коммиты ждут одну блокировку
+записи SQLite, с N шардами - N независимых. Процессы запускаются заново для каждого числа шардов:
+DB_SHARDS читается при импорте. На одном ядре выигрыш упирается в CPU, а не в блокировку.
+
+    python -m benchmarks.bench_sharding --shards 1 2 4 8 --processes 4 --threads 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.common import report, summarize
+
+USERS = 10_000
+# запас на запуск процесса (импорт backend'а и миграции шардов) до общего старта нагрузки
+STARTUP_SECONDS = 2.0
+
+
+def write_load(start_at, threads, seconds, seed):
+    """
+    Выполняется в дочернем процессе с уже настроенными DB_PATH/DB_SHARDS. Нагрузка начинается
+    в start_at (time.time()), чтобы все процессы писали одновременно, а не по мере запуска.
+    """
+    from backend.models import EventCalendar
+
+    events = EventCalendar()
+    samples = []
+    time.sleep(max(0.0, start_at - time.time()))
+    deadline = time.perf_counter() + seconds
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        local = []
+        while time.perf_counter() < deadline:
+            user_id = str(rng.randrange(USERS))
+            started = time.perf_counter()
+            events.save(user_id, f"bench {number}", f"2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00")
+            local.append((time.perf_counter() - started) * 1e6)
+        samples.extend(local)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(number, )) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run(shards, processes, threads, seconds, seed):
+    directory = tempfile.mkdtemp(prefix=f"bench_sharding_{shards}_")
+    os.environ["DB_PATH"] = os.path.join(directory, "main.sqlite3")
+    # один шард - обычный режим без DB_SHARDS, всё в DB_PATH
+    paths = [os.path.join(directory, f"shard{i}.sqlite3") for i in range(shards)] if shards > 1 else []
+    os.environ["DB_SHARDS"] = ",".join(paths)
+    # spawn: свежие интерпретаторы импортируют backend с этим окружением
+    start_at = time.time() + STARTUP_SECONDS * processes
+    with multiprocessing.get_context("spawn").Pool(processes) as pool:
+        parts = pool.starmap(write_load, [(start_at, threads, seconds, seed + 1000 * i) for i in range(processes)])
+    return {
+        "ops_per_sec": round(sum(part["ops_per_sec"] for part in parts), 1),
+        "p50_us": max(part["p50_us"] for part in parts),
+        "p99_us": max(part["p99_us"] for part in parts),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    results = {shards: run(shards, args.processes, args.threads, args.seconds, args.seed) for shards in args.shards}
+    baseline = results[args.shards[0]]["ops_per_sec"]
+    report("sharding", {
+        "processes": args.processes,
+        "threads": args.threads,
+        "seconds": args.seconds,
+        "shards": results,
+        "speedup": {shards: round(result["ops_per_sec"] / baseline, 2) for shards, result in results.items()},
+    })
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Холодный старт: время импорта точек входа по `python -X importtime` в свежих процессах.
+Для каждой точки входа - медиана суммарного времени импорта за --runs запусков и самые
+медленные модули (собственное время). Тяжёлые модули, которые должны грузиться лениво
+(LAZY: dateparser, aiohttp, Flask, uvicorn), при импорте main не должны появляться вовсе.
+Если импорт main дольше --budget-ms или подтянул ленивый модуль, выходит с кодом 1.
+
+    python -m benchmarks.bench_startup --runs 5 --budget-ms 450
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import report, temp_db_path
+
+ENTRY_POINTS = ("main", "bot.bot_runner", "backend.asgi", "backend.routes")
+LAZY = ("dateparser", "aiohttp", "flask", "uvicorn")
+TOP_MODULES = 10
+
+
+def import_times(module):
+    """Один импорт module в свежем процессе: ({модуль: (собственное, суммарное) мкс}, секунды процесса)."""
+    # своя пустая БД: backend.routes создаёт модели, и миграции не должны трогать настоящую
+    env = dict(os.environ, DB_PATH=temp_db_path("startup"), DB_SHARDS="")
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - started
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times.setdefault(name.strip(), (int(own), int(cumulative)))
+    return times, elapsed
+
+
+def bench_entry_point(module, runs):
+    totals, processes = [], []
+    slowest = {}
+    lazy_loaded = set()
+    for _ in range(runs):
+        times, elapsed = import_times(module)
+        totals.append(times[module][1] / 1000)
+        processes.append(elapsed * 1000)
+        lazy_loaded.update(name for name in LAZY if name in times)
+        for name, (own, _) in times.items():
+            slowest[name] = max(slowest.get(name, 0), own)
+    top = sorted(slowest.items(), key=lambda item: item[1], reverse=True)[:TOP_MODULES]
+    return {
+        "import_ms": round(statistics.median(totals), 1),
+        "process_ms": round(statistics.median(processes), 1),
+        "lazy_loaded": sorted(lazy_loaded),
+        "slowest_modules_ms": {name: round(own / 1000, 1) for name, own in top},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=450.0, help="бюджет на импорт main (медиана)")
+    parser.add_argument("--entry-points", nargs="+", default=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    results = {module: bench_entry_point(module, args.runs) for module in args.entry_points}
+    main_result = results.get("main")
+    within_budget = main_result is None or (
+        main_result["import_ms"] <= args.budget_ms and not main_result["lazy_loaded"]
+    )
+    report("startup", {
+        "runs": args.runs,
+        "budget_ms": args.budget_ms,
+        "entry_points": results,
+        "within_budget": within_budget,
+    })
+    return 0 if within_budget else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Латентность одного обращения бота к backend'у для разных транспортов:
+новая aiohttp-сессия на каждое сообщение (как было), общая keep-alive сессия и in-process.
+
+    python -m benchmarks.bench_transport --iterations 500
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import aiohttp
+
+from benchmarks.common import report, summarize, use_temp_db
+
+
+def start_backend():
+    from werkzeug.serving import make_server
+    from backend.routes import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+async def session_per_call(base_url, user_id, date):
+    # старый путь: новая сессия и TCP-соединение на каждое сообщение
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/events/by_date", json={"user_id": user_id, "date": date}) as resp:
+            return await resp.json()
+
+
+async def measure_async(fn, iterations):
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return summarize(samples, time.perf_counter() - started)
+
+
+async def run(args, base_url):
+    from bot.transport import HttpBackend, InProcessBackend
+
+    http = HttpBackend(base_url)
+    inprocess = InProcessBackend()
+    for i in range(20):
+        await inprocess.add_entry("1", "event", f"event {i}", "2025-03-10 10:00")
+
+    results = {
+        "session_per_call": await measure_async(lambda: session_per_call(base_url, "1", "2025-03-10"), args.iterations),
+        "shared_session": await measure_async(lambda: http.events_by_date("1", "2025-03-10"), args.iterations),
+        "inprocess": await measure_async(lambda: inprocess.events_by_date("1", "2025-03-10"), args.iterations),
+    }
+    await http.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    use_temp_db("bench_transport")
+    server, base_url = start_backend()
+    try:
+        results = asyncio.run(run(args, base_url))
+    finally:
+        server.shutdown()
+    report("bot_backend_transport", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Вставки с отложенной записью (WRITE_BEHIND) против коммита на каждую вставку: --threads потоков
+(как потоки ASGI_WORKERS) --seconds секунд сохраняют события случайных пользователей через
+EventCalendar.save. Доля --read-own вставок сразу читается обратно (get_date_events) - проверка,
+что чтение видит ещё не сброшенные вставки (read_misses должно быть 0). В конце очередь
+сбрасывается и число строк в БД сверяется с числом вставок (lost). Каждый режим - в свежем
+процессе со своей БД: WRITE_BEHIND читается при импорте.
+
+Без --rate потоки вставляют без пауз (максимальная пропускная способность). С отложенной записью
+save тогда не отпускает GIL, и чтения ждут его дольше, чем сам сброс, - задержку read_own
+честнее сравнивать с --rate, одинаковым для всех режимов.
+
+    python -m benchmarks.bench_write_behind --modes off memory log --threads 16 --seconds 5
+    python -m benchmarks.bench_write_behind --threads 16 --rate 1000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import threading
+import time
+
+from benchmarks.common import report, summarize, temp_db_path
+
+USERS = 10_000
+
+
+def write_load(threads, seconds, read_own, rate, seed):
+    """Выполняется в дочернем процессе с уже настроенными DB_PATH/WRITE_BEHIND*."""
+    from backend.models import EventCalendar
+    from backend.writebehind import flush_all
+
+    events = EventCalendar()
+    saves, reads = [], []
+    misses = []
+    deadline = time.perf_counter() + seconds
+    # пауза между вставками одного потока, чтобы все вместе давали rate вставок в секунду
+    period = threads / rate if rate else 0
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        local_saves, local_reads, local_misses = [], [], 0
+        next_at = time.perf_counter() + rng.random() * period
+        while time.perf_counter() < deadline:
+            if period:
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+                next_at += period
+            user_id = str(rng.randrange(USERS))
+            date = f"2030-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            name = f"bench {number} {len(local_saves)}"
+            started = time.perf_counter()
+            events.save(user_id, name, f"{date} 10:00")
+            local_saves.append((time.perf_counter() - started) * 1e6)
+            if rng.random() < read_own:
+                started = time.perf_counter()
+                found = any(row["name"] == name for row in events.get_date_events(user_id, date))
+                local_reads.append((time.perf_counter() - started) * 1e6)
+                local_misses += not found
+        saves.extend(local_saves)
+        reads.extend(local_reads)
+        misses.append(local_misses)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(number, )) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    flush_all()
+    stored = events._execute_query("SELECT COUNT(*) FROM events", fetch=True)[0][0]
+    return {
+        "save": summarize(saves, elapsed),
+        "read_own": summarize(reads, elapsed) if reads else None,
+        "read_misses": sum(misses),
+        "lost": len(saves) - stored,
+    }
+
+
+def run(mode, threads, seconds, read_own, rate, seed):
+    os.environ["DB_PATH"] = temp_db_path(f"bench_write_behind_{mode}")
+    os.environ["DB_SHARDS"] = ""
+    os.environ["WRITE_BEHIND"] = mode
+    # spawn: свежий интерпретатор импортирует backend с этим окружением
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(write_load, (threads, seconds, read_own, rate, seed))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["off", "memory", "log"], choices=["off", "memory", "log"])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--read-own", type=float, default=0.1, help="доля вставок, которые сразу читаются обратно")
+    parser.add_argument("--rate", type=float, default=0, help="вставок в секунду на все потоки; 0 - без пауз")
+    parser.add_argument("--interval-ms", type=float, help="WRITE_BEHIND_INTERVAL_MS (по умолчанию из окружения)")
+    parser.add_argument("--batch", type=int, help="WRITE_BEHIND_BATCH (по умолчанию из окружения)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.interval_ms is not None:
+        os.environ["WRITE_BEHIND_INTERVAL_MS"] = str(args.interval_ms)
+    if args.batch is not None:
+        os.environ["WRITE_BEHIND_BATCH"] = str(args.batch)
+    results = {mode: run(mode, args.threads, args.seconds, args.read_own, args.rate, args.seed) for mode in args.modes}
+    baseline = results[args.modes[0]]["save"]["ops_per_sec"]
+    report("write_behind", {
+        "threads": args.threads,
+        "seconds": args.seconds,
+        "read_own": args.read_own,
+        "rate": args.rate,
+        "modes": results,
+        "speedup": {mode: round(result["save"]["ops_per_sec"] / baseline, 2) for mode, result in results.items()},
+    })
+
+
+if __name__ == "__main__":
+    main()
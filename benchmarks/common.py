@@ -0,0 +1,75 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+
+def temp_db_path(prefix="bench"):
+    """Путь к свежему файлу БД во временной директории."""
+    fd, path = tempfile.mkstemp(prefix=f"{prefix}_", suffix=".sqlite3")
+    os.close(fd)
+    os.remove(path)
+    return path
+
+
+def use_temp_db(prefix="bench"):
+    """
+    Направляет backend на временную БД. Вызывать ДО импорта backend.*,
+    т.к. DB_PATH читается при импорте backend.database.
+    """
+    path = temp_db_path(prefix)
+    os.environ["DB_PATH"] = path
+    return path
+
+
+def measure(fn, iterations):
+    """Вызывает fn iterations раз, возвращает сводку по латентности в микросекундах."""
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    elapsed = time.perf_counter() - started
+    return summarize(samples, elapsed)
+
+
+def summarize(samples_us, elapsed):
+    samples_us = sorted(samples_us)
+    n = len(samples_us)
+    if not n:
+        return {"count": 0}
+    return {
+        "count": n,
+        "ops_per_sec": round(n / elapsed, 1) if elapsed else None,
+        "mean_us": round(statistics.fmean(samples_us), 2),
+        "p50_us": round(samples_us[n // 2], 2),
+        "p99_us": round(samples_us[min(n - 1, int(n * 0.99))], 2),
+    }
+
+
+def report(name, results, stream=None):
+    """Печатает результаты одной строкой JSON, чтобы прогоны можно было сравнивать."""
+    payload = {
+        "benchmark": name,
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "results": results,
+    }
+    print(json.dumps(payload, ensure_ascii=False), file=stream or sys.stdout)
+    return payload
+
+
+def fake_update(user_id, text, replies):
+    """Минимальный Update для handle_text: ответы бота (без dispatcher'а) складываются в replies."""
+    async def reply_text(answer, **kwargs):
+        replies.append(answer)
+
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text, reply_text=reply_text),
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
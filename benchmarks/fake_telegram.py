@@ -0,0 +1,125 @@
+"""
+Фейковый Bot API для офлайн-тестов пропускной способности.
+
+Принимает sendMessage/getMe как настоящий Telegram, соблюдает те же лимиты
+(глобальный и на чат) и отвечает 429 с retry_after при их превышении.
+Обновления, переданные в feed(), отдаёт через getUpdates.
+Подключение: telegram.Bot(token, base_url=server.base_url)
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+from bot.dispatcher import TokenBucket
+
+
+class FakeTelegramServer:
+    def __init__(self, global_rate=30, chat_rate=1, chat_burst=3, latency=0.02, host="127.0.0.1", port=0):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.sent = defaultdict(list)  # chat_id -> [(время, текст)]
+        self.rejected = 0
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = {}
+        self._message_id = 0
+        self._runner = None
+        self._updates = deque()
+        self._has_updates = asyncio.Event()
+        self.messages_sent = 0
+        self.delivered = asyncio.Event()  # ставится, когда отправлено expect_messages сообщений
+        self.expect_messages = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    def feed(self, updates):
+        """Ставит обновления (dict в формате Bot API) в очередь для getUpdates."""
+        self._updates.extend(updates)
+        self._has_updates.set()
+
+    async def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates:
+            # long polling: ждём обновлений, но не дольше секунды
+            self._has_updates.clear()
+            try:
+                await asyncio.wait_for(self._has_updates.wait(), min(float(params.get("timeout") or 0), 1.0))
+            except asyncio.TimeoutError:
+                pass
+        return self._ok([self._updates[i] for i in range(min(limit, len(self._updates)))])
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def _over_limit(bucket, now):
+        # небольшой допуск на джиттер часов клиента и сервера
+        return bucket.wait_time(now) > 0.01
+
+    async def _params(self, request):
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    async def _handle(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        await asyncio.sleep(self.latency)
+        if method == "getMe":
+            return self._ok({"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"})
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method != "sendMessage":
+            return self._ok(True)
+
+        chat_id = int(params["chat_id"])
+        now = time.monotonic()
+        chat_bucket = self._chat_buckets.get(chat_id)
+        if chat_bucket is None:
+            chat_bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        if self._over_limit(self._global_bucket, now) or self._over_limit(chat_bucket, now):
+            self.rejected += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                 "parameters": {"retry_after": 1}},
+                status=429,
+            )
+        self._global_bucket.consume(now)
+        chat_bucket.consume(now)
+        self.sent[chat_id].append((now, params.get("text")))
+        self.messages_sent += 1
+        if self.expect_messages is not None and self.messages_sent >= self.expect_messages:
+            self.delivered.set()
+        self._message_id += 1
+        return self._ok({
+            "message_id": self._message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": params.get("text"),
+        })
+
+    @staticmethod
+    def _ok(result):
+        return web.Response(text=json.dumps({"ok": True, "result": result}), content_type="application/json")
@@ -0,0 +1,180 @@
+"""
+Нагрузочный тест backend'а с фиксированным RPS (открытая модель: запросы отправляются
+по расписанию, не дожидаясь предыдущих), отчёт p50/p99 по каждому маршруту backend/routes.py.
+
+По умолчанию поднимает backend сам на временной БД:
+    python -m benchmarks.load_http --mode asgi --rps 200 --duration 10
+    python -m benchmarks.load_http --mode flask --rps 200 --duration 10
+или бьёт в уже запущенный:
+    python -m benchmarks.load_http --url http://127.0.0.1:5001 --rps 200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+
+import aiohttp
+
+from benchmarks.common import report, summarize, use_temp_db
+
+USERS = 100
+# доля маршрутов в потоке: чтения чаще записей, служебные - изредка
+MIX = (
+    "POST /events", "GET /events/by_date", "POST /todos", "GET /events/range", "GET /events",
+    "GET /events/by_date", "GET /todos", "GET /events/range", "POST /events", "POST /events/delete",
+    "GET /events/by_date", "GET /events/range", "POST /import", "GET /export", "POST /digest",
+    "GET /events/range", "POST /digest/delete", "POST /entries/delete", "GET /search", "GET /metrics", "GET /cache/stats", "GET /",
+)
+ROUTES = tuple(dict.fromkeys(MIX))
+
+
+def scenarios(rng, routes=ROUTES):
+    """
+    Бесконечный поток (название, метод, путь, параметры aiohttp) по маршрутам backend/routes.py.
+    Удаляются события, созданные этим же потоком раньше.
+    """
+    created = []
+    mix = [name for name in MIX if name in routes]
+    for i in itertools.count():
+        user_id = str(rng.randrange(USERS))
+        day = f"2025-03-{rng.randint(1, 28):02d}"
+        name = mix[i % len(mix)]
+        method, path = name.split(" ")
+        if name == "POST /events":
+            body = {"user_id": user_id, "name": f"e{i}", "date": f"{day} 10:00"}
+            if i % 10 == 0:
+                body["rrule"] = "FREQ=WEEKLY"
+            created.append(body)
+            yield name, method, path, {"json": body}
+        elif name == "POST /todos":
+            yield name, method, path, {"json": {"user_id": user_id, "name": f"t{i}", "date": day}}
+        elif name in ("GET /events", "GET /todos"):
+            yield name, method, path, {"json": {"user_id": user_id}}
+        elif name == "GET /events/by_date":
+            yield name, method, path, {"json": {"user_id": user_id, "date": day}}
+        elif name == "GET /events/range":
+            yield name, method, path, {"params": {"user_id": user_id, "start": "2025-03-01", "end": "2025-04-01"}}
+        elif name == "POST /events/delete":
+            body = created.pop(0) if created else {"user_id": user_id, "name": "missing", "date": day}
+            yield name, method, path, {"json": {key: body[key] for key in ("user_id", "name", "date")}}
+        elif name == "POST /entries/delete":
+            # id созданных записей поток не знает: удаляет случайные, промах - 404
+            entries = [{"type": "event", "id": rng.randint(1, i + 1)}, {"type": "todo", "id": rng.randint(1, i + 1)}]
+            yield name, method, path, {"json": {"user_id": user_id, "entries": entries}}
+        elif name == "POST /import":
+            lines = "".join(
+                json.dumps({"type": "event", "name": f"imported {i}.{k}", "date": f"{day} {k:02d}:00"}) + "\n"
+                for k in range(20)
+            )
+            yield name, method, path, {
+                "params": {"user_id": user_id}, "data": lines.encode(),
+                "headers": {"Content-Type": "application/x-ndjson"},
+            }
+        elif name == "GET /export":
+            yield name, method, path, {"params": {"user_id": user_id, "format": "ics" if i % 2 else "ndjson"}}
+        elif name == "GET /search":
+            yield name, method, path, {"params": {"user_id": user_id, "q": f"e{rng.randrange(i + 1)}"}}
+        elif name == "POST /digest":
+            yield name, method, path, {"json": {"user_id": user_id, "tz": "Europe/Moscow", "hour": 8}}
+        elif name == "POST /digest/delete":
+            yield name, method, path, {"json": {"user_id": user_id}}
+        else:
+            yield name, method, path, {}
+
+
+def start_flask(port):
+    from werkzeug.serving import make_server
+    from backend.routes import app
+
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown
+
+
+def start_asgi(port):
+    from backend.asgi import create_server
+
+    server = create_server(port=port)
+    server.config.log_level = "warning"
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+    return stop
+
+
+async def fire(session, base_url, samples, errors, name, method, path, options):
+    started = time.perf_counter()
+    try:
+        async with session.request(method, f"{base_url}{path}", **options) as resp:
+            await resp.read()
+            # 4xx ожидаемы (удаление уже удалённого, отписка без подписки), ошибка - это 5xx
+            if resp.status >= 500:
+                errors[name] = errors.get(name, 0) + 1
+    except aiohttp.ClientError:
+        errors[name] = errors.get(name, 0) + 1
+    samples.setdefault(name, []).append((time.perf_counter() - started) * 1e6)
+
+
+async def run_load(base_url, rps, duration, routes=ROUTES):
+    rng = random.Random(7)
+    samples, errors, tasks = {}, {}, []
+    interval = 1 / rps
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        for i, (name, method, path, options) in enumerate(scenarios(rng, routes)):
+            due = started + i * interval
+            if due - started >= duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(session, base_url, samples, errors, name, method, path, options)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    everything = [s for values in samples.values() for s in values]
+    return {
+        "target_rps": rps,
+        "achieved_rps": round(len(everything) / elapsed, 1),
+        "errors": errors,
+        "all": summarize(everything, elapsed),
+        "routes": {name: summarize(values, elapsed) for name, values in samples.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="адрес уже запущенного backend'а")
+    parser.add_argument("--mode", choices=("asgi", "flask"), default="asgi")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--rps", type=float, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--routes", nargs="+", choices=ROUTES, default=ROUTES, metavar="ROUTE",
+                        help="только эти маршруты, например 'GET /events/range'")
+    args = parser.parse_args()
+
+    stop = None
+    base_url = args.url
+    if base_url is None:
+        use_temp_db("load_http")
+        stop = (start_asgi if args.mode == "asgi" else start_flask)(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        results = asyncio.run(run_load(base_url, args.rps, args.duration, args.routes))
+    finally:
+        if stop is not None:
+            stop()
+    report("http_load", {"mode": args.mode if args.url is None else "external", **results})
+
+
+if __name__ == "__main__":
+    main()
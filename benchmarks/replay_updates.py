@@ -0,0 +1,175 @@
+"""
+Проигрывает поток обновлений Telegram через бота против фейкового Bot API и меряет updates/sec.
+
+Поток - JSONL с обновлениями в формате Bot API (например, сохранённый ответ getUpdates).
+Без --stream генерируется синтетический: --users пользователей одновременно проходят
+--flows раз диалог добавления события. Режимы: polling (обновления отдаёт getUpdates фейкового
+сервера) и webhook (обновления POST'ятся на ASGI-сервер, как это делает Telegram).
+Каждое обновление даёт ровно один ответ; порядок ответов в каждом чате проверяется.
+Лимиты Telegram в фейковом API и в MessageDispatcher сняты, чтобы мерить обработку обновлений.
+
+    python -m benchmarks.replay_updates --mode webhook --concurrency 64
+    python -m benchmarks.replay_updates --mode polling --concurrency 1
+    python -m benchmarks.replay_updates --users 100 --record updates.jsonl  # только записать поток
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+
+import aiohttp
+
+from benchmarks.common import report, use_temp_db
+
+FLOW = ("Добавить событие", "завтра в 15:00", "Встреча")
+FLOW_REPLIES = ("Укажи дату", "✍️ Теперь напиши название", "Событие")
+UNLIMITED_RATE = 100_000
+
+
+def synthetic_stream(users, flows):
+    """Пользователи печатают одновременно: сообщения разных пользователей перемешаны."""
+    update_id = 0
+    for flow in range(flows):
+        for step, text in enumerate(FLOW):
+            for user in range(users):
+                update_id += 1
+                user_id = 10_000 + user
+                yield {
+                    "update_id": update_id,
+                    "message": {
+                        "message_id": update_id,
+                        "date": int(time.time()),
+                        "chat": {"id": user_id, "type": "private"},
+                        "from": {"id": user_id, "is_bot": False, "first_name": f"user{user}"},
+                        "text": f"{text} {flow}" if step == 2 else text,
+                    },
+                }
+
+
+def load_stream(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check_order(sent):
+    """Чаты, где ответы пришли не в порядке шагов диалога (только для синтетического потока)."""
+    broken = 0
+    for messages in sent.values():
+        texts = [text for _, text in messages]
+        expected = [FLOW_REPLIES[i % len(FLOW_REPLIES)] for i in range(len(texts))]
+        if any(not text.startswith(prefix) for text, prefix in zip(texts, expected)):
+            broken += 1
+    return broken
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def post_updates(url, secret, updates):
+    # как Telegram: следующее обновление отправляется после ответа на предыдущее
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret}
+    async with aiohttp.ClientSession() as session:
+        for update in updates:
+            while True:
+                try:
+                    async with session.post(url, json=update, headers=headers) as resp:
+                        if resp.status == 200:
+                            break
+                        if resp.status != 503:
+                            raise RuntimeError(f"webhook answered {resp.status}")
+                except aiohttp.ClientConnectionError:
+                    pass
+                await asyncio.sleep(0.05)  # сервер или бот ещё не запущены
+
+
+async def replay(updates, mode, latency, timeout):
+    from benchmarks.fake_telegram import FakeTelegramServer
+    from bot.bot import TelegramCalendarBot
+    from bot.webhook import WEBHOOK_PATH, TelegramWebhook
+
+    fake = await FakeTelegramServer(
+        global_rate=UNLIMITED_RATE, chat_rate=UNLIMITED_RATE, chat_burst=UNLIMITED_RATE, latency=latency
+    ).start()
+    fake.expect_messages = len(updates)
+    bot = TelegramCalendarBot("123:fake", transport="inprocess", base_url=fake.base_url, mode=mode)
+    stop_bot = asyncio.Event()
+    server = server_task = None
+    secret = os.environ["WEBHOOK_SECRET"]
+    if mode == "webhook":
+        from backend.asgi import asgi_app, create_server
+
+        port = free_port()
+        server = create_server(port=port, application=TelegramWebhook(bot, asgi_app, secret_token=secret))
+        server_task = asyncio.create_task(server.serve())
+
+    started = time.perf_counter()
+    bot_task = asyncio.create_task(bot.run_async(stop_bot))
+    if mode == "webhook":
+        await post_updates(f"http://127.0.0.1:{port}{WEBHOOK_PATH}", secret, updates)
+    else:
+        fake.feed(updates)
+    try:
+        await asyncio.wait_for(fake.delivered.wait(), timeout)
+        elapsed = time.perf_counter() - started
+    except asyncio.TimeoutError:
+        elapsed = None
+    finally:
+        stop_bot.set()
+        await bot_task
+        if server is not None:
+            server.should_exit = True
+            await server_task
+        await fake.stop()
+    return fake, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=("polling", "webhook"), default="webhook")
+    parser.add_argument("--concurrency", type=int, default=64, help="UPDATE_CONCURRENCY; 1 - по одному, как раньше")
+    parser.add_argument("--stream", help="JSONL с записанными обновлениями")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--flows", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка ответа фейкового Bot API, с")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--record", help="записать синтетический поток в файл и выйти")
+    args = parser.parse_args()
+
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as f:
+            for update in synthetic_stream(args.users, args.flows):
+                f.write(json.dumps(update, ensure_ascii=False) + "\n")
+        return 0
+
+    # настройки читаются при импорте bot.*
+    use_temp_db("replay")
+    os.environ["UPDATE_CONCURRENCY"] = str(args.concurrency)
+    os.environ["WEBHOOK_SECRET"] = "replay-secret"
+    for name in ("DISPATCH_GLOBAL_RATE", "DISPATCH_CHAT_RATE", "DISPATCH_CHAT_BURST"):
+        os.environ[name] = str(UNLIMITED_RATE)
+    os.environ["DISPATCH_MAX_IN_FLIGHT"] = "256"
+    from backend.database import init_db
+
+    init_db()
+    updates = load_stream(args.stream) if args.stream else list(synthetic_stream(args.users, args.flows))
+    fake, elapsed = await replay(updates, args.mode, args.latency, args.timeout)
+    report("replay_updates", {
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "updates": len(updates),
+        "replies": fake.messages_sent,
+        "seconds": round(elapsed, 3) if elapsed else None,
+        "updates_per_sec": round(len(updates) / elapsed, 1) if elapsed else None,
+        "out_of_order_chats": None if args.stream else check_order(fake.sent),
+    })
+    return 0 if elapsed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
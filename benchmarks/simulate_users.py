@@ -0,0 +1,106 @@
+"""
+Симуляция пользователей бота без Telegram: фейковые Update'ы идут через
+TelegramCalendarBot.handle_text и классы состояний (bot/states.py), как их вызывает Application.
+--users пользователей одновременно проходят --rounds раз набор диалогов: событие, заметка,
+повторяющееся событие, удаление, поиск и непонятный текст. Латентность считается по шагам -
+кнопка или состояние, в котором было сообщение; каждый шаг должен получить ровно один ответ.
+
+    python -m benchmarks.simulate_users --users 200 --rounds 3
+    python -m benchmarks.simulate_users --users 50 --persist   # с записью диалогов в SQLite
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import fake_update, report, summarize, use_temp_db
+
+FLOWS = {
+    "add_event": ("Добавить событие", "завтра в 15:00", "Встреча"),
+    "add_todo": ("Добавить заметку", "завтра", "Купить молоко"),
+    "add_recurring": ("Добавить событие", "каждый понедельник в 10:00", "Планёрка"),
+    "delete": ("Удалить событие или заметку", "завтра", "1"),
+    "search": ("Найти событие или заметку", "планерка"),
+    "unknown": ("привет",),
+}
+
+
+async def step(bot, user_id, text, user_data, samples):
+    """Одно сообщение: restore -> handle_text -> remember. Возвращает число ответов бота."""
+    label = text if text in bot.buttons else (user_data.get("state") or "no_state")
+    replies = []
+    update = fake_update(user_id, text, replies)
+    context = SimpleNamespace(user_data=user_data, args=[])
+    started = time.perf_counter()
+    await bot.restore_conversation(update, context)
+    await bot.handle_text(update, context)
+    await bot.remember_conversation(update, context)
+    samples.setdefault(label, []).append((time.perf_counter() - started) * 1e6)
+    return len(replies)
+
+
+async def user_session(bot, user_id, rounds, samples):
+    user_data = {}
+    unanswered = 0
+    for _ in range(rounds):
+        for flow in FLOWS.values():
+            for text in flow:
+                if await step(bot, user_id, text, user_data, samples) != 1:
+                    unanswered += 1
+    return unanswered
+
+
+async def simulate(users, rounds, transport, persist):
+    from bot.bot import TelegramCalendarBot
+    from bot.persistence import ConversationStore
+
+    bot = TelegramCalendarBot("0:simulate", transport=transport)
+    await bot.backend.start()
+    if persist:
+        bot.conversations = ConversationStore()
+        bot.conversations.start()
+    samples = {}
+    started = time.perf_counter()
+    try:
+        unanswered = await asyncio.gather(*(user_session(bot, 50_000 + user, rounds, samples) for user in range(users)))
+        elapsed = time.perf_counter() - started
+    finally:
+        if persist:
+            await bot.conversations.stop()
+        await bot.backend.close()
+    messages = sum(len(values) for values in samples.values())
+    return {
+        "users": users,
+        "rounds": rounds,
+        "transport": transport,
+        "persist": persist,
+        "messages": messages,
+        "messages_per_sec": round(messages / elapsed, 1),
+        "unanswered": sum(unanswered),
+        "all": summarize([s for values in samples.values() for s in values], elapsed),
+        "steps": {label: summarize(values, elapsed) for label, values in samples.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--transport", choices=("inprocess", "http"), default="inprocess",
+                        help="http - через уже запущенный backend (BACKEND_URL)")
+    parser.add_argument("--persist", action="store_true", help="сохранять диалоги через ConversationStore")
+    args = parser.parse_args()
+
+    if args.transport == "inprocess":
+        use_temp_db("simulate_users")
+    from bot.dateparsing import warm_up
+
+    warm_up()
+    results = asyncio.run(simulate(args.users, args.rounds, args.transport, args.persist))
+    report("simulate_users", results)
+    return 0 if results["unanswered"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
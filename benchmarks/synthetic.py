@@ -0,0 +1,158 @@
+"""
+Синтетическая БД календаря для бенчмарков: --rows записей (поровну событий и заметок)
+у rows / --per-user пользователей, даты - ±1 год от сегодня, часть записей без времени,
+1% - повторяющиеся. Готовый файл переиспользуется, пока совпадают параметры и версия схемы.
+
+    python -m benchmarks.synthetic --rows 1000000
+    python -m benchmarks.synthetic --rows 10000000 --out /data/bench_10m.sqlite3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import report
+
+PER_USER = 100
+RULES = ("FREQ=DAILY", "FREQ=WEEKLY", "FREQ=MONTHLY", "FREQ=WEEKLY;INTERVAL=2", "FREQ=DAILY;COUNT=30")
+CHUNK = 50_000
+# каталог для готовых БД: собрать 10M строк - минуты, поэтому они кешируются между прогонами
+DATA_DIR = os.getenv("BENCH_DATA_DIR", tempfile.gettempdir())
+
+
+def user_id_of(number):
+    return str(1_000_000 + number)
+
+
+def default_path(rows, per_user=PER_USER, seed=1):
+    return os.path.join(DATA_DIR, f"calendar_{rows}_{per_user}_{seed}.sqlite3")
+
+
+def generate(rows, per_user=PER_USER, seed=1, today=None):
+    """Строки (таблица, колонки) в порядке вставки; у каждого пользователя свои записи подряд."""
+    from backend.models import recurrence_columns
+
+    rng = random.Random(seed)
+    today = (today or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    users = max(1, rows // per_user)
+    for number in range(rows):
+        user_id = user_id_of(number % users)
+        moment = today + timedelta(days=rng.randint(-365, 365), minutes=rng.randrange(0, 24 * 60, 15))
+        all_day = rng.random() < 0.3
+        starts_at = moment.strftime("%Y-%m-%d 00:00" if all_day else "%Y-%m-%d %H:%M")
+        date = starts_at[:10] if all_day else starts_at
+        rrule, ends_at = recurrence_columns(starts_at, RULES[number % len(RULES)]) if rng.random() < 0.01 \
+            else (None, None)
+        table = "events" if number % 2 == 0 else "todos"
+        row = (user_id, f"{table[:-1]} {number}", date, starts_at, all_day, rrule, ends_at, None)
+        if table == "events":
+            # как миграция _add_reminders: о прошедших событиях уже напомнили
+            row += (starts_at if rrule is None and starts_at < now else None, )
+        yield table, row
+
+
+def _bulk_insert(conn, rows_iter):
+    """Вставка без индексов и триггеров (они пересоздаются из sqlite_master в конце) - в разы быстрее."""
+    from backend.database import fill_search_index
+
+    schema = conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE type IN ('index', 'trigger') AND sql IS NOT NULL"
+    ).fetchall()
+    for kind, name, _ in schema:
+        conn.execute(f"DROP {kind.upper()} {name}")
+    columns = "user_id, name, date, starts_at, all_day, rrule, ends_at, exdates"
+    queries = {
+        "events": f"INSERT INTO events ({columns}, reminded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        "todos": f"INSERT INTO todos ({columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    }
+    batches = {"events": [], "todos": []}
+    for table, row in rows_iter:
+        batch = batches[table]
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.executemany(queries[table], batch)
+            batch.clear()
+    for table, batch in batches.items():
+        conn.executemany(queries[table], batch)
+    # версии пользователей, которые иначе насчитали бы триггеры
+    conn.execute('''
+    INSERT INTO user_versions (user_id, version)
+    SELECT user_id, COUNT(*) FROM (SELECT user_id FROM events UNION ALL SELECT user_id FROM todos) GROUP BY user_id
+    ''')
+    # поисковый индекс тоже ведут триггеры - строим его по готовым таблицам
+    fill_search_index(conn)
+    for _, _, sql in schema:
+        conn.execute(sql)
+
+
+def build(path, rows, per_user=PER_USER, seed=1):
+    """Создаёт БД с rows записями по пути path (существующий файл перезаписывается)."""
+    from backend.database import get_db_connection, migrate
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = get_db_connection(path)
+    try:
+        migrate(conn)
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("BEGIN")
+        _bulk_insert(conn, generate(rows, per_user, seed))
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return path
+
+
+def _is_ready(path):
+    from backend.database import SCHEMA_VERSION, get_schema_version
+
+    if not os.path.exists(path):
+        return False
+    conn = sqlite3.connect(path)
+    try:
+        return get_schema_version(conn) == SCHEMA_VERSION
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+
+
+def synthetic_db(rows, per_user=PER_USER, seed=1, path=None):
+    """Путь к синтетической БД нужного размера: берёт готовую или собирает."""
+    path = path or default_path(rows, per_user, seed)
+    if not _is_ready(path):
+        build(path, rows, per_user, seed)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--per-user", type=int, default=PER_USER)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="путь к файлу БД (по умолчанию - в BENCH_DATA_DIR)")
+    args = parser.parse_args()
+
+    path = args.out or default_path(args.rows, args.per_user, args.seed)
+    started = time.perf_counter()
+    build(path, args.rows, args.per_user, args.seed)
+    elapsed = time.perf_counter() - started
+    report("synthetic_db", {
+        "rows": args.rows,
+        "users": max(1, args.rows // args.per_user),
+        "path": path,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(args.rows / elapsed, 1),
+        "size_mb": round(os.path.getsize(path) / 1024 / 1024, 1),
+    })
+
+
+if __name__ == "__main__":
+    main()
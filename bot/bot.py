@@ -1,13 +1,25 @@
+import asyncio
 import logging
-import aiohttp
 from telegram import Update, ReplyKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
+from telegram.ext import Application, CommandHandler, MessageHandler, TypeHandler, filters, CallbackContext
 from dataclasses import dataclass
+from backend import metrics
+from backend.digest import DigestSubscriptions
+from backend.models import EventCalendar
+from bot.dateparsing import warm_up
+from bot.digest import DAY_TITLES, DigestJob, parse_digest_args
+from bot.dispatcher import BULK, MessageDispatcher
+from bot.persistence import ConversationStore
+from bot.reminders import ReminderScheduler
+from bot.transport import BACKEND_TRANSPORT, make_backend
+from bot.webhook import BOT_MODE, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_URL, PerChatUpdateProcessor
 from bot.states import (
     AwaitingDateState,
     AwaitingNameState,
     AwaitingDeleteDateState,
     AwaitingDeleteChoiceState,
+    AwaitingSearchQueryState,
+    search_entries,
 )
 
 logging.basicConfig(
@@ -16,6 +28,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+HANDLER_SECONDS = metrics.histogram(
+    "bot_handler_seconds", "Time to handle a text message, by button or conversation state", ("handler", )
+)
+
 STATE_HANDLERS = {
     "awaiting_event_date": AwaitingDateState(),
     "awaiting_todo_date": AwaitingDateState(),
@@ -23,11 +39,15 @@ STATE_HANDLERS = {
     "awaiting_todo_name": AwaitingNameState(),
     "awaiting_delete_date": AwaitingDeleteDateState(),
     "awaiting_delete_choice": AwaitingDeleteChoiceState(),
+    "awaiting_search_query": AwaitingSearchQueryState(),
 }
 
 @dataclass
 class TelegramCalendarBot:
     token: str
+    transport: str = BACKEND_TRANSPORT
+    base_url: str = None  # другой адрес Bot API (например, фейковый сервер в бенчмарках)
+    mode: str = BOT_MODE  # polling или webhook
 
     def __post_init__(self):
         self.start_message = (
@@ -38,77 +58,194 @@ class TelegramCalendarBot:
             "Добавить событие": self.add_event,
             "Добавить заметку": self.add_todo,
             "Удалить событие или заметку": self.delete_event,
+            "Найти событие или заметку": self.search,
             "Открыть календарь": self.open_calendar,
         }
         keyboard = [[btn] for btn in self.buttons]
         self.reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        self.backend_url = "http://127.0.0.1:5001"
+        self.backend = make_backend(self.transport)
+        self.dispatcher = None
+        self.conversations = None
+        self.application = None
+
+    async def reply(self, update: Update, text, **kwargs):
+        """Ответ пользователю через общую очередь отправки (с учётом лимитов Telegram)."""
+        if self.dispatcher is None:
+            return await update.message.reply_text(text, **kwargs)
+        return await self.dispatcher.reply(update, text, **kwargs)
 
     async def start(self, update: Update, context: CallbackContext):
         logger.info(f"User {update.effective_user.id} started bot")
-        await update.message.reply_text(self.start_message, reply_markup=self.reply_markup)
+        await self.reply(update, self.start_message, reply_markup=self.reply_markup)
 
     async def add_event(self, update: Update, context: CallbackContext):
         logger.info(f"User {update.effective_user.id} wants to add an event")
         # начальное состояние для добавления события
         context.user_data["state"] = "awaiting_event_date"
         context.user_data["type"] = "event"
-        await update.message.reply_text("Укажи дату и время события 📅 (например, 'завтра в 15:00')")
+        await self.reply(update, "Укажи дату и время события 📅 (например, 'завтра в 15:00' или 'каждый понедельник в 10:00')")
 
     async def add_todo(self, update: Update, context: CallbackContext):
         logger.info(f"User {update.effective_user.id} wants to add a todo")
         context.user_data["state"] = "awaiting_todo_date"
         context.user_data["type"] = "todo"
         # Для простоты оставим этот путь без реализации, можно сделать аналогично add_event
-        await update.message.reply_text("Укажи дату события 📅 (например, 'завтра')")
+        await self.reply(update, "Укажи дату события 📅 (например, 'завтра')")
 
     async def delete_event(self, update: Update, context: CallbackContext):
         logger.info(f"User {update.effective_user.id} wants to delete an event")
         # Устанавливаем состояние для удаления
         context.user_data["state"] = "awaiting_delete_date"
-        await update.message.reply_text("Укажи дату события, которое хочешь удалить (например, 'завтра')")
+        await self.reply(update, "Укажи дату события, которое хочешь удалить (например, 'завтра')")
+
+    async def search(self, update: Update, context: CallbackContext):
+        # /search врач - сразу ищем; без слов (или кнопкой) - спрашиваем, что искать
+        query = " ".join(context.args or ())
+        if query:
+            return await search_entries(self, update, query)
+        context.user_data["state"] = "awaiting_search_query"
+        await self.reply(update, "Что ищем? 🔍 Напиши слово из названия (например, 'врач')")
 
     async def open_calendar(self, update: Update, context: CallbackContext):
         logger.info(f"User {update.effective_user.id} opened calendar.")
-        await update.message.reply_text("Здесь будет твой календарь. Пока прото представь его :) У тебя же хорошее воображение?")
+        await self.reply(update, "Здесь будет твой календарь. Пока прото представь его :) У тебя же хорошее воображение?")
+
+    async def digest(self, update: Update, context: CallbackContext):
+        user_id = update.effective_user.id
+        try:
+            subscription = parse_digest_args(context.args or ())
+        except ValueError:
+            return await self.reply(
+                update,
+                "Не понял 🤔 Примеры: /digest 8 завтра, /digest 7 Asia/Yekaterinburg сегодня, /digest off. "
+                "Сводка приходит в начале часа, поэтому время - без минут: 7 или 7:00, а не 7:30"
+            )
+        if subscription is None:
+            await self.backend.unsubscribe_digest(user_id)
+            return await self.reply(update, "Больше не присылаю сводку 👌")
+        tz, hour, day_offset = subscription
+        logger.info(f"User {user_id} subscribes to digest at {hour}:00 {tz} (+{day_offset}d)")
+        if await self.backend.subscribe_digest(user_id, tz, hour, day_offset):
+            await self.reply(update, f"Каждый день в {hour}:00 ({tz}) пришлю план на {DAY_TITLES[day_offset]} ☀️")
+        else:
+            await self.reply(update, "Не получилось подписаться 😔 Проверь час (0-23) и часовой пояс (например, Europe/Moscow)")
 
     async def fetch_events_by_date(self, user_id, date):
-        url = f"{self.backend_url}/events/by_date"
-        payload = {"user_id": user_id, "date": date}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, json=payload) as resp:
-                if resp.status in {200, 201}:
-                    return await resp.json()
-                else:
-                    return None
+        return await self.backend.events_by_date(user_id, date)
+
+    async def restore_conversation(self, update: Update, context: CallbackContext):
+        # до всех обработчиков: поднимаем из БД незавершённый диалог (после рестарта)
+        if self.conversations is not None and update.effective_user is not None:
+            await self.conversations.restore(update.effective_user.id, context.user_data)
+
+    async def remember_conversation(self, update: Update, context: CallbackContext):
+        # после всех обработчиков: отмечаем изменившееся состояние к записи в БД
+        if self.conversations is not None and update.effective_user is not None:
+            self.conversations.remember(update.effective_user.id, context.user_data)
 
     async def handle_text(self, update: Update, context: CallbackContext):
         text = update.message.text
         user_id = update.effective_user.id
 
         if text in self.buttons:
-            return await self.buttons[text](update, context)
+            handler = self.buttons[text]
+            with HANDLER_SECONDS.time(handler.__name__):
+                return await handler(update, context)
 
         # есои установлено состояние, делегируем обработку соответствующему классу
         current_state = context.user_data.get("state")
         if current_state in STATE_HANDLERS:
             handler = STATE_HANDLERS[current_state]
-            await handler.handle(self, update, context)
+            with HANDLER_SECONDS.time(current_state):
+                await handler.handle(self, update, context)
         else:
             logger.warning(f"User {user_id} sent unrecognized text: {text}")
-            await update.message.reply_text("Не понимаю ничего... 🥲 Используй кнопки или команды.")
+            await self.reply(update, "Не понимаю ничего... 🥲 Используй кнопки или команды.")
 
-    def run(self):
-        app = Application.builder().token(self.token).build()
+    async def send_notification(self, user_id, text):
+        # напоминания и сводки идут массовой очередью; в личных чатах chat_id совпадает с user_id
+        await self.dispatcher.send(user_id, text, priority=BULK)
+
+    async def post_init(self, app: Application):
+        # языковые данные dateparser грузим в фоне, чтобы первый пользователь не ждал
+        self.warm_up_task = asyncio.create_task(asyncio.to_thread(warm_up))
+        # сессия backend'а тоже открывается в фоне; запрос, пришедший раньше, откроет её сам
+        self.backend_start_task = asyncio.create_task(self.backend.start())
+        self.dispatcher = MessageDispatcher(app.bot)
+        self.dispatcher.start()
+        self.scheduler = ReminderScheduler(EventCalendar(), self.send_notification)
+        self.scheduler.start()
+        self.conversations = ConversationStore(drop=app.drop_user_data)
+        self.conversations.start()
+        self.digest_job = DigestJob(DigestSubscriptions(), self.send_notification)
+        self.digest_job.start()
+
+    async def post_shutdown(self, app: Application):
+        await self.digest_job.stop()
+        await self.conversations.stop()
+        await self.scheduler.stop()
+        await self.dispatcher.stop()
+        await self.backend_start_task
+        await self.backend.close()
+
+    def build_application(self):
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .concurrent_updates(PerChatUpdateProcessor())
+        )
+        if self.base_url:
+            builder = builder.base_url(self.base_url)
+        app = builder.build()
+        self.application = app
         
+        app.add_handler(TypeHandler(Update, self.restore_conversation), group=-1)
         app.add_handler(CommandHandler("start", self.start))
         app.add_handler(CommandHandler("addevent", self.add_event))
         app.add_handler(CommandHandler("addtodo", self.add_todo))
         app.add_handler(CommandHandler("delete", self.delete_event))
+        app.add_handler(CommandHandler("digest", self.digest))
+        app.add_handler(CommandHandler("search", self.search))
         
         app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_text))
-        
+        app.add_handler(TypeHandler(Update, self.remember_conversation), group=1)
+        return app
+
+    def run(self):
+        if self.mode == "webhook":
+            raise ValueError("Webhook mode is served by the backend's ASGI server: use BACKEND_MODE=asgi")
+        app = self.build_application()
         logger.info("Bot is started...")
-        
         app.run_polling(close_loop=False)
 
+    async def run_async(self, stop_event: asyncio.Event):
+        """
+        Запуск бота в уже работающем цикле событий (рядом с ASGI-сервером backend'а)
+        до установки stop_event. run_polling так не умеет - он сам владеет циклом.
+        """
+        app = self.build_application()
+        await app.initialize()
+        await self.post_init(app)
+        await app.start()
+        if self.mode == "webhook":
+            # обновления принимает TelegramWebhook на ASGI-сервере и кладёт в app.update_queue
+            await app.bot.set_webhook(
+                f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=100,
+            )
+        else:
+            # start_polling сам снимает webhook, если он был установлен
+            await app.updater.start_polling()
+        logger.info(f"Bot is started ({self.mode})...")
+        try:
+            await stop_event.wait()
+        finally:
+            if app.updater.running:
+                await app.updater.stop()
+            await app.stop()
+            await self.post_shutdown(app)
+            await app.shutdown()
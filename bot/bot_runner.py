@@ -1,5 +1,4 @@
 import os
-import asyncio
 from dotenv import load_dotenv
 from bot.bot import TelegramCalendarBot
 
@@ -7,10 +6,6 @@ load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
 
 if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
+    # run() сам создаёт цикл событий и владеет им (run_polling)
     bot_instance = TelegramCalendarBot(token=TOKEN)
-    loop.create_task(bot_instance.run())
-
-    loop.run_forever()
+    bot_instance.run()
@@ -0,0 +1,158 @@
+import re
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+PARSE_SECONDS = metrics.histogram(
+    "date_parse_seconds", "Date parsing time: fast path for common phrases, then dateparser", ("parser", )
+)
+
+# время в формате HH:MM; по нему решаем, сохранять ли время вместе с датой
+TIME_PATTERN = re.compile(r'\d\d:\d\d')
+
+RELATIVE_DAYS = {"вчера": -1, "сегодня": 0, "завтра": 1, "послезавтра": 2}
+WEEKDAYS = {
+    "понедельник": 0, "пн": 0,
+    "вторник": 1, "вт": 1,
+    "среда": 2, "среду": 2, "ср": 2,
+    "четверг": 3, "чт": 3,
+    "пятница": 4, "пятницу": 4, "пт": 4,
+    "суббота": 5, "субботу": 5, "сб": 5,
+    "воскресенье": 6, "вс": 6,
+}
+MONTHS = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+
+_TIME = r'(?:\s+(?:в\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2}))?'
+FAST_PATTERNS = (
+    ("relative", re.compile(rf'^(?P<word>{"|".join(RELATIVE_DAYS)}){_TIME}$')),
+    ("weekday", re.compile(rf'^(?:(?:в|во)\s+)?(?P<word>{"|".join(WEEKDAYS)}){_TIME}$')),
+    ("time", re.compile(r'^(?:в\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2})$')),
+    ("month", re.compile(rf'^(?P<day>\d{{1,2}})\s+(?P<month>{"|".join(MONTHS)})(?:\s+(?P<year>\d{{4}}))?{_TIME}$')),
+    ("numeric", re.compile(rf'^(?P<day>\d{{1,2}})\.(?P<month>\d{{1,2}})(?:\.(?P<year>\d{{4}}|\d{{2}}))?{_TIME}$')),
+    ("iso", re.compile(rf'^(?P<year>\d{{4}})-(?P<month>\d{{2}})-(?P<day>\d{{2}}){_TIME}$')),
+)
+# "каждый день", "каждые 2 недели", "каждый понедельник", "ежемесячно" -> FREQ (RRULE)
+RECURRENCE_UNITS = {
+    "день": "DAILY", "дня": "DAILY", "дней": "DAILY",
+    "неделю": "WEEKLY", "недели": "WEEKLY", "недель": "WEEKLY",
+    "месяц": "MONTHLY", "месяца": "MONTHLY", "месяцев": "MONTHLY",
+}
+RECURRENCE_ADVERBS = {"ежедневно": "DAILY", "еженедельно": "WEEKLY", "ежемесячно": "MONTHLY"}
+RECURRENCE_NAMES = {"DAILY": "каждый день", "WEEKLY": "каждую неделю", "MONTHLY": "каждый месяц"}
+RECURRENCE_PATTERN = re.compile(
+    rf'(?:^|\s)(?:(?:кажд(?:ый|ую|ое|ые))\s+(?:(?P<interval>\d+)\s+)?'
+    rf'(?:(?P<unit>{"|".join(RECURRENCE_UNITS)})|(?P<weekday>{"|".join(WEEKDAYS)}))'
+    rf'|(?P<adverb>{"|".join(RECURRENCE_ADVERBS)}))(?=\s|$)'
+)
+# "каждую неделю, начиная с 15.03": дата первого повторения
+_RECURRENCE_START = re.compile(r'^(?:начиная\s+)?с\s+')
+_SPACES = re.compile(r'\s+')
+_EDGE_PUNCTUATION = " \t\n!?,;"
+
+
+def normalize(text):
+    return _SPACES.sub(" ", text.lower().replace("ё", "е")).strip(_EDGE_PUNCTUATION)
+
+
+def _with_time(day, match):
+    if match.group("hour") is None:
+        return day
+    return day.replace(hour=int(match.group("hour")), minute=int(match.group("minute")))
+
+
+def fast_parse(normalized, now):
+    """
+    Разбор самых частых формулировок без dateparser. Возвращает datetime или None,
+    если формулировка не распознана (тогда работает dateparser).
+    """
+    for kind, pattern in FAST_PATTERNS:
+        match = pattern.match(normalized)
+        if match is None:
+            continue
+        try:
+            if kind == "relative":
+                return _with_time(now + timedelta(days=RELATIVE_DAYS[match.group("word")]), match)
+            if kind == "weekday":
+                # как dateparser (PREFER_DATES_FROM='current_period'): этот же день - сегодня, иначе прошедший
+                back = (now.weekday() - WEEKDAYS[match.group("word")]) % 7
+                return _with_time(now - timedelta(days=back), match)
+            if kind == "time":
+                return _with_time(now, match)
+            month = match.group("month")
+            month = MONTHS[month] if kind == "month" else int(month)
+            year = match.group("year")
+            year = now.year if year is None else int(year) + (2000 if len(year) == 2 else 0)
+            return _with_time(now.replace(year=year, month=month, day=int(match.group("day"))), match)
+        except ValueError:
+            # 30 февраля, 25:00 и т.п. - пусть решает dateparser
+            return None
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _search_dates(normalized, now):
+    # now входит в ключ кеша с точностью до минуты, чтобы относительные даты не протухали
+    from dateparser.search import search_dates
+
+    return search_dates(normalized, languages=["ru"], settings={"RELATIVE_BASE": now})
+
+
+def parse_recurrence(text):
+    """
+    Выделяет из текста повторение. Возвращает (rrule или None, остаток текста с датой).
+    У "каждый понедельник" в остатке остаётся сам день недели - от него считаются повторения.
+    """
+    normalized = normalize(text)
+    match = RECURRENCE_PATTERN.search(normalized)
+    if match is None:
+        return None, text
+    if match.group("adverb"):
+        freq = RECURRENCE_ADVERBS[match.group("adverb")]
+    else:
+        freq = "WEEKLY" if match.group("weekday") else RECURRENCE_UNITS[match.group("unit")]
+    rrule = f"FREQ={freq}"
+    if match.group("interval") and int(match.group("interval")) > 1:
+        rrule += f";INTERVAL={int(match.group('interval'))}"
+    rest = f"{normalized[:match.start()]} {match.group('weekday') or ''} {normalized[match.end():]}"
+    rest = _RECURRENCE_START.sub("", normalize(rest))
+    # без даты ("каждый день в 9:00") повторения начинаются сегодня
+    return rrule, rest or "сегодня"
+
+
+def describe_recurrence(rrule):
+    """'FREQ=WEEKLY;INTERVAL=2' -> 'каждую неделю (раз в 2)' для ответов бота."""
+    fields = dict(part.split("=", 1) for part in rrule.split(";"))
+    name = RECURRENCE_NAMES.get(fields.get("FREQ"), rrule)
+    interval = fields.get("INTERVAL", "1")
+    return name if interval == "1" else f"{name} (раз в {interval})"
+
+
+def warm_up():
+    """Заранее загружает языковые данные dateparser: первый разбор иначе занимает десятки мс."""
+    _search_dates("завтра в 15:00", datetime.now().replace(second=0, microsecond=0))
+
+
+def parse_datetime(text, now=None):
+    """
+    Парсит дату из текста: сначала быстрым разбором частых формулировок, потом dateparser.
+    Если в тексте есть время, возвращает 'YYYY-MM-DD HH:MM', иначе 'YYYY-MM-DD'
+    """
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    normalized = normalize(text)
+    with PARSE_SECONDS.time("fast"):
+        parsed = fast_parse(normalized, now)
+    if parsed is None:
+        with PARSE_SECONDS.time("dateparser"):
+            found = _search_dates(normalized, now)
+        if not found:
+            return None
+        parsed = found[0][1]
+
+    return parsed.strftime("%Y-%m-%d %H:%M") if TIME_PATTERN.search(text) is not None \
+            else parsed.strftime("%Y-%m-%d")
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date as date_cls, datetime
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+# часовой пояс и час сводки по умолчанию для команды /digest
+DIGEST_DEFAULT_TZ = os.getenv("DIGEST_DEFAULT_TZ", "Europe/Moscow")
+DIGEST_HOUR = int(os.getenv("DIGEST_HOUR", "8"))
+# как часто проверяем, не наступил ли час рассылки какого-нибудь шарда
+DIGEST_CHECK_SECONDS = float(os.getenv("DIGEST_CHECK_SECONDS", "60"))
+# сколько сводок одновременно ждут отправки (дальше скорость задаёт MessageDispatcher)
+DIGEST_CONCURRENCY = int(os.getenv("DIGEST_CONCURRENCY", "100"))
+# лимит длины сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+DAY_TITLES = ("сегодня", "завтра")
+DAY_WORDS = {"сегодня": 0, "today": 0, "завтра": 1, "tomorrow": 1}
+OFF_WORDS = {"off", "выкл", "стоп", "stop"}
+
+
+def parse_digest_args(args):
+    """
+    Аргументы команды /digest -> (tz, hour, day_offset) или None для отписки:
+    '/digest', '/digest 9 завтра', '/digest 7:00 Asia/Tokyo сегодня', '/digest off'.
+    Нераспознанный аргумент - ValueError. Сводка уходит в начале часа, поэтому время
+    с минутами ('7:30') тоже ValueError, а не молча 7:00.
+    """
+    tz, hour, day_offset = DIGEST_DEFAULT_TZ, DIGEST_HOUR, 0
+    for arg in args:
+        word = arg.strip().lower()
+        if word in OFF_WORDS:
+            return None
+        if word in DAY_WORDS:
+            day_offset = DAY_WORDS[word]
+        elif word.partition(":")[0].isdigit():
+            hours, _, minutes = word.partition(":")
+            if minutes.strip("0"):
+                raise ValueError(f"Digest time must be a whole hour: {arg!r}")
+            hour = int(hours)
+        elif "/" in arg or word == "utc":
+            tz = arg.strip()
+        else:
+            raise ValueError(f"Unknown digest argument: {arg!r}")
+    return tz, hour, day_offset
+
+
+def render_digest(entries, day, day_offset=0):
+    """Текст сводки: записи уже отсортированы по времени, длинный список обрезается под лимит Telegram."""
+    lines = [f"☀️ План на {DAY_TITLES[day_offset]} ({date_cls.fromisoformat(day):%d.%m}):"]
+    length = len(lines[0])
+    for index, entry in enumerate(entries):
+        time_part = "" if entry["all_day"] else f"{entry['starts_at'][11:16]} "
+        icon = "📝 " if entry["type"] == "todo" else ""
+        line = f"• {time_part}{icon}{entry['name']}"
+        # оставляем место под строку "… и ещё N"
+        if length + len(line) + 1 > MAX_MESSAGE_LENGTH - 32:
+            lines.append(f"… и ещё {len(entries) - index}")
+            break
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+class DigestJob:
+    """
+    Ежедневная сводка записей на сегодня или завтра.
+
+    Раз в check_interval смотрит на шарды подписчиков (tz, hour, day_offset) и рассылает те,
+    у которых по их часовому поясу уже наступил hour, а сводка за местную дату ещё не ушла
+    (так шард, пропущенный из-за рестарта, догоняется позже в тот же день). Записи шарда
+    читаются одним потоковым запросом; сообщения собираются и отдаются в MessageDispatcher
+    пачками по мере чтения, не дожидаясь конца выборки.
+    """
+
+    def __init__(self, subscriptions, send, check_interval=DIGEST_CHECK_SECONDS, concurrency=DIGEST_CONCURRENCY):
+        self.subscriptions = subscriptions
+        self.send = send  # async send(user_id, text)
+        self.check_interval = check_interval
+        self.concurrency = concurrency
+        self.reports = []  # последние отчёты о рассылке шардов
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Digest job is started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @staticmethod
+    def due_shards(shards, now=None):
+        """Шарды, которым пора отправлять сводку: [(tz, hour, day_offset, местная дата)]."""
+        now = now or datetime.now(ZoneInfo("UTC"))
+        due = []
+        for tz, hour, day_offset, oldest in shards:
+            try:
+                local = now.astimezone(ZoneInfo(tz))
+            except Exception:
+                logger.warning(f"Skipping digest shard with unknown timezone {tz!r}")
+                continue
+            today = local.date().isoformat()
+            if local.hour >= hour and oldest < today:
+                due.append((tz, hour, day_offset, today))
+        return due
+
+    async def _deliver(self, user_id, text, slots):
+        try:
+            await self.send(user_id, text)
+            return True
+        except Exception:
+            logger.exception(f"Failed to send digest to user {user_id}")
+            return False
+        finally:
+            slots.release()
+
+    async def run_shard(self, tz, hour, day_offset, today):
+        """Рассылает сводку одного шарда и возвращает отчёт: время, число сообщений и пользователей."""
+        started = time.perf_counter()
+        batches = self.subscriptions.iter_digests(tz, hour, day_offset, today)
+        day = date_cls.fromordinal(date_cls.fromisoformat(today).toordinal() + day_offset).isoformat()
+        slots = asyncio.Semaphore(self.concurrency)
+        sending = []
+        users = 0
+        try:
+            while (batch := await asyncio.to_thread(next, batches, None)) is not None:
+                claimed = await asyncio.to_thread(self.subscriptions.claim, [user_id for user_id, _ in batch], today)
+                for user_id, entries in batch:
+                    if user_id not in claimed:
+                        continue  # уже отправил другой процесс
+                    users += 1
+                    await slots.acquire()
+                    text = render_digest(entries, day, day_offset)
+                    sending.append(asyncio.create_task(self._deliver(user_id, text, slots)))
+            users += await asyncio.to_thread(self.subscriptions.finish_shard, tz, hour, day_offset, today)
+            results = await asyncio.gather(*sending)
+        finally:
+            await asyncio.to_thread(batches.close)
+            for task in sending:
+                task.cancel()
+        report = {
+            "shard": f"{tz} {hour:02d}:00 +{day_offset}d",
+            "date": today,
+            "users": users,
+            "messages": sum(results),
+            "failed": len(results) - sum(results),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info(
+            f"Digest {report['shard']} for {today}: {report['messages']} messages "
+            f"({report['failed']} failed) to {users} users in {report['seconds']}s"
+        )
+        self.reports = [*self.reports[-99:], report]
+        return report
+
+    async def run_due(self, now=None):
+        shards = await asyncio.to_thread(self.subscriptions.shards)
+        return [await self.run_shard(*shard) for shard in self.due_shards(shards, now)]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception("Digest job failed")
+            await asyncio.sleep(self.check_interval)
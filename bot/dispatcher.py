@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from telegram.error import RetryAfter
+from backend import metrics
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: ответы на действия пользователя уходят раньше массовых уведомлений
+INTERACTIVE = 0
+BULK = 1
+
+# Лимиты Telegram: ~30 сообщений в секунду на бота и ~1 в секунду в один чат
+GLOBAL_RATE = float(os.getenv("DISPATCH_GLOBAL_RATE", "30"))
+CHAT_RATE = float(os.getenv("DISPATCH_CHAT_RATE", "1"))
+CHAT_BURST = int(os.getenv("DISPATCH_CHAT_BURST", "3"))
+# сколько массовых сообщений может ждать в очереди, прежде чем отправитель начнёт ждать места
+MAX_BULK_QUEUE = int(os.getenv("DISPATCH_MAX_BULK_QUEUE", "10000"))
+MAX_IN_FLIGHT = int(os.getenv("DISPATCH_MAX_IN_FLIGHT", "32"))
+MAX_RETRIES = 3
+
+TELEGRAM_SECONDS = metrics.histogram(
+    "telegram_request_seconds", "Latency of outgoing Bot API calls", ("method", "outcome")
+)
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "dispatch_queue_wait_seconds", "Time from enqueueing a message to its delivery", ("priority", )
+)
+PRIORITY_NAMES = ("interactive", "bulk")
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Через сколько секунд будет доступен токен (0 - уже доступен)."""
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.blocked_until - now)
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        # после 429 ничего не отправляем, пока не истечёт retry_after
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self.tokens = 0
+
+
+class _Outgoing:
+    __slots__ = ("chat_id", "text", "kwargs", "priority", "future", "enqueued", "attempts")
+
+    def __init__(self, chat_id, text, kwargs, priority, future):
+        self.chat_id = chat_id
+        self.text = text
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = future
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class MessageDispatcher:
+    """
+    Единая очередь исходящих сообщений бота.
+
+    Внутри каждого приоритета сообщения лежат в отдельных очередях чатов, которые обходятся
+    по кругу, поэтому один чат с сотней уведомлений не задерживает остальных. Отправка
+    ограничена token bucket'ами на чат и на бота; 429 от Telegram ставит чат
+    на паузу на retry_after. Массовые сообщения при переполнении очереди
+    блокируют отправителя (backpressure), интерактивные - никогда.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST,
+                 max_bulk_queue=MAX_BULK_QUEUE, max_in_flight=MAX_IN_FLIGHT):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_bulk_queue = max_bulk_queue
+        self.global_bucket = TokenBucket(global_rate, max(1, int(global_rate)))
+        self.chat_buckets = {}
+        self.lanes = {INTERACTIVE: OrderedDict(), BULK: OrderedDict()}
+        self.queued = {INTERACTIVE: 0, BULK: 0}
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.stats = {
+            "sent": 0, "failed": 0, "retried": 0, "rate_limited": 0,
+            "max_wait_ms": {INTERACTIVE: 0.0, BULK: 0.0}, "backpressure_waits": 0,
+        }
+        self._wakeup = None  # future, которую будит новое сообщение или таймер
+        self._space = asyncio.Condition()
+        self._tasks = set()
+        self._worker = None
+        self._dispatched = 0
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, drain_timeout=5.0):
+        """Даёт очереди разойтись (не дольше drain_timeout) и останавливает воркер."""
+        deadline = time.monotonic() + drain_timeout
+        while (self.pending() or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def pending(self):
+        return self.queued[INTERACTIVE] + self.queued[BULK]
+
+    def metrics(self):
+        return {
+            **self.stats,
+            "queued_interactive": self.queued[INTERACTIVE],
+            "queued_bulk": self.queued[BULK],
+            "in_flight": len(self._tasks),
+        }
+
+    async def send(self, chat_id, text, priority=INTERACTIVE, **kwargs):
+        """Ставит сообщение в очередь и ждёт, пока оно будет отправлено. Возвращает telegram.Message."""
+        if priority == BULK and self.queued[BULK] >= self.max_bulk_queue:
+            self.stats["backpressure_waits"] += 1
+            async with self._space:
+                await self._space.wait_for(lambda: self.queued[BULK] < self.max_bulk_queue)
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(_Outgoing(chat_id, text, kwargs, priority, future))
+        return await future
+
+    async def reply(self, update, text, **kwargs):
+        return await self.send(update.effective_chat.id, text, INTERACTIVE, **kwargs)
+
+    def _enqueue(self, item, front=False):
+        chats = self.lanes[item.priority]
+        queue = chats.get(item.chat_id)
+        if queue is None:
+            queue = chats[item.chat_id] = deque()
+        if front:
+            queue.appendleft(item)
+        else:
+            queue.append(item)
+        self.queued[item.priority] += 1
+        self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    async def _sleep(self, timeout):
+        """Спит timeout секунд (None - без ограничения), но просыпается при новом сообщении."""
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.create_future()
+        timer = loop.call_later(timeout, self._wake) if timeout is not None else None
+        try:
+            await self._wakeup
+        finally:
+            if timer is not None:
+                timer.cancel()
+            self._wakeup = None
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _next_ready(self, now):
+        """Следующее сообщение, которое можно отправить сейчас, либо время ожидания до него."""
+        soonest = None
+        for priority in (INTERACTIVE, BULK):
+            chats = self.lanes[priority]
+            ready = None
+            for chat_id in chats:
+                wait = self._chat_bucket(chat_id).wait_time(now)
+                if wait <= 0:
+                    ready = chat_id
+                    break
+                soonest = wait if soonest is None else min(soonest, wait)
+            if ready is not None:
+                queue = chats.pop(ready)
+                item = queue.popleft()
+                if queue:
+                    # чат уходит в конец круга
+                    chats[ready] = queue
+                self.queued[priority] -= 1
+                return item, 0.0
+        return None, soonest
+
+    async def _run(self):
+        while True:
+            # слот берём до выбора сообщения: когда он освободится, уйдёт самое приоритетное
+            await self.in_flight.acquire()
+            try:
+                item = await self._take_next()
+            except BaseException:
+                self.in_flight.release()
+                raise
+            task = asyncio.create_task(self._deliver(item))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            if item.priority == BULK:
+                async with self._space:
+                    self._space.notify_all()
+
+    async def _take_next(self):
+        while True:
+            now = time.monotonic()
+            global_wait = self.global_bucket.wait_time(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+            item, wait = self._next_ready(now)
+            if item is None:
+                await self._sleep(wait)
+                continue
+            self.global_bucket.consume(now)
+            self._chat_bucket(item.chat_id).consume(now)
+            self._dispatched += 1
+            if self._dispatched % 1024 == 0:
+                self._prune_buckets(now)
+            return item
+
+    def _prune_buckets(self, now):
+        # полностью восстановившийся bucket ничем не отличается от нового, его можно не хранить
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            if bucket.wait_time(now) <= 0 and bucket.tokens >= bucket.capacity:
+                if not any(chat_id in lane for lane in self.lanes.values()):
+                    del self.chat_buckets[chat_id]
+
+    async def _deliver(self, item):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            item.attempts += 1
+            message = await self.bot.send_message(chat_id=item.chat_id, text=item.text, **item.kwargs)
+        except RetryAfter as e:
+            outcome = "rate_limited"
+            self.stats["rate_limited"] += 1
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else e.retry_after
+            # ставим на паузу только этот чат: при глобальном превышении 429 придут
+            # и в другие чаты, и каждый из них отступит сам
+            self._chat_bucket(item.chat_id).block(time.monotonic(), retry_after)
+            if item.attempts <= MAX_RETRIES:
+                self.stats["retried"] += 1
+                self._enqueue(item, front=True)
+            else:
+                self._fail(item, e)
+        except Exception as e:
+            outcome = "error"
+            self._fail(item, e)
+        else:
+            self.stats["sent"] += 1
+            QUEUE_WAIT_SECONDS.observe(time.monotonic() - item.enqueued, PRIORITY_NAMES[item.priority])
+            waited_ms = (time.monotonic() - item.enqueued) * 1000
+            max_wait = self.stats["max_wait_ms"]
+            max_wait[item.priority] = max(max_wait[item.priority], waited_ms)
+            if not item.future.done():
+                item.future.set_result(message)
+        finally:
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, "sendMessage", outcome)
+            self.in_flight.release()
+
+    def _fail(self, item, error):
+        self.stats["failed"] += 1
+        logger.error(f"Failed to send message to chat {item.chat_id}: {error}")
+        if not item.future.done():
+            item.future.set_exception(error)
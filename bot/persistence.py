@@ -0,0 +1,178 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from backend.database import get_pool
+
+logger = logging.getLogger(__name__)
+
+# какие ключи context.user_data составляют состояние диалога (см. bot/states.py)
+PERSISTED_KEYS = ("state", "type", "temp_date", "rrule", "delete_events")
+# как часто изменённые состояния пишутся в БД одной транзакцией
+CONVERSATION_FLUSH_SECONDS = float(os.getenv("CONVERSATION_FLUSH_SECONDS", "2"))
+# через сколько без активности диалог забывается и в памяти, и в БД
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL_HOURS", "24")) * 3600
+# сколько пользователей держим в памяти одновременно; самые давние выгружаются
+CONVERSATION_MAX_ACTIVE = int(os.getenv("CONVERSATION_MAX_ACTIVE", "50000"))
+# как часто чистим просроченные диалоги
+CONVERSATION_SWEEP_SECONDS = 300
+
+
+def snapshot(user_data):
+    return {key: user_data[key] for key in PERSISTED_KEYS if user_data.get(key) is not None}
+
+
+class ConversationStore:
+    """
+    Хранит состояние диалогов (context.user_data) в таблице conversation_state.
+
+    Состояние пользователя загружается из БД при первом его сообщении после старта,
+    изменения копятся в памяти и раз в flush_interval пишутся одной транзакцией.
+    В памяти - не больше max_active пользователей и только за последние ttl секунд:
+    вытесненные удаляются и из application.user_data (drop), а при следующем
+    сообщении снова читаются из БД. Завершённый диалог (state = None) удаляется из таблицы.
+    """
+
+    def __init__(self, drop=None, flush_interval=CONVERSATION_FLUSH_SECONDS, ttl=CONVERSATION_TTL,
+                 max_active=CONVERSATION_MAX_ACTIVE, sweep_interval=CONVERSATION_SWEEP_SECONDS):
+        self.drop = drop  # drop(user_id): забыть user_data пользователя в памяти бота
+        self.flush_interval = flush_interval
+        self.ttl = ttl
+        self.max_active = max_active
+        self.sweep_interval = sweep_interval
+        self._active = OrderedDict()  # user_id -> (время последнего обращения, сохранённый json)
+        self._dirty = {}  # user_id -> (json | None, время); None - удалить строку
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self.flushes = 0
+        self.written = 0
+
+    def __len__(self):
+        return len(self._active)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info("Conversation store is started")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def _load(self, user_id):
+        with get_pool().connection() as conn:
+            row = conn.execute(
+                "SELECT data, updated_at FROM conversation_state WHERE user_id = ?", (str(user_id),)
+            ).fetchone()
+        if row is None or row["updated_at"] < time.time() - self.ttl:
+            return None
+        return row["data"]
+
+    async def restore(self, user_id, user_data):
+        """Подгружает сохранённое состояние в user_data при первом обращении пользователя."""
+        now = time.time()
+        if user_id in self._active:
+            self._active[user_id] = (now, self._active[user_id][1])
+            self._active.move_to_end(user_id)
+            return
+        if user_id in self._dirty:
+            # ещё не записанное в БД состояние выгруженного пользователя
+            data = self._dirty[user_id][0]
+        else:
+            data = await asyncio.to_thread(self._load, user_id)
+        if data is not None:
+            for key, value in json.loads(data).items():
+                user_data.setdefault(key, value)
+        self._active[user_id] = (now, data)
+        self._evict_overflow()
+
+    def remember(self, user_id, user_data):
+        """Отмечает состояние к записи, если оно изменилось с последнего сохранения."""
+        now = time.time()
+        state = snapshot(user_data)
+        data = json.dumps(state, ensure_ascii=False) if state.get("state") else None
+        _, saved = self._active.get(user_id, (now, None))
+        self._active[user_id] = (now, data)
+        self._active.move_to_end(user_id)
+        if data != saved:
+            self._dirty[user_id] = (data, now)
+        self._evict_overflow()
+
+    def _evict_overflow(self):
+        while len(self._active) > self.max_active:
+            self._forget(next(iter(self._active)))
+
+    def _forget(self, user_id):
+        del self._active[user_id]
+        if self.drop is not None:
+            self.drop(user_id)
+
+    def expire(self, now=None):
+        """Выгружает из памяти пользователей, которые молчат дольше ttl."""
+        deadline = (now or time.time()) - self.ttl
+        expired = 0
+        while self._active:
+            user_id, (seen, _) = next(iter(self._active.items()))
+            if seen >= deadline:
+                break
+            self._forget(user_id)
+            expired += 1
+        return expired
+
+    @staticmethod
+    def _write(batch):
+        upserts = [(str(user_id), data, updated_at) for user_id, (data, updated_at) in batch.items() if data is not None]
+        deletes = [(str(user_id),) for user_id, (data, _) in batch.items() if data is None]
+        with get_pool().connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO conversation_state (user_id, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                upserts,
+            )
+            conn.executemany("DELETE FROM conversation_state WHERE user_id = ?", deletes)
+            conn.execute("COMMIT")
+
+    @staticmethod
+    def _delete_expired(deadline):
+        with get_pool().connection() as conn:
+            cursor = conn.execute("DELETE FROM conversation_state WHERE updated_at < ?", (deadline,))
+            conn.commit()
+            return cursor.rowcount
+
+    async def flush(self):
+        """Пишет все накопленные изменения одной транзакцией."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except Exception:
+                # вернём несохранённое обратно, не затирая более свежие изменения
+                for user_id, entry in batch.items():
+                    self._dirty.setdefault(user_id, entry)
+                raise
+            self.flushes += 1
+            self.written += len(batch)
+            return len(batch)
+
+    async def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if time.monotonic() - last_sweep >= self.sweep_interval:
+                    last_sweep = time.monotonic()
+                    self.expire()
+                    await asyncio.to_thread(self._delete_expired, time.time() - self.ttl)
+            except Exception:
+                logger.exception("Failed to persist conversation state")
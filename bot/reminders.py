@@ -0,0 +1,207 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+from datetime import datetime, timedelta
+from backend.recurrence import occurrences, parse_exdates, parse_rule
+
+logger = logging.getLogger(__name__)
+
+STARTS_AT_FORMAT = "%Y-%m-%d %H:%M"
+# сколько вперёд загружаем напоминания из БД за один запрос
+REMINDER_WINDOW = timedelta(minutes=int(os.getenv("REMINDER_WINDOW_MINUTES", "60")))
+# за сколько до начала события напоминать
+REMINDER_LEAD = timedelta(minutes=int(os.getenv("REMINDER_LEAD_MINUTES", "0")))
+# напоминания, просроченные не больше чем на grace (например, пока бот перезапускался), всё ещё отправляем
+REMINDER_GRACE = timedelta(minutes=int(os.getenv("REMINDER_GRACE_MINUTES", "10")))
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний на asyncio.
+
+    Держит в min-куче только напоминания ближайшего окна (REMINDER_WINDOW), которые
+    загружаются одним индексным запросом; спит ровно до ближайшего срока или до конца окна.
+    Вставка и отмена - O(log n): отменённая запись помечается и выбрасывается при извлечении.
+    Перед отправкой напоминание атомарно помечается в БД (reminded_at), поэтому после
+    рестарта или при нескольких процессах оно не уходит повторно.
+    От повторяющегося события в куче одновременно только ближайшее повторение:
+    следующее подхватывается очередной загрузкой окна.
+    """
+
+    def __init__(self, calendar, send, window=REMINDER_WINDOW, lead=REMINDER_LEAD, grace=REMINDER_GRACE):
+        self.calendar = calendar
+        self.send = send  # async send(user_id, text)
+        self.window = window
+        self.lead = lead
+        self.grace = grace
+        self._heap = []
+        # (user_id, event_id) -> запись кучи [due, seq, reminder | None]; id уникальны только внутри шарда БД
+        self._entries = {}
+        self._counter = itertools.count()
+        self._horizon = None  # до какого момента окно уже загружено
+        self._loop = None
+        self._wakeup = None  # future, которую будит таймер или более раннее напоминание
+        self._task = None
+        self._sending = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = self._loop.create_task(self._run())
+        self.calendar.add_listener(self.on_change)
+        logger.info("Reminder scheduler is started")
+
+    async def stop(self):
+        self.calendar.remove_listener(self.on_change)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def add(self, event_id, user_id, name, starts_at):
+        """Ставит напоминание в очередь, если оно попадает в уже загруженное окно."""
+        try:
+            start = datetime.fromisoformat(starts_at)
+        except ValueError:
+            return
+        due = start - self.lead
+        key = (str(user_id), event_id)
+        if self._horizon is None or due >= self._horizon or key in self._entries:
+            # событие за пределами окна подхватится при следующей загрузке
+            return
+        if due < datetime.now() - self.grace:
+            # давно прошедшее (например, импорт старого календаря): не напоминаем, а помечаем,
+            # как skip_missed_reminders при загрузке окна
+            self._track(asyncio.to_thread(self.calendar.mark_reminded, event_id, starts_at, user_id))
+            return
+        entry = [due, next(self._counter), {"id": event_id, "user_id": user_id, "name": name, "starts_at": starts_at}]
+        self._entries[key] = entry
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, entry)
+        if earliest is None or due < earliest:
+            self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None and not self._wakeup.done():
+            self._wakeup.set_result(None)
+
+    def cancel(self, event_id, user_id):
+        entry = self._entries.pop((str(user_id), event_id), None)
+        if entry is not None:
+            entry[-1] = None
+            # если отменённых стало больше половины, пересобираем кучу
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [e for e in self._heap if e[-1] is not None]
+                heapq.heapify(self._heap)
+
+    def on_change(self, action, table_name, rows):
+        """Слушатель CalendarDatabase; может вызываться из потока Flask."""
+        if table_name != "events" or self._loop is None:
+            return
+        for row in rows:
+            if action == "saved" and not row.get("all_day"):
+                starts_at = self._next_occurrence(row) if row.get("rrule") else row["starts_at"]
+                if starts_at is None:
+                    continue
+                callback = (self.add, row["id"], row["user_id"], row["name"], starts_at)
+            elif action == "deleted":
+                callback = (self.cancel, row["id"], row["user_id"])
+            else:
+                continue
+            self._loop.call_soon_threadsafe(*callback)
+
+    def _next_occurrence(self, row):
+        """Ближайшее ещё не наступившее повторение правила в загруженном окне или None."""
+        horizon = self._horizon
+        if horizon is None:
+            return None
+        rule = parse_rule(row["rrule"])
+        start = (datetime.now() + self.lead).strftime(STARTS_AT_FORMAT)
+        end = (horizon + self.lead).strftime(STARTS_AT_FORMAT)
+        return next(occurrences(row["starts_at"], rule, parse_exdates(row.get("exdates")), start, end), None)
+
+    def _next_refresh(self, now):
+        """
+        Когда перечитать окно: через половину окна, но не позже чем через половину grace.
+        Событие, которое сохранил другой процесс (on_change о нём не узнает), попадёт в кучу
+        следующей загрузкой - раньше, чем skip_missed_reminders сочтёт его пропущенным.
+        """
+        every = self.window / 2
+        if self.grace:
+            every = min(every, self.grace / 2)
+        return now + every
+
+    async def _load_window(self):
+        now = datetime.now()
+        horizon = now + self.window
+        missed_before = (now - self.grace).strftime(STARTS_AT_FORMAT)
+        start = (now - self.grace + self.lead).strftime(STARTS_AT_FORMAT)
+        end = (horizon + self.lead).strftime(STARTS_AT_FORMAT)
+        skipped = await asyncio.to_thread(self.calendar.skip_missed_reminders, missed_before)
+        if skipped:
+            logger.warning(f"Skipped {skipped} reminders missed by more than {self.grace}")
+        # горизонт сдвигаем до запроса: события, сохранённые во время запроса, попадут через on_change
+        self._horizon = horizon
+        rows = await asyncio.to_thread(self.calendar.get_pending_reminders, start, end)
+        for row in rows:
+            self.add(row["id"], row["user_id"], row["name"], row["starts_at"])
+        logger.info(f"Loaded {len(rows)} reminders up to {horizon:%Y-%m-%d %H:%M}, {len(self)} pending")
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            reminder = entry[-1]
+            if reminder is not None:
+                del self._entries[(str(reminder["user_id"]), reminder["id"])]
+                due.append(reminder)
+        while self._heap and self._heap[0][-1] is None:
+            heapq.heappop(self._heap)
+        return due
+
+    def _track(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _fire(self, reminder):
+        claimed = await asyncio.to_thread(
+            self.calendar.mark_reminded, reminder["id"], reminder["starts_at"], reminder["user_id"]
+        )
+        if not claimed:
+            return
+        try:
+            await self.send(reminder["user_id"], f"⏰ Напоминание: {reminder['name']} ({reminder['starts_at']})")
+        except Exception:
+            logger.exception(f"Failed to send reminder {reminder['id']} to user {reminder['user_id']}")
+
+    async def _run(self):
+        while True:
+            try:
+                await self._load_window()
+            except Exception:
+                logger.exception("Failed to load reminders, retrying in a minute")
+                await asyncio.sleep(60)
+                continue
+            refresh_at = self._next_refresh(datetime.now())
+            while True:
+                now = datetime.now()
+                for reminder in self._pop_due(now):
+                    self._track(self._fire(reminder))
+                if now >= refresh_at:
+                    break
+                wake_at = min(self._heap[0][0], refresh_at) if self._heap else refresh_at
+                self._wakeup = self._loop.create_future()
+                timer = self._loop.call_later((wake_at - now).total_seconds(), self._wake)
+                try:
+                    await self._wakeup
+                finally:
+                    timer.cancel()
+                    self._wakeup = None
@@ -1,7 +1,5 @@
-import re
 import logging
-import aiohttp
-from dateparser.search import search_dates
+from bot.dateparsing import TIME_PATTERN, describe_recurrence, parse_datetime, parse_recurrence
 
 from abc import ABC, abstractmethod
 
@@ -11,26 +9,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def parse_datetime(text):
-    """
-    Парсит дату из текста с помощью dateparser.
-    Если в тексте есть время, возвращает 'YYYY-MM-DD HH:MM', иначе 'YYYY-MM-DD'
-    """
-    parsed_date = search_dates(text, languages=["ru"])
-    pattern_time = re.search(r'\d\d:\d\d', text)
 
-    if not parsed_date:
-        return None
-    
-    date = parsed_date[0][1].strftime("%Y-%m-%d %H:%M") if pattern_time is not None \
-            else parsed_date[0][1].strftime("%Y-%m-%d")
-    
-    return date
+# сколько найденных записей бот показывает за раз
+SEARCH_PAGE = 10
 
 
 def event_or_todo(date):
     # 1 - todo; 0 - event
-    return bool(re.search(r'\d\d:\d\d', date))
+    return bool(TIME_PATTERN.search(date))
+
+
+def render_search_results(query, found):
+    """Ответ на поиск: тело ответа /search ({"results", "next_offset"}) в виде списка."""
+    if not found["results"]:
+        return f"По запросу '{query}' ничего не нашлось 🔍"
+    lines = [f"🔍 Нашлось по запросу '{query}':"]
+    for row in found["results"]:
+        day, _, time = row["date"].partition(" ")
+        when = ".".join(reversed(day.split("-"))) + (f" {time}" if time else "")
+        marker = "📝 " if row["type"] == "todo" else ""
+        repeat = " 🔁" if row["rrule"] else ""
+        lines.append(f"• {when} {marker}{row['name']}{repeat}")
+    if found["next_offset"] is not None:
+        lines.append("Показаны самые подходящие - уточни запрос, чтобы увидеть остальные")
+    return "\n".join(lines)
+
+
+async def search_entries(bot, update, query):
+    user_id = update.effective_user.id
+    found = await bot.backend.search(user_id, query, limit=SEARCH_PAGE)
+    if found is None:
+        logger.warning(f"User {user_id} search failed: {query}")
+        await bot.reply(update, "Не получилось поискать 🥲 Напиши хотя бы одно слово")
+        return
+    await bot.reply(update, render_search_results(query, found))
 
 
 class BotState(ABC):
@@ -51,20 +63,23 @@ class AwaitingDateState(BotState):
         state_type = context.user_data.get("type")
         if state_type not in ("event", "todo"):
             logger.warning(f"User {user_id} state type is not set correctly.")
-            await update.message.reply_text("Ошибка на стороне сервера. Пни Ксюшу, пусть смотрит логи")
+            await bot.reply(update, "Ошибка на стороне сервера. Пни Ксюшу, пусть смотрит логи")
             return
         
         user_id = update.effective_user.id
         text = update.message.text
-        date = parse_datetime(text)
+        # "каждый понедельник в 10:00" - повторяющееся событие, дата - первое повторение
+        rrule, date_text = parse_recurrence(text)
+        date = parse_datetime(date_text)
         if date is None:
             logger.warning(f"User {user_id} sent invalid date: {text}")
-            await update.message.reply_text("Не понял дату 🥲. Попробуй ещё раз")
+            await bot.reply(update, "Не понял дату 🥲. Попробуй ещё раз")
             return
         context.user_data["temp_date"] = date
+        context.user_data["rrule"] = rrule
         # Переходим к следующему состоянию – ввод названия события
         context.user_data["state"] = f"awaiting_{state_type}_name"
-        await update.message.reply_text("✍️ Теперь напиши название события")
+        await bot.reply(update, "✍️ Теперь напиши название события")
 
 
 # Состояние: ожидание ввода названия события
@@ -74,31 +89,30 @@ class AwaitingNameState(BotState):
         event_name = update.message.text
         temp_date = context.user_data.get("temp_date")
         state_type = context.user_data.get("type")
+        rrule = context.user_data.get("rrule")
         
         if not temp_date:
-            await update.message.reply_text("Дата потерялась 🥲, попробуй снова")
+            await bot.reply(update, "Дата потерялась 🥲, попробуй снова")
             return
         
         if state_type not in ("event", "todo"):
             logger.warning(f"User {user_id} state type is not set correctly.")
-            await update.message.reply_text("Ошибка на стороне сервера. Пни Ксюшу, пусть смотрит логи")
+            await bot.reply(update, "Ошибка на стороне сервера. Пни Ксюшу, пусть смотрит логи")
             return
 
-        # Формируем запрос на добавление события
-        url = f"{bot.backend_url}/todos" if state_type=='todo' else f"{bot.backend_url}/events"
-        payload = {"user_id": user_id, "name": event_name, "date": temp_date}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as resp:
-                if resp.status in {200, 201}:
-                    logger.info(f"User {user_id} successfully added {state_type}: {event_name} on {temp_date}")
-                    await update.message.reply_text(f"Событие '{event_name}' записано на {temp_date}!")
-                else:
-                    logger.error(f"User {user_id} failed to add {state_type}: {event_name} ({temp_date}). Status: {resp.status}")
-                    await update.message.reply_text("Ошибка при добавлении события 🛠️")
+        # Отправляем событие в backend
+        if await bot.backend.add_entry(user_id, state_type, event_name, temp_date, rrule=rrule):
+            logger.info(f"User {user_id} successfully added {state_type}: {event_name} on {temp_date} ({rrule})")
+            repeat = f", повторяется {describe_recurrence(rrule)}" if rrule else ""
+            await bot.reply(update, f"Событие '{event_name}' записано на {temp_date}{repeat}!")
+        else:
+            logger.error(f"User {user_id} failed to add {state_type}: {event_name} ({temp_date})")
+            await bot.reply(update, "Ошибка при добавлении события 🛠️")
 
         # Сбрасываем состояние
         context.user_data["state"] = None
         context.user_data.pop("temp_date", None)
+        context.user_data.pop("rrule", None)
 
 
 # Состояние: ожидание ввода даты для удаления события/заметки
@@ -109,24 +123,34 @@ class AwaitingDeleteDateState(BotState):
         date = parse_datetime(text)
         if date is None:
             logger.warning(f"User {user_id} sent invalid date: {text}")
-            await update.message.reply_text("Не понял дату 🥲. Попробуй ещё раз")
+            await bot.reply(update, "Не понял дату 🥲. Попробуй ещё раз")
             return
         context.user_data["temp_date"] = date
 
         # получаем события на данную дату
         response = await bot.fetch_events_by_date(user_id, date)
         if response is None or not response:
-            await update.message.reply_text("На этот день ничего нет 😌")
+            await bot.reply(update, "На этот день ничего нет 😌")
             context.user_data["state"] = None
             return
 
-        # сохраняем список событий для выбора пользователем
-        events_mapping = {str(i+1): event["name"] for i, event in enumerate(response)}
+        # сохраняем список событий для выбора пользователем: удаляется запись с этим id,
+        # а у повторяющейся - только повторение в этот день
+        events_mapping = {}
+        for i, event in enumerate(response):
+            entry = {"type": event["type"], "id": event["id"], "name": event["name"]}
+            if event["rrule"]:
+                entry["starts_at"] = event["starts_at"]
+            events_mapping[str(i + 1)] = entry
         context.user_data["delete_events"] = events_mapping
 
-        logger.info(events_mapping)
-        events_list = "\n".join(f"{int(i)}. {name}" for i, name in events_mapping.items())
-        await update.message.reply_text(f"📅 События на {date}:\nВыбери номер события для удаления:\n{events_list}")
+        # время - чтобы различать записи с одинаковыми именами; у записей на весь день его нет
+        events_list = "\n".join(
+            f"{i}. {event['starts_at'][11:]} {event['name']}" if event["starts_at"][11:] not in ("", "00:00")
+            else f"{i}. {event['name']}"
+            for i, event in zip(events_mapping, response)
+        )
+        await bot.reply(update, f"📅 События на {date}:\nВыбери номер события для удаления:\n{events_list}")
 
         context.user_data["state"] = "awaiting_delete_choice"
 
@@ -137,23 +161,27 @@ class AwaitingDeleteChoiceState(BotState):
         user_id = update.effective_user.id
         choice = update.message.text.strip()
         delete_events = context.user_data.get("delete_events", {})
-        event_name = delete_events.get(choice)
-        if not event_name:
-            await update.message.reply_text("Неверный номер! Введи цифру из списка 🧐")
+        entry = delete_events.get(choice)
+        if not entry:
+            await bot.reply(update, "Неверный номер! Введи цифру из списка 🧐")
             return
 
-        date = context.user_data.get("temp_date")
-        # Отправляем запрос на удаление
-        url = f"{bot.backend_url}/events/delete"
-        payload = {"user_id": user_id, "name": event_name, "date": date}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as resp:
-                if resp.status in {200, 201}:
-                    await update.message.reply_text(f"Событие '{event_name}' удалено!")
-                else:
-                    await update.message.reply_text("Ошибка при удалении 🛠️")
+        if not isinstance(entry, dict):
+            # диалог начат до перехода на удаление по id (восстановлен из БД) - в нём только имена
+            await bot.reply(update, "Список устарел 🥲 Нажми «Удалить событие или заметку» ещё раз")
+        elif await bot.backend.delete_entries(user_id, [{key: value for key, value in entry.items() if key != "name"}]):
+            await bot.reply(update, f"Событие '{entry['name']}' удалено!")
+        else:
+            await bot.reply(update, "Не нашёл это событие - возможно, его уже удалили 🤔")
 
         # Сбрасываем состояние
         context.user_data["state"] = None
         context.user_data.pop("delete_events", None)
-        context.user_data.pop("temp_date", None)
\ No newline at end of file
+        context.user_data.pop("temp_date", None)
+
+
+# Состояние: ожидание текста для поиска
+class AwaitingSearchQueryState(BotState):
+    async def handle(self, bot, update, context):
+        context.user_data["state"] = None
+        await search_entries(bot, update, update.message.text.strip())
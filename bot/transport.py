@@ -0,0 +1,173 @@
+import asyncio
+import importlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:5001")
+# http - ходить в backend по HTTP; inprocess - вызывать модели календаря напрямую
+# (имеет смысл, когда бот и backend запущены в одном процессе, как в main.py)
+BACKEND_TRANSPORT = os.getenv("BACKEND_TRANSPORT", "http")
+
+
+class HttpBackend:
+    """Клиент backend'а поверх одной долгоживущей aiohttp-сессии с keep-alive соединениями."""
+
+    def __init__(self, base_url=BACKEND_URL, pool_size=32, timeout=10):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._session = None
+
+    async def start(self):
+        if self._session is None:
+            # aiohttp (~150 мс импорта) нужен только этому транспорту: грузим его здесь и в потоке,
+            # чтобы не задерживать ни импорт бота, ни цикл событий
+            aiohttp = await asyncio.to_thread(importlib.import_module, "aiohttp")
+            if self._session is not None:
+                return
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _session_or_start(self):
+        if self._session is None:
+            await self.start()
+        return self._session
+
+    async def _request(self, method, path, payload=None, params=None):
+        """Возвращает (status, json) или (None, None), если backend недоступен."""
+        session = await self._session_or_start()
+        import aiohttp
+
+        try:
+            async with session.request(method, f"{self.base_url}{path}", json=payload, params=params) as resp:
+                body = await resp.json() if resp.status in {200, 201} else None
+                return resp.status, body
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Backend request {method} {path} failed: {e!r}")
+            return None, None
+
+    async def add_entry(self, user_id, state_type, name, date, rrule=None):
+        path = "/todos" if state_type == "todo" else "/events"
+        payload = {"user_id": user_id, "name": name, "date": date}
+        if rrule:
+            payload["rrule"] = rrule
+        status, _ = await self._request("POST", path, payload)
+        if status not in {200, 201}:
+            logger.error(f"Backend refused to add {state_type} for user {user_id}. Status: {status}")
+            return False
+        return True
+
+    async def events_by_date(self, user_id, date):
+        status, body = await self._request("GET", "/events/by_date", {"user_id": user_id, "date": date})
+        return body if status in {200, 201} else None
+
+    async def delete_entries(self, user_id, entries):
+        """Удаляет записи по [{"type", "id"[, "starts_at"]}] из events_by_date; возвращает число удалённых."""
+        status, body = await self._request("POST", "/entries/delete", {"user_id": user_id, "entries": entries})
+        return body["deleted"] if status in {200, 201} else 0
+
+    async def search(self, user_id, query, limit=10, offset=0):
+        params = {"user_id": user_id, "q": query, "limit": limit, "offset": offset}
+        status, body = await self._request("GET", "/search", params=params)
+        return body if status in {200, 201} else None
+
+    async def subscribe_digest(self, user_id, tz, hour, day_offset=0):
+        payload = {"user_id": user_id, "tz": tz, "hour": hour, "day_offset": day_offset}
+        status, _ = await self._request("POST", "/digest", payload)
+        return status in {200, 201}
+
+    async def unsubscribe_digest(self, user_id):
+        status, _ = await self._request("POST", "/digest/delete", {"user_id": user_id})
+        return status in {200, 201}
+
+
+class InProcessBackend:
+    """
+    Тот же интерфейс, что у HttpBackend, но без HTTP: модели вызываются напрямую
+    в пуле потоков, чтобы блокирующий SQLite не останавливал цикл событий бота.
+    """
+
+    def __init__(self):
+        from backend.digest import DigestSubscriptions
+        from backend.models import EventCalendar, TodoCalendar
+
+        self.event_calendar = EventCalendar()
+        self.todo_calendar = TodoCalendar()
+        self.digest_subscriptions = DigestSubscriptions()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def add_entry(self, user_id, state_type, name, date, rrule=None):
+        calendar = self.todo_calendar if state_type == "todo" else self.event_calendar
+        try:
+            await asyncio.to_thread(calendar.save, user_id, name, date, rrule)
+        except ValueError as e:
+            logger.error(f"Refused to add {state_type} for user {user_id}: {e}")
+            return False
+        return True
+
+    def _events_by_date(self, user_id, date):
+        try:
+            todo_events = self.todo_calendar.get_date_events(user_id, date)
+            calendar_events = self.event_calendar.get_date_events(user_id, date)
+        except ValueError:
+            return None
+        return [dict(row) for row in (todo_events + calendar_events)]
+
+    async def events_by_date(self, user_id, date):
+        return await asyncio.to_thread(self._events_by_date, user_id, date)
+
+    def _delete_entries(self, user_id, entries):
+        try:
+            return self.event_calendar.delete_entries(user_id, entries)
+        except ValueError as e:
+            logger.error(f"Refused to delete entries of user {user_id}: {e}")
+            return 0
+
+    async def delete_entries(self, user_id, entries):
+        return await asyncio.to_thread(self._delete_entries, user_id, entries)
+
+    def _search(self, user_id, query, limit, offset):
+        try:
+            rows = self.event_calendar.search(user_id, query, limit + 1, offset)
+        except ValueError:
+            return None
+        return {
+            "results": [dict(row) for row in rows[:limit]],
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+
+    async def search(self, user_id, query, limit=10, offset=0):
+        return await asyncio.to_thread(self._search, user_id, query, limit, offset)
+
+    async def subscribe_digest(self, user_id, tz, hour, day_offset=0):
+        try:
+            await asyncio.to_thread(self.digest_subscriptions.subscribe, user_id, tz, hour, day_offset)
+        except ValueError as e:
+            logger.error(f"Refused to subscribe user {user_id} to digest: {e}")
+            return False
+        return True
+
+    async def unsubscribe_digest(self, user_id):
+        return await asyncio.to_thread(self.digest_subscriptions.unsubscribe, user_id)
+
+
+def make_backend(transport=BACKEND_TRANSPORT, base_url=BACKEND_URL):
+    if transport == "inprocess":
+        return InProcessBackend()
+    if transport == "http":
+        return HttpBackend(base_url)
+    raise ValueError(f"Unknown backend transport: {transport}")
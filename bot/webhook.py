@@ -0,0 +1,143 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# polling - бот сам опрашивает getUpdates; webhook - Telegram присылает обновления на ASGI-сервер backend'а
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# публичный https-адрес, по которому Telegram достучится до сервера (без пути)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+# Telegram присылает его в заголовке X-Telegram-Bot-Api-Secret-Token; чужие запросы отклоняем
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# сколько обновлений обрабатывается одновременно (обновления одного пользователя - всегда по очереди)
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "64"))
+# больше Telegram не пришлёт: https://core.telegram.org/bots/api#setwebhook
+MAX_WEBHOOK_BODY = 1024 * 1024
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает до max_concurrent_updates обновлений одновременно, но обновления
+    одного пользователя (или чата, если пользователя нет) - строго по очереди
+    и в порядке поступления, чтобы машина состояний из bot/states.py не гонялась сама с собой.
+
+    Обновление сначала ждёт своей очереди у ключа (asyncio.Lock будит ожидающих по порядку,
+    а Application создаёт задачи в порядке обновлений) и только потом берёт общий слот.
+    Поэтому поток обновлений одного чата занимает не больше одного слота, и остальные чаты
+    не стоят за ним. Замки хранятся только пока у ключа есть обновления.
+    """
+
+    def __init__(self, max_concurrent_updates=UPDATE_CONCURRENCY):
+        super().__init__(max_concurrent_updates)
+        self._chains = {}  # ключ -> [asyncio.Lock, сколько обновлений его ждут или держат]
+
+    @staticmethod
+    def _key(update):
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return "user", update.effective_user.id
+        if update.effective_chat is not None:
+            return "chat", update.effective_chat.id
+        return None
+
+    async def process_update(self, update, coroutine):
+        # BaseUpdateProcessor.process_update держит слот семафора, пока ждёт do_process_update:
+        # ждать замок ключа внутри него значило бы занимать слоты ожидающими
+        key = self._key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = self._chains[key] = [asyncio.Lock(), 0]
+        chain[1] += 1
+        try:
+            async with chain[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            chain[1] -= 1
+            if not chain[1]:
+                del self._chains[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+class TelegramWebhook:
+    """
+    ASGI-приложение: POST на path кладёт обновление в очередь Application бота,
+    всё остальное (включая lifespan) уходит в fallback - ASGI-приложение backend'а.
+    Так webhook обслуживается тем же uvicorn-сервером, что и backend.
+    """
+
+    def __init__(self, bot, fallback, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET):
+        self.bot = bot  # TelegramCalendarBot; его Application появляется при запуске
+        self.fallback = fallback
+        self.path = path
+        self.secret_token = secret_token
+        self.received = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            await self._handle(scope, receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+    @staticmethod
+    async def _respond(send, status):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    def _authorized(self, scope):
+        if not self.secret_token:
+            return True
+        for name, value in scope["headers"]:
+            if name == b"x-telegram-bot-api-secret-token":
+                return hmac.compare_digest(value, self.secret_token.encode())
+        return False
+
+    async def _handle(self, scope, receive, send):
+        if scope["method"] != "POST":
+            return await self._respond(send, 405)
+        if not self._authorized(scope):
+            self.rejected += 1
+            return await self._respond(send, 403)
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.extend(message.get("body", b""))
+            if len(body) > MAX_WEBHOOK_BODY:
+                return await self._respond(send, 413)
+            if not message.get("more_body"):
+                break
+
+        application = getattr(self.bot, "application", None)
+        if application is None or not application.running:
+            # Telegram повторит доставку позже
+            return await self._respond(send, 503)
+        try:
+            update = Update.de_json(json.loads(body), application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Invalid webhook update: {e!r}")
+            return await self._respond(send, 400)
+        # обработка идёт в Application; Telegram сразу получает ответ и шлёт следующие обновления
+        await application.update_queue.put(update)
+        self.received += 1
+        await self._respond(send, 200)
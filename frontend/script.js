@@ -1,8 +1,15 @@
-async function getEventsByDate(date) {
+async function getEventsByRange(start, end) {
     const userId = localStorage.getItem("user_id");
-    const response = await fetch(`/events/by_date?user_id=${userId}&date=${date}`);
+    const params = new URLSearchParams({user_id: userId, start: start, end: end});
+    // браузер сам отправит If-None-Match и получит 304, если данные не менялись
+    const response = await fetch(`/events/range?${params}`);
     const data = await response.json();
-    return data.events; // Возвращает список событий
+    return data.events.map(event => ({
+        id: `${event.type}-${event.id}`,
+        title: event.name,
+        start: event.start,
+        allDay: event.all_day,
+    }));
 }
 
 // Инициализация календаря
@@ -11,7 +18,8 @@ const calendar = new FullCalendar.Calendar(document.getElementById('calendar'),
     initialView: 'dayGridMonth',
     locale: 'ru',
     events: async function(info, successCallback) {
-        const events = await getEventsByDate(info.startStr);
+        // один запрос на весь видимый диапазон вместо запроса на каждый день
+        const events = await getEventsByRange(info.startStr, info.endStr);
         successCallback(events);
     }
 });
@@ -3,24 +3,48 @@ import asyncio
 import threading
 from dotenv import load_dotenv
 from bot.bot import TelegramCalendarBot
-from backend.routes import app
 
 load_dotenv()
 TOKEN = os.getenv("BOT_TOKEN")
+# asgi - backend на uvicorn в том же цикле событий, что и бот; flask - отладочный сервер Werkzeug в отдельном потоке
+BACKEND_MODE = os.getenv("BACKEND_MODE", "asgi")
 
 def run_bot():
     bot_instance = TelegramCalendarBot(token=TOKEN)
     bot_instance.run()
 
 def run_flask():
-    app.run(debug=True, use_reloader=False, port=5001)
+    from backend.asgi import BACKEND_HOST, BACKEND_PORT
+    from backend.routes import app
+
+    app.run(debug=True, use_reloader=False, host=BACKEND_HOST, port=BACKEND_PORT)
+
+async def run_asgi():
+    from backend.asgi import asgi_app, create_server
+    from bot.webhook import TelegramWebhook
+
+    bot_instance = TelegramCalendarBot(token=TOKEN)
+    application = asgi_app
+    if bot_instance.mode == "webhook":
+        # webhook Telegram принимается тем же сервером, что и backend
+        application = TelegramWebhook(bot_instance, asgi_app)
+    server = create_server(application=application)
+    stop_bot = asyncio.Event()
+    bot_task = asyncio.create_task(bot_instance.run_async(stop_bot))
+    try:
+        # uvicorn сам ловит SIGINT/SIGTERM и завершает serve(), после этого останавливаем бота
+        await server.serve()
+    finally:
+        stop_bot.set()
+        await bot_task
 
 if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    flask_thread = threading.Thread(target=run_flask)
-    flask_thread.start()
-
-    loop.create_task(run_bot())
-    loop.run_forever()
\ No newline at end of file
+    if BACKEND_MODE == "flask":
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        flask_thread = threading.Thread(target=run_flask, daemon=True)
+        flask_thread.start()
+        run_bot()
+    else:
+        asyncio.run(run_asgi())
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# backend читает DB_PATH при импорте: тесты работают с отдельной временной БД
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="calendar_tests_"), "calendar.sqlite3")
+os.environ["DB_SHARDS"] = ""
+os.environ["WRITE_BEHIND"] = "off"
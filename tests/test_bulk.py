@@ -0,0 +1,59 @@
+import json
+import sqlite3
+
+from backend.bulk import import_entries, parse_ndjson
+from backend.models import EventCalendar, TodoCalendar
+
+
+def test_non_string_fields_fail_only_their_line():
+    lines = [
+        json.dumps({"name": "Встреча", "date": "2030-01-02 10:00"}),
+        json.dumps({"name": 42, "date": "2030-01-02"}),
+        json.dumps({"name": "Дата числом", "date": 20300102}),
+        json.dumps({"type": ["todo"], "name": "Тип списком", "date": "2030-01-02"}),
+        json.dumps({"name": "Правило объектом", "date": "2030-01-02", "rrule": {"FREQ": "DAILY"}}),
+        json.dumps({"name": "Исключение числом", "date": "2030-01-02", "rrule": "FREQ=DAILY", "exdates": [1]}),
+        json.dumps({"name": "Исключения строкой", "date": "2030-01-02", "rrule": "FREQ=DAILY", "exdates": "2030-01-03"}),
+        json.dumps({"type": "todo", "name": "Задача", "date": "2030-01-03"}),
+    ]
+    report = import_entries("bulk-types", parse_ndjson(lines), {"event": EventCalendar(), "todo": TodoCalendar()})
+    assert "failed" not in report
+    assert report["imported"] == {"event": 1, "todo": 1}
+    assert [error["line"] for error in report["errors"]] == [2, 3, 4, 5, 6, 7]
+
+
+class FlakyCalendar:
+    def __init__(self):
+        self.saved = []
+
+    def save_many(self, user_id, entries):
+        if any(name == "сломанная" for name, *_ in entries):
+            raise sqlite3.OperationalError("database is locked")
+        self.saved.extend(entries)
+        return len(entries)
+
+
+def test_database_error_fails_only_its_chunk():
+    calendar = FlakyCalendar()
+    names = ["первая", "вторая", "сломанная", "третья", "четвёртая", "пятая"]
+    lines = [json.dumps({"name": name, "date": "2030-01-02"}) for name in names]
+    report = import_entries("bulk-chunks", parse_ndjson(lines), {"event": calendar}, chunk_size=2)
+    assert "failed" not in report
+    assert report["imported"] == {"event": 4}
+    assert report["error_count"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert [name for name, *_ in calendar.saved] == ["первая", "вторая", "четвёртая", "пятая"]
+
+
+def test_export_pages_in_order_and_releases_the_connection():
+    calendar = EventCalendar()
+    # одинаковое время у нескольких записей: страница может закончиться посреди них
+    calendar.save_many("bulk-export", [(f"событие {number}", f"2030-01-{number % 4 + 1:02d} 10:00") for number in range(11)])
+    pool = calendar._pool("bulk-export")
+    rows = calendar.iter_all("bulk-export", batch_size=3)
+    first = next(rows)
+    # пока клиент читает страницу, соединение уже вернулось в пул
+    assert pool._slots._value == pool.size
+    exported = [first, *rows]
+    assert len({row["id"] for row in exported}) == 11
+    assert [(row["starts_at"], row["id"]) for row in exported] == sorted((row["starts_at"], row["id"]) for row in exported)
@@ -0,0 +1,14 @@
+import pytest
+
+from bot.digest import DIGEST_DEFAULT_TZ, parse_digest_args
+
+
+def test_whole_hour_with_or_without_minutes():
+    assert parse_digest_args(["7"]) == (DIGEST_DEFAULT_TZ, 7, 0)
+    assert parse_digest_args(["07:00", "Asia/Tokyo", "завтра"]) == ("Asia/Tokyo", 7, 1)
+
+
+@pytest.mark.parametrize("time", ["7:30", "7:05", "7:ab"])
+def test_time_with_minutes_is_rejected(time):
+    with pytest.raises(ValueError):
+        parse_digest_args([time])
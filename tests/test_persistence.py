@@ -0,0 +1,121 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from backend.database import init_db
+from backend.models import EventCalendar
+from bot import persistence
+from bot.bot import TelegramCalendarBot
+from bot.persistence import ConversationStore
+
+
+def make_update(user_id, text, replies):
+    async def reply_text(answer, **kwargs):
+        replies.append(answer)
+
+    return SimpleNamespace(
+        message=SimpleNamespace(text=text, reply_text=reply_text),
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=user_id),
+    )
+
+
+async def send(bot, user_id, text, user_data):
+    """Одно сообщение через те же шаги, что и в Application: restore -> handle_text -> remember."""
+    replies = []
+    update = make_update(user_id, text, replies)
+    context = SimpleNamespace(user_data=user_data)
+    await bot.restore_conversation(update, context)
+    await bot.handle_text(update, context)
+    await bot.remember_conversation(update, context)
+    return replies
+
+
+def make_bot():
+    bot = TelegramCalendarBot("0:test", transport="inprocess")
+    bot.conversations = ConversationStore()
+    return bot
+
+
+def test_dialogs_continue_after_restart():
+    init_db()
+    adder, deleter = 1001, 1002
+    calendar = EventCalendar()
+    calendar.save_event(str(deleter), "Старое событие", "2030-01-15")
+
+    async def scenario():
+        # user_data живёт в памяти процесса, как application.user_data
+        first, memory = make_bot(), {adder: {}, deleter: {}}
+        await send(first, adder, "Добавить событие", memory[adder])
+        await send(first, adder, "15.01.2030 в 15:00", memory[adder])
+        await send(first, deleter, "Удалить событие или заметку", memory[deleter])
+        await send(first, deleter, "15.01.2030", memory[deleter])
+        await first.conversations.flush()
+
+        # "падение": новый экземпляр с пустой памятью продолжает те же диалоги из БД
+        second, memory = make_bot(), {adder: {}, deleter: {}}
+        assert await send(second, adder, "Встреча", memory[adder])
+        assert await send(second, deleter, "1", memory[deleter])
+        await second.conversations.flush()
+        return second.conversations
+
+    store = asyncio.run(scenario())
+    assert [row["name"] for row in calendar.get_all(str(adder))] == ["Встреча"]
+    assert calendar.get_all(str(deleter)) == []
+    # завершённые диалоги удалены из таблицы
+    assert store._dirty == {}
+    assert store._load(adder) is None and store._load(deleter) is None
+
+
+def test_idle_dialogs_expire_in_memory_and_in_db(monkeypatch):
+    init_db()
+    clock = SimpleNamespace(time=time.time, monotonic=time.monotonic)
+    monkeypatch.setattr(persistence, "time", clock)
+    dropped = []
+    store = ConversationStore(drop=dropped.append, ttl=60)
+
+    async def scenario():
+        for user_id in (2001, 2002):
+            await store.restore(user_id, {})
+            store.remember(user_id, {"state": "awaiting_event_name", "type": "event"})
+        await store.flush()
+
+        started = time.time()
+        clock.time = lambda: started + 30
+        await store.restore(2002, {})  # второй ещё пишет, первый молчит
+        clock.time = lambda: started + 75
+        assert store.expire() == 1
+        assert dropped == [2001] and len(store) == 1
+
+        # после ttl состояние не подгружается и стирается из таблицы
+        user_data = {}
+        await store.restore(2001, user_data)
+        assert user_data == {}
+        assert await asyncio.to_thread(store._delete_expired, clock.time() - store.ttl) >= 2
+
+    asyncio.run(scenario())
+
+
+def test_evicted_dialog_is_restored_from_pending_changes_and_db():
+    init_db()
+    dropped = []
+    store = ConversationStore(drop=dropped.append, max_active=2)
+
+    async def scenario():
+        for user_id in (3001, 3002, 3003):
+            await store.restore(user_id, {})
+            store.remember(user_id, {"state": "awaiting_event_name", "type": "event", "temp_date": f"2030-01-0{user_id - 3000}"})
+        assert dropped == [3001] and len(store) == 2
+
+        # ещё не записанное состояние вытесненного пользователя берётся из очереди на запись
+        user_data = {}
+        await store.restore(3001, user_data)
+        assert user_data["temp_date"] == "2030-01-01"
+        assert dropped == [3001, 3002]
+
+        await store.flush()
+        user_data = {}
+        await store.restore(3002, user_data)
+        assert user_data == {"state": "awaiting_event_name", "type": "event", "temp_date": "2030-01-02"}
+
+    asyncio.run(scenario())
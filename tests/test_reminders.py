@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend.models import EventCalendar
+from bot import reminders
+from bot.reminders import ReminderScheduler
+
+
+class FakeClock(datetime):
+    current = datetime(2030, 1, 1, 12, 0)
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def test_event_saved_by_another_process_after_load_is_not_skipped(monkeypatch):
+    monkeypatch.setattr(reminders, "datetime", FakeClock)
+    start = FakeClock.current
+    calendar = EventCalendar()
+
+    async def send(user_id, text):
+        pass
+
+    # без start(): слушатель не подписан, как если бы событие сохранил backend в другом процессе
+    scheduler = ReminderScheduler(calendar, send, window=timedelta(minutes=60), grace=timedelta(minutes=10))
+
+    async def scenario():
+        await scheduler._load_window()
+        assert len(scheduler) == 0
+
+        FakeClock.current = start + timedelta(minutes=1)
+        due = start + timedelta(minutes=12)
+        event_id = calendar.save("42", "Созвон", due.strftime("%Y-%m-%d %H:%M"))
+
+        refresh_at = scheduler._next_refresh(start)
+        assert refresh_at <= start + scheduler.grace
+        FakeClock.current = refresh_at
+        await scheduler._load_window()
+        assert ("42", event_id) in scheduler._entries
+
+    asyncio.run(scenario())
+
+
+def test_refresh_is_half_window_when_grace_is_longer():
+    scheduler = ReminderScheduler(None, None, window=timedelta(minutes=20), grace=timedelta(minutes=60))
+    now = datetime(2030, 1, 1, 12, 0)
+    assert scheduler._next_refresh(now) == now + timedelta(minutes=10)
+
+
+def test_saving_and_importing_past_events_sends_nothing():
+    calendar = EventCalendar()
+    sent = []
+
+    async def send(user_id, text):
+        sent.append((user_id, text))
+
+    scheduler = ReminderScheduler(calendar, send, window=timedelta(minutes=60), grace=timedelta(minutes=10))
+
+    async def scenario():
+        scheduler.start()
+        try:
+            await asyncio.sleep(0.2)  # окно загружено
+            past = datetime.now() - timedelta(hours=5)
+            calendar.save("77", "Прошедшее", past.strftime("%Y-%m-%d %H:%M"))
+            calendar.save_many("77", [
+                (f"Старое {number}", (past - timedelta(days=number)).strftime("%Y-%m-%d %H:%M"))
+                for number in range(1, 6)
+            ])
+            await asyncio.sleep(0.3)
+            assert sent == []
+            assert len(scheduler) == 0
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(scenario())
+    rows = calendar._execute_query(
+        "SELECT COUNT(*) FROM events WHERE user_id = '77' AND reminded_at IS NULL", fetch=True, user_id="77"
+    )
+    assert rows[0][0] == 0
@@ -0,0 +1,33 @@
+from backend.routes import REQUEST_SECONDS, app
+
+
+@app.route('/test/broken')
+def broken():
+    raise RuntimeError("view failed")
+
+
+def count(method, route, status):
+    series = REQUEST_SECONDS._series.get((method, route, status))
+    return sum(series[0]) if series else 0
+
+
+def test_failed_requests_are_timed():
+    client = app.test_client()
+    before = count("GET", "/test/broken", 500)
+    app.testing = True  # исключение из view доходит до клиента, after_request не вызывается
+    try:
+        try:
+            client.get('/test/broken')
+        except RuntimeError:
+            pass
+    finally:
+        app.testing = False
+    assert client.get('/test/broken').status_code == 500
+    assert count("GET", "/test/broken", 500) == before + 2
+
+
+def test_successful_requests_keep_their_status():
+    client = app.test_client()
+    before = count("GET", "/events", 400)
+    assert client.get('/events', json={}).status_code == 400
+    assert count("GET", "/events", 400) == before + 1
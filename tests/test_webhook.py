@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime
+
+from telegram import Chat, Message, Update, User
+
+from bot.webhook import PerChatUpdateProcessor
+
+
+def make_update(update_id, user_id):
+    user = User(user_id, f"user{user_id}", False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, datetime.now(), chat, from_user=user, text="hi"))
+
+
+def test_flooding_chat_does_not_block_other_chats():
+    async def scenario():
+        processor = PerChatUpdateProcessor(max_concurrent_updates=2)
+        release = asyncio.Event()
+        handled = []
+
+        async def slow(number):
+            await release.wait()
+            handled.append(number)
+
+        async def fast():
+            handled.append("other")
+
+        # первое обновление чата 1 держит слот, остальные ждут своей очереди
+        flood = [
+            asyncio.create_task(processor.process_update(make_update(number, 1), slow(number)))
+            for number in range(10)
+        ]
+        await asyncio.sleep(0)
+        other = asyncio.create_task(processor.process_update(make_update(100, 2), fast()))
+        await asyncio.wait_for(other, timeout=1)
+        assert handled == ["other"]
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*flood), timeout=1)
+        assert handled == ["other", *range(10)]
+        assert processor._chains == {}
+
+    asyncio.run(scenario())
+
+
+def test_updates_of_one_chat_run_one_at_a_time():
+    async def scenario():
+        processor = PerChatUpdateProcessor(max_concurrent_updates=8)
+        running, peak, order = 0, 0, []
+
+        async def handler(number):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            order.append(number)
+            running -= 1
+
+        await asyncio.gather(*(processor.process_update(make_update(number, 1), handler(number)) for number in range(20)))
+        assert peak == 1
+        assert order == list(range(20))
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import json
+
+from backend.database import ConnectionPool, migrate
+from backend.writebehind import WriteBuffer
+
+
+def make_row(user_id, name):
+    return (user_id, name, "2030-01-02", "2030-01-02 00:00", 1, None, "2030-01-02 00:00", None)
+
+
+def test_log_keeps_only_uncommitted_inserts_under_load(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "calendar.sqlite3"))
+    with pool.connection() as conn:
+        migrate(conn)
+    log_path = f"{pool.path}-writes.log"
+    # фоновый поток не сбрасывает сам: сброс и вставки во время коммита делает тест
+    buffer = WriteBuffer(pool, log_path=log_path, interval=3600, batch=10 ** 6)
+    commit = buffer._commit
+
+    def commit_while_inserting(batch):
+        # очередь не пустеет: пока идёт коммит, приходит следующая вставка
+        buffer.add("events", make_row("1", f"во время коммита {len(batch)}"))
+        return commit(batch)
+
+    buffer._commit = commit_while_inserting
+    for round_number in range(5):
+        for number in range(10):
+            buffer.add("events", make_row("1", f"{round_number}-{number}"))
+        buffer.flush()
+        with open(log_path, encoding="utf-8") as log:
+            assert [json.loads(line)[1:] for line in log] == [["events", list(row)] for _, _, row in buffer._pending]
+    assert len(buffer._pending) == 1
+
+    # журнал после сжатия по-прежнему проигрывается: несброшенная вставка попадает в БД
+    buffer._log.close()
+    replayed = WriteBuffer(pool, log_path=log_path, interval=3600, batch=10 ** 6)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 5 * 10 + 5
+    assert replayed._pending == []